@@ -22,6 +22,8 @@ from ion.agents.instrumentagents.instrument_connection import InstrumentConnecti
 from ion.agents.instrumentagents.instrument_driver import InstrumentDriver
 from ion.agents.instrumentagents.instrument_driver import InstrumentDriverClient
 from ion.agents.instrumentagents.instrument_fsm import InstrumentFSM
+from ion.agents.instrumentagents.instrument_framer import LineFramer
+from ion.agents.instrumentagents.instrument_framer import SampleDecoder
 from ion.agents.instrumentagents.instrument_constants import DriverCommand
 from ion.agents.instrumentagents.instrument_constants import DriverState
 from ion.agents.instrumentagents.instrument_constants import DriverEvent
@@ -58,6 +60,13 @@ class SBE37Prompt(BaseEnum):
     BAD_COMMAND = '?cmd S>'
     STOP_AUTOSAMPLE = 'S>\r\n'
 
+
+"""
+Month numbers by the abbreviated names in sample date output.
+"""
+SAMPLE_MONTHS = dict([(name, i + 1) for (i, name) in enumerate(
+    ['Jan','Feb','Mar','Apr','May','Jun','Jul','Aug','Sep','Oct','Nov','Dec'])])
+
 # Device states.
 class SBE37State(DriverState):
     """
@@ -254,10 +263,11 @@ class SBE37Driver(InstrumentDriver):
         self._instrument_connection = None
                 
         """
-        A string holding incomming line fragment not yet terminated by a
-        newline.
+        The framer splitting incomming data into lines and holding the
+        line fragment not yet terminated by a newline.
         """
-        self._line_buffer = ''
+        self._framer = LineFramer(SBE37Prompt.NEWLINE,
+                                  (SBE37Prompt.PROMPT, SBE37Prompt.BAD_COMMAND))
 
         """
         The queue holding completed line strings for processing by state
@@ -321,7 +331,7 @@ class SBE37Driver(InstrumentDriver):
         self._sample_pattern += r'(, *(-?\d+\.\d+))?(, *(-?\d+\.\d+))?'
         self._sample_pattern += r'(, *(\d+) +([a-zA-Z]+) +(\d+), *(\d+):(\d+):(\d+))?'
         self._sample_pattern += r'(, *(\d+)-(\d+)-(\d+), *(\d+):(\d+):(\d+))?'        
-        self._sample_parser = DeviceIOParser(self._sample_pattern,
+        self._sample_decoder = SampleDecoder(self._sample_pattern,
                                              self._get_sample)
         
         """
@@ -1181,57 +1191,45 @@ class SBE37Driver(InstrumentDriver):
         if IO_LOG:
             self._logfile.write(dataFrag)
 
-        # Add the fragment to the line buffer.
-        self._line_buffer += dataFrag
+        # Add the fragment to the framer and the lines it completes to the
+        # data buffer. The tail fragment if any stays in the framer to append
+        # further incomming data to.
+        lines = self._framer.feed(dataFrag)
+        self._data_lines.extend(lines)
+        new_lines = len(lines) > 0
 
-        new_lines = False
-   
-        # If the line buffer has newlines, extract complete lines and add
-        # to the data buffer. Keep the tail fragment if any in the line buffer
-        # to append further incomming data to.
-        if SBE37Prompt.NEWLINE in self._line_buffer:
-            lines = self._line_buffer.split(SBE37Prompt.NEWLINE)
-            self._line_buffer = lines[-1]
-            self._data_lines += lines[0:-1]
-            new_lines = True
-
-        # If the linebuffer ends with a prompt, extract and append the
-        # prefix data to the data buffer. Keep the prompt in the line buffer.
-        if self._line_buffer.endswith(SBE37Prompt.PROMPT):
-            self._data_lines.append(self._line_buffer.replace(SBE37Prompt.PROMPT,''))
-            self._line_buffer = SBE37Prompt.PROMPT
-            new_lines = True
-
-        # If the line buffer ends with a bad command prompt, extract and
+        # If the tail ends with a normal or bad command prompt, extract and
         # append the prefix data to the data buffer. Keep the prompt in the
-        # line buffer.
-        elif self._line_buffer.endswith(SBE37Prompt.BAD_COMMAND):
-            self._data_lines.append(self._line_buffer.
-                                    replace(SBE37Prompt.BAD_COMMAND,''))
-            self._line_buffer = SBE37Prompt.BAD_COMMAND
+        # framer.
+        prompt = self._framer.prompt()
+        if prompt:
+            self._data_lines.append(self._framer.tail.replace(prompt,''))
+            self._framer.reset(prompt)
             new_lines = True
 
+        line_buffer = self._framer.tail
+
         # If new complete lines are detected, send an EVENT_DATA_RECEIVED.
         if new_lines and self._fsm.get_current_state() == SBE37State.AUTOSAMPLE:
             yield self._fsm.on_event_async(SBE37Event.DATA_RECEIVED)
         
         # If a normal or bad command prompt is detected, send an
         # EVENT_PROMPTED
-        if self._line_buffer == SBE37Prompt.PROMPT:
+        if line_buffer == SBE37Prompt.PROMPT:
             if self._prompt_acquired_deferred:
                 d,self._prompt_acquired_deferred = \
                                     self._prompt_acquired_deferred, None
                 self._stop_wakeup()
                 d.callback(SBE37Prompt.PROMPT)
             
-        elif self._line_buffer == SBE37Prompt.BAD_COMMAND:
+        elif line_buffer == SBE37Prompt.BAD_COMMAND:
             if self._prompt_acquired_deferred:
                 d,self._prompt_acquired_deferred = \
                                     self._prompt_acquired_deferred, None
                 self._stop_wakeup()
                 d.callback(SBE37Prompt.BAD_COMMAND)
         
-        elif self._line_buffer == '' and len(self._data_lines)>0 and \
+        elif line_buffer == '' and len(self._data_lines)>0 and \
             self._data_lines[-1] == SBE37Prompt.PROMPT:
             if self._autosample_prompt_acquired_deferred:
                 d,self._autosample_prompt_acquired_deferred = \
@@ -2316,15 +2314,8 @@ class SBE37Driver(InstrumentDriver):
         samples.
         @retval A list of data sample dictionaries.
         """
-        samples = []
-        new_data_lines = []
-        for line in self._data_lines:
-            sample_data = self._sample_parser.parse(line)
-            if sample_data != None:
-                samples.append(sample_data)
-            else:
-                new_data_lines.append(line)
-        self._data_lines = new_data_lines
+        samples, self._data_lines = \
+            self._sample_decoder.decode(self._data_lines)
         
         return samples
 
@@ -2378,15 +2369,22 @@ class SBE37Driver(InstrumentDriver):
             if self.parameters.get(SBE37Channel.INSTRUMENT,SBE37Parameter.OUTPUTSAL)['value']:
                 sample_data['salinity'] = float(match.group(5))
             elif self.parameters.get(SBE37Channel.INSTRUMENT,SBE37Parameter.OUTPUTSV)['value']:
-                sample_data['sound_velocity'] = match.group(5)
+                sample_data['sound_velocity'] = float(match.group(5))
         
-        # Extract date and time if present.
+        # Extract date and time if present, straight from the matched
+        # fields as (year, month, day, hour, minute, second).
         sample_time = None
         if  match.group(8):
-            sample_time = time.strptime(match.group(8),', %d %b %Y, %H:%M:%S')
+            month = SAMPLE_MONTHS.get(match.group(10).capitalize(), None)
+            if month:
+                sample_time = (int(match.group(11)), month,
+                               int(match.group(9)), int(match.group(12)),
+                               int(match.group(13)), int(match.group(14)))
             
         elif match.group(15):
-            sample_time = time.strptime(match.group(15),', %m-%d-%Y, %H:%M:%S')
+            sample_time = (int(match.group(18)), int(match.group(16)),
+                           int(match.group(17)), int(match.group(19)),
+                           int(match.group(20)), int(match.group(21)))
         
         if sample_time:
             sample_data['device_time'] = \
@@ -26,8 +26,9 @@ from ion.agents.instrumentagents.instrument_constants import InstErrorCode
 from ion.core.exception import ApplicationError
 import ion.util.procutils as pu
 import ion.agents.instrumentagents.helper_NMEA0183 as NMEA
+from ion.agents.instrumentagents.instrument_framer import LineFramer
 
-from twisted.protocols import basic
+from twisted.internet.protocol import Protocol
 from twisted.internet.serialport import SerialPort
 from serial import PARITY_NONE, PARITY_EVEN, PARITY_ODD
 from serial import STOPBITS_ONE, STOPBITS_TWO
@@ -1667,15 +1668,23 @@ class NMEADeviceDriver(InstrumentDriver):
                 self._data_lines.append(nmeaLine)
             yield self.fsm.on_event_async(NMEADeviceEvent.DATA_RECEIVED)
             
-class NMEA0183Protocol(basic.LineReceiver):
+class NMEA0183Protocol(Protocol):
 
     def __init__(self, parent):
         self.parent = parent
+        self.framer = LineFramer(NMEADevicePrompt.NEWLINE)
+
+    def dataReceived(self, data):
+        """
+        Called by the twisted framework when serial data is received.
+        Frames the data into lines without rescanning earlier fragments.
+        """
+        for line in self.framer.feed(data):
+            self.lineReceived(line)
 
     def lineReceived(self, data):
         """
-        Called by the twisted framework when a serial line is received.
-        Override of basic.LineReceiver method.
+        Called by dataReceived when a serial line is received.
         Takes serial line from serial port and sends it through
         the parsing pipeline.
         Sends EVENT_DATA_RECEIVED if a good NMEA line came in.
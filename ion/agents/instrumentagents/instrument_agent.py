@@ -9,6 +9,8 @@
 
 
 import os
+import time
+import base64
 from uuid import uuid4
 
 from twisted.internet import defer, reactor
@@ -16,6 +18,7 @@ try:
     import json
 except:
     import simplejson as json
+import msgpack
 
 import ion.util.procutils as pu
 import ion.util.ionlog
@@ -33,12 +36,88 @@ from ion.agents.instrumentagents.instrument_constants import AgentParameter, \
     DriverAnnouncement, InstErrorCode, DriverParameter, DriverChannel, \
     ObservatoryState, DriverStatus, InstrumentCapability, DriverCapability, \
     MetadataParameter, AgentCommand, Datatype, TimeSource, ConnectionMethod, \
-    AgentEvent, AgentStatus, ObservatoryCapability
+    AgentEvent, AgentStatus, ObservatoryCapability, DataEncoding
 
 log = ion.util.ionlog.getLogger(__name__)
 
 DEBUG_PRINT = True if os.environ.get('DEBUG_PRINT',None) == 'True' else False
 
+"""
+Prefix marking a msgpack encoded data block. JSON blocks always start with
+a '[' so the two can be told apart by subscribers.
+"""
+MSGPACK_PREFIX = 'msgpack:'
+
+
+def encode_data_block(samples, encoding=DataEncoding.JSON):
+    """
+    Encode a list of samples for publication in a data block event.
+    @param samples A list of sample dicts.
+    @param encoding A DataEncoding value.
+    @retval The encoded string.
+    """
+    if encoding == DataEncoding.MSGPACK:
+        # The data block is a string field; base64 keeps it printable.
+        return MSGPACK_PREFIX + base64.b64encode(msgpack.packb(samples))
+    return json.dumps(samples)
+
+
+def decode_data_block(data_block):
+    """
+    Decode a data block published by an instrument agent in any encoding.
+    @param data_block The encoded string.
+    @retval A list of sample dicts.
+    """
+    if data_block.startswith(MSGPACK_PREFIX):
+        return msgpack.unpackb(base64.b64decode(data_block[len(MSGPACK_PREFIX):]))
+    return json.loads(data_block)
+
+
+class PublishStats(object):
+    """
+    Sample rate, batch size and publication latency of the data published
+    by one agent.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.start_time = None
+        self.samples = 0
+        self.batches = 0
+        self.max_batch_size = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.status_queries = 0
+
+    def add_sample(self):
+        if self.start_time is None:
+            self.start_time = time.time()
+        self.samples += 1
+
+    def add_batch(self, size, latency):
+        """
+        @param size The number of samples published.
+        @param latency Seconds from buffering the first sample to the end of
+            the publication.
+        """
+        self.batches += 1
+        self.max_batch_size = max(self.max_batch_size, size)
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def get_stats(self):
+        elapsed = time.time() - self.start_time if self.start_time else 0.0
+        return {'samples': self.samples,
+                'sample_rate': self.samples / elapsed if elapsed > 0 else 0.0,
+                'batches': self.batches,
+                'mean_batch_size': float(self.samples) / self.batches if self.batches else 0.0,
+                'max_batch_size': self.max_batch_size,
+                'mean_latency': self.total_latency / self.batches if self.batches else 0.0,
+                'max_latency': self.max_latency,
+                'status_queries': self.status_queries}
+
 """
 Instrument agent observatory metadata.
 """
@@ -77,6 +156,17 @@ ci_param_metadata = {
          MetadataParameter.MINIMUM_VALUE: 0,
          MetadataParameter.UNITS: 'Seconds',
          MetadataParameter.FRIENDLY_NAME: 'Max Transaction Acquire Timeout'},
+    AgentParameter.BUFFER_LATENCY:
+        {MetadataParameter.DATATYPE: Datatype.FLOAT,
+         MetadataParameter.LAST_CHANGE_TIMESTAMP: (0, 0),
+         MetadataParameter.MINIMUM_VALUE: 0,
+         MetadataParameter.UNITS: 'Seconds',
+         MetadataParameter.FRIENDLY_NAME: 'Max Buffered Data Latency'},
+    AgentParameter.DATA_ENCODING:
+        {MetadataParameter.DATATYPE: Datatype.ENUM,
+         MetadataParameter.LAST_CHANGE_TIMESTAMP: (0, 0),
+         MetadataParameter.VALID_VALUES: DataEncoding,
+         MetadataParameter.FRIENDLY_NAME: 'Data Block Encoding'},
 }
 
 
@@ -259,6 +349,37 @@ class InstrumentAgent(Process):
         """
         self._data_buffer_limit = 0
 
+        """
+        The longest time in seconds a sample is held in the data buffer
+        before the buffer is published, or 0 for no limit.
+        """
+        self._data_buffer_latency = 0
+
+        """
+        Time the first sample in the data buffer was received, and the
+        delayed call publishing the buffer when its latency expires.
+        """
+        self._data_buffer_start = None
+        self._data_buffer_timer = None
+
+        """
+        Encoding of published data blocks. See DataEncoding.
+        """
+        self._data_encoding = DataEncoding.JSON
+
+        """
+        Observatory state of the driver, tracked from its state change
+        announcements. None when unknown, in which case the driver is asked
+        on the next data sample.
+        """
+        self._observatory_state = None
+        self._state_changes = 0
+
+        """
+        Data publication metrics.
+        """
+        self._publish_stats = PublishStats()
+
         """
         A dict of device capabilities that is read from the driver upon
         driver construction. The dict persists whether we are connected to
@@ -303,6 +424,15 @@ class InstrumentAgent(Process):
         # Set initial state.
         self._fsm.start(AgentState.UNINITIALIZED)
 
+    def plc_terminate(self):
+        """
+        Drop the pending data buffer publication.
+        """
+        if self._data_buffer_timer != None and \
+            self._data_buffer_timer.active():
+            self._data_buffer_timer.cancel()
+        self._data_buffer_timer = None
+
     ###########################################################################
     #   State handlers.
     ###########################################################################
@@ -1311,6 +1441,16 @@ class InstrumentAgent(Process):
                     result[AgentParameter.BUFFER_SIZE] = \
                         (InstErrorCode.OK, self._data_buffer_limit)
 
+                if arg == AgentParameter.BUFFER_LATENCY or \
+                    arg == AgentParameter.ALL:
+                    result[AgentParameter.BUFFER_LATENCY] = \
+                        (InstErrorCode.OK, self._data_buffer_latency)
+
+                if arg == AgentParameter.DATA_ENCODING or \
+                    arg == AgentParameter.ALL:
+                    result[AgentParameter.DATA_ENCODING] = \
+                        (InstErrorCode.OK, self._data_encoding)
+
         # Unknown error.
         except:
             success = InstErrorCode.UNKNOWN_ERROR
@@ -1501,6 +1641,26 @@ class InstrumentAgent(Process):
                         set_errors = True
                         result[arg] = InstErrorCode.INVALID_PARAM_VALUE
 
+                elif arg == AgentParameter.BUFFER_LATENCY:
+                    if isinstance(val, (int, float)) and val >= 0:
+                        self._data_buffer_latency = val
+                        result[arg] = InstErrorCode.OK
+                        set_successes = True
+
+                    else:
+                        set_errors = True
+                        result[arg] = InstErrorCode.INVALID_PARAM_VALUE
+
+                elif arg == AgentParameter.DATA_ENCODING:
+                    if DataEncoding.has(val):
+                        self._data_encoding = val
+                        result[arg] = InstErrorCode.OK
+                        set_successes = True
+
+                    else:
+                        set_errors = True
+                        result[arg] = InstErrorCode.INVALID_PARAM_VALUE
+
         # Unknown error.
         except:
             success = InstErrorCode.UNKNOWN_ERROR
@@ -1697,6 +1857,12 @@ class InstrumentAgent(Process):
                     result[AgentStatus.PENDING_TRANSACTIONS] = \
                         (InstErrorCode.OK, pending_transaction_pids)
 
+                # Data publication metrics.
+                if arg == AgentStatus.PUBLISH_STATS or arg == \
+                    AgentStatus.ALL:
+                    result[AgentStatus.PUBLISH_STATS] = \
+                        (InstErrorCode.OK, self._publish_stats.get_stats())
+
         # Unknown error.
         except:
             success = InstErrorCode.UNKNOWN_ERROR
@@ -1984,6 +2150,10 @@ class InstrumentAgent(Process):
         # Publish errors, clean up transaction.
         finally:
 
+            # A command can change the driver mode without a state change
+            # announcement, e.g. NMEA START/STOP_AUTO_SAMPLING.
+            self._forget_observatory_state()
+
             # Publish any errors.
             if InstErrorCode.is_error(success):
                 desc_str = 'Error in op_execute_device: ' + \
@@ -2221,6 +2391,10 @@ class InstrumentAgent(Process):
         # Publish errors, clean up transaction.
         finally:
 
+            # A command can change the driver mode without a state change
+            # announcement, e.g. NMEA START/STOP_AUTO_SAMPLING.
+            self._forget_observatory_state()
+
             # Publish any errors.
             if InstErrorCode.is_error(success):
                 desc_str = 'Error in op_execute_device_direct: ' + \
@@ -2438,34 +2612,30 @@ class InstrumentAgent(Process):
             # other than these events.
             self._prev_data_transducer = transducer
 
-            # Get the driver observatory state.
-            key = (DriverChannel.INSTRUMENT, DriverStatus.OBSERVATORY_STATE)
-            reply = yield self._driver_client.get_status([key])
-            success = reply['success']
-            result = reply['result']
-            obs_status = result.get(key, None)
-            json_val = None
+            self._publish_stats.add_sample()
 
-            # If in streaming mode, buffer data and publish at intervals.
-            if InstErrorCode.is_ok(success) and obs_status != None:
-                if obs_status[1] == ObservatoryState.STREAMING:
-                    self._data_buffer.append(value)
-                    if len(self._data_buffer) > self._data_buffer_limit:
-                        # strval = self._get_data_string(self._data_buffer)
-                        json_val = json.dumps(self._data_buffer)
-                        self._data_buffer = []
-
-                # If not in streaming mode, always publish data upon receipt.
-                else:
-                    #strval = self._get_data_string(value)
-                    json_val = json.dumps([value])
+            # The observatory state is cached until the driver announces a
+            # state change or the agent forwards a command to the driver.
+            if self._observatory_state == None:
+                yield self._update_observatory_state()
+            obs_state = self._observatory_state
 
-            #if len(strval) > 0:
-            if json_val != None:
-                origin = "%s.%s" % (transducer, self.event_publisher_origin)
-                log.debug("Instrument Agent publishing data: %s on origin: %s", json_val, origin)
-                yield self._data_publisher.create_and_publish_event(\
-                    origin=origin, data_block=json_val)
+            # If in streaming mode, buffer data and publish at intervals.
+            if obs_state == ObservatoryState.STREAMING:
+                if len(self._data_buffer) == 0:
+                    self._data_buffer_start = time.time()
+                    if self._data_buffer_limit > 0 and \
+                        self._data_buffer_latency > 0:
+                        self._data_buffer_timer = reactor.callLater(\
+                            self._data_buffer_latency,
+                            self._data_buffer_timeout)
+                self._data_buffer.append(value)
+                if len(self._data_buffer) > self._data_buffer_limit:
+                    yield self._publish_data_buffer()
+
+            # If not in streaming mode, always publish data upon receipt.
+            elif obs_state != None:
+                yield self._publish_data([value], transducer, time.time())
 
         # Driver configuration changed, publish config.
         elif type == DriverAnnouncement.CONFIG_CHANGE:
@@ -2488,18 +2658,11 @@ class InstrumentAgent(Process):
         elif type == DriverAnnouncement.ERROR:
             pass
 
-        # If the driver state changed, publish any buffered data remaining.
+        # If the driver state changed, publish any buffered data remaining
+        # and forget the observatory state.
         elif type == DriverAnnouncement.STATE_CHANGE:
-            json_val = None
-            if len(self._data_buffer) > 0:
-                #strval = self._get_data_string(self._data_buffer)
-                json_val = json.dumps(self._data_buffer)
-                #if len(strval) > 0:
-                if json_val != None:
-                    origin = "%s.%s" % (self._prev_data_transducer,
-                                        self.event_publisher_origin)
-                    yield self._log_publisher.create_and_publish_event(origin=\
-                                                origin, description=json_val)
+            self._forget_observatory_state()
+            yield self._publish_data_buffer()
 
         elif type == DriverAnnouncement.EVENT_OCCURRED:
             pass
@@ -2510,6 +2673,76 @@ class InstrumentAgent(Process):
         self._debug_print_driver_event(type, transducer, value)
 
 
+    def _forget_observatory_state(self):
+        """
+        Drop the cached observatory state, and the answer to any query for it
+        still outstanding, so the driver is asked on the next data received.
+        """
+        self._observatory_state = None
+        self._state_changes += 1
+
+    @defer.inlineCallbacks
+    def _update_observatory_state(self):
+        """
+        Ask the driver for its observatory state and remember it, unless the
+        driver state changes while the query is outstanding.
+        """
+        state_changes = self._state_changes
+        self._publish_stats.status_queries += 1
+
+        key = (DriverChannel.INSTRUMENT, DriverStatus.OBSERVATORY_STATE)
+        reply = yield self._driver_client.get_status([key])
+        success = reply['success']
+        result = reply['result']
+        obs_status = result.get(key, None) if result else None
+
+        if InstErrorCode.is_ok(success) and obs_status != None and \
+            state_changes == self._state_changes:
+            self._observatory_state = obs_status[1]
+
+    def _publish_data_buffer(self):
+        """
+        Publish and empty the data buffer.
+        """
+        if self._data_buffer_timer != None and \
+            self._data_buffer_timer.active():
+            self._data_buffer_timer.cancel()
+        self._data_buffer_timer = None
+
+        samples = self._data_buffer
+        self._data_buffer = []
+        if len(samples) == 0:
+            return defer.succeed(None)
+
+        return self._publish_data(samples, self._prev_data_transducer,
+                                  self._data_buffer_start)
+
+    def _data_buffer_timeout(self):
+        """
+        Publish the data buffer when its oldest sample has waited the
+        buffer latency.
+        """
+        self._data_buffer_timer = None
+        d = self._publish_data_buffer()
+        d.addErrback(lambda failure: log.error(
+            'Error publishing buffered data: %s', failure.getErrorMessage()))
+
+    @defer.inlineCallbacks
+    def _publish_data(self, samples, transducer, start_time):
+        """
+        Publish a list of samples in one data block.
+        @param samples A list of sample dicts.
+        @param transducer The transducer producing the samples.
+        @param start_time Time the first sample was received.
+        """
+        data_block = encode_data_block(samples, self._data_encoding)
+        origin = "%s.%s" % (transducer, self.event_publisher_origin)
+        log.debug("Instrument Agent publishing %d samples on origin: %s",
+                  len(samples), origin)
+        yield self._data_publisher.create_and_publish_event(\
+            origin=origin, data_block=data_block)
+        self._publish_stats.add_batch(len(samples), time.time() - start_time)
+
     ###########################################################################
     #   Driver lifecycle.
     ###########################################################################
@@ -2583,6 +2816,7 @@ class InstrumentAgent(Process):
             self._condemned_drivers.append(self._driver_pid)
             self._driver_pid = None
             self._driver_client = None
+            self._observatory_state = None
 
     def _stop_condemned_drivers(self):
         """
@@ -2714,6 +2948,8 @@ class InstrumentAgent(Process):
         params[AgentParameter.DRIVER_CLIENT_DESC] = self._client_desc
         params[AgentParameter.DRIVER_CONFIG] = self._driver_config
         params[AgentParameter.BUFFER_SIZE] = self._data_buffer_limit
+        params[AgentParameter.BUFFER_LATENCY] = self._data_buffer_latency
+        params[AgentParameter.DATA_ENCODING] = self._data_encoding
         return params
 
     def _debug_print_driver_event(self, type, transducer, value):
@@ -241,6 +241,8 @@ class AgentParameter(BaseEnum):
     DRIVER_CLIENT_DESC = 'AGENT_PARAM_DRIVER_CLIENT_DESC'
     DRIVER_CONFIG = 'AGENT_PARAM_DRIVER_CONFIG'
     BUFFER_SIZE = 'AGENT_PARAM_BUFFER_SIZE'
+    BUFFER_LATENCY = 'AGENT_PARAM_BUFFER_LATENCY'
+    DATA_ENCODING = 'AGENT_PARAM_DATA_ENCODING'
     ALL = 'AGENT_PARAM_ALL'
 
 """
@@ -257,6 +259,7 @@ class AgentStatus(BaseEnum):
     BUFFER_SIZE = 'AGENT_STATUS_BUFFER_SIZE'
     AGENT_VERSION = 'AGENT_STATUS_AGENT_VERSION'
     PENDING_TRANSACTIONS = 'AGENT_STATUS_PENDING_TRANSACTIONS'
+    PUBLISH_STATS = 'AGENT_STATUS_PUBLISH_STATS'
     ALL = 'AGENT_STATUS_ALL'
 
 """
@@ -356,6 +359,17 @@ class ConnectionMethod(BaseEnum):
     PART_TIME_RANDOM = 'CONNECTION_METHOD_PART_TIME_RANDOM'    
     
 
+"""
+Encoding of the data blocks published by an agent.
+"""
+class DataEncoding(BaseEnum):
+    """
+    Common data block encoding enum.
+    """
+    JSON = 'DATA_ENCODING_JSON' # JSON list of samples.
+    MSGPACK = 'DATA_ENCODING_MSGPACK' # Base64 msgpack list of samples.
+
+
 """
 Observatory alarm conditions.
 """
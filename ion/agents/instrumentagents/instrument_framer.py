@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+"""
+@file ion/agents/instrumentagents/instrument_framer.py
+@brief Incremental line framing and sample decoding for instrument drivers.
+"""
+
+import re
+
+import ion.util.ionlog
+log = ion.util.ionlog.getLogger(__name__)
+
+"""
+Longest partial line kept by a framer before it is discarded.
+"""
+MAX_LINE_LENGTH = 16384
+
+
+class LineFramer(object):
+    """
+    Splits a stream of device output fragments into complete lines and
+    detects a prompt at the end of the pending partial line.
+
+    Fragments are appended to a bytearray and only the bytes not yet
+    scanned are searched for the newline, so a burst of lines or a long
+    line arriving in many fragments is framed in linear time. Consumed
+    lines are dropped from the front of the buffer as they are returned.
+    """
+
+    def __init__(self, newline='\r\n', prompts=(), max_length=MAX_LINE_LENGTH):
+        """
+        @param newline The line terminator.
+        @param prompts Device prompts which end output without a newline.
+        @param max_length Longest partial line to keep.
+        """
+        self.newline = newline
+        # Longest first, so a prompt ending with another prompt is found.
+        self.prompts = sorted(prompts, key=len, reverse=True)
+        self.max_length = max_length
+
+        self._buffer = bytearray()
+        self._scanned = 0
+
+    def feed(self, data):
+        """
+        Add a fragment of device output.
+        @param data A string fragment.
+        @retval A list of the lines completed by the fragment, without
+            their terminators.
+        """
+        buf = self._buffer
+        buf.extend(data)
+
+        lines = []
+        start = 0
+        # A newline may straddle the previous fragment and this one.
+        pos = buf.find(self.newline, max(self._scanned - len(self.newline) + 1, 0))
+        while pos != -1:
+            lines.append(str(buf[start:pos]))
+            start = pos + len(self.newline)
+            pos = buf.find(self.newline, start)
+
+        if start > 0:
+            del buf[:start]
+
+        if self.max_length and len(buf) > self.max_length:
+            log.warn('Discarding %d bytes of device output without a newline', len(buf))
+            del buf[:]
+
+        self._scanned = len(buf)
+        return lines
+
+    @property
+    def tail(self):
+        """
+        The pending output not terminated by a newline.
+        """
+        return str(self._buffer)
+
+    def prompt(self):
+        """
+        @retval The prompt the pending output ends with, or None.
+        """
+        for prompt in self.prompts:
+            if self._buffer.endswith(prompt):
+                return prompt
+        return None
+
+    def reset(self, tail=''):
+        """
+        Replace the pending output.
+        @param tail The new pending output.
+        """
+        self._buffer = bytearray(tail)
+        self._scanned = 0
+
+
+class SampleDecoder(object):
+    """
+    Decodes the sample lines in a burst of device output with one
+    precompiled regular expression.
+    """
+
+    def __init__(self, pattern, getval):
+        """
+        @param pattern The regular expression matching a sample line.
+        @param getval A function converting the match object to a sample.
+        """
+        self.pattern = pattern
+        self.regex = re.compile(pattern)
+        self.getval = getval
+
+    def decode(self, lines):
+        """
+        @param lines A list of lines of device output.
+        @retval A tuple of the list of samples decoded and the list of the
+            lines which are not samples, both in their original order.
+        """
+        match = self.regex.match
+        getval = self.getval
+        samples = []
+        other = []
+        for line in lines:
+            m = match(line)
+            if m:
+                samples.append(getval(m))
+            else:
+                other.append(line)
+        return samples, other
@@ -10,6 +10,7 @@
 import ion.util.ionlog
 log = ion.util.ionlog.getLogger(__name__)
 from twisted.internet import defer
+from twisted.trial import unittest
 from ion.test.iontest import IonTestCase
 
 import ion.util.procutils as pu
@@ -27,6 +28,11 @@ from ion.agents.instrumentagents.instrument_constants import InstrumentCapabilit
 from ion.agents.instrumentagents.instrument_constants import AgentState
 from ion.agents.instrumentagents.instrument_constants import MetadataParameter
 from ion.agents.instrumentagents.instrument_constants import InstErrorCode
+from ion.agents.instrumentagents.instrument_constants import DataEncoding
+from ion.agents.instrumentagents.instrument_constants import DriverAnnouncement
+from ion.agents.instrumentagents.instrument_constants import DriverChannel
+from ion.agents.instrumentagents.instrument_constants import DriverCommand
+from ion.agents.instrumentagents.instrument_constants import ObservatoryState
 
 class TestInstrumentAgent(IonTestCase):
 
@@ -869,4 +875,105 @@ class TestInstrumentAgent(IonTestCase):
         #print testsub.msgs[0]['content']
         #self.assertEqual(testsub.msgs[0]['content'].name, u"Transaction ended!")
         
-        
\ No newline at end of file
+        
+
+
+class TestDataBlock(unittest.TestCase):
+
+    def setUp(self):
+        self.samples = [{'temperature': 10.5, 'time': '2011-05-18T15:32:36'},
+                        {'temperature': 10.6, 'time': '2011-05-18T15:32:37'}]
+
+    def test_encoding(self):
+        json_block = instrument_agent.encode_data_block(self.samples)
+        self.assertEqual(instrument_agent.decode_data_block(json_block), self.samples)
+
+        msgpack_block = instrument_agent.encode_data_block(self.samples, DataEncoding.MSGPACK)
+        self.assert_(msgpack_block.startswith(instrument_agent.MSGPACK_PREFIX))
+        self.assertEqual(instrument_agent.decode_data_block(msgpack_block), self.samples)
+
+    def test_publish_stats(self):
+        stats = instrument_agent.PublishStats()
+        for i in range(6):
+            stats.add_sample()
+        stats.add_batch(4, 0.5)
+        stats.add_batch(2, 0.1)
+
+        result = stats.get_stats()
+        self.assertEqual(result['samples'], 6)
+        self.assertEqual(result['batches'], 2)
+        self.assertEqual(result['mean_batch_size'], 3.0)
+        self.assertEqual(result['max_batch_size'], 4)
+        self.assertEqual(result['max_latency'], 0.5)
+
+
+class FakeDriverClient(object):
+    """
+    Answers the observatory state query and counts how often it is asked
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.status_calls = 0
+
+    def get_status(self, keys):
+        self.status_calls += 1
+        result = dict([(key, (InstErrorCode.OK, self.state)) for key in keys])
+        return defer.succeed({'success': InstErrorCode.OK, 'result': result})
+
+    def execute(self, channels, command, timeout):
+        return defer.succeed({'success': InstErrorCode.OK, 'result': {}})
+
+
+class TestObservatoryStateCache(unittest.TestCase):
+
+    def setUp(self):
+        self.agent = instrument_agent.InstrumentAgent()
+        self.driver = FakeDriverClient(ObservatoryState.ACQUIRING)
+        self.agent._driver_client = self.driver
+        self.agent._is_child_process = lambda name: True
+
+        self.published = []
+        def publish_data(samples, transducer, start_time):
+            self.published.extend(samples)
+            return defer.succeed(None)
+        self.agent._publish_data = publish_data
+
+        self.replies = []
+        def reply_ok(msg, content=None, headers=None):
+            self.replies.append(content)
+            return defer.succeed(None)
+        self.agent.reply_ok = reply_ok
+
+    def announce(self, type, value='sample'):
+        content = {'type': type, 'transducer': DriverChannel.INSTRUMENT, 'value': value}
+        return self.agent.op_driver_event_occurred(content, {'sender-name': 'driver'}, None)
+
+    @defer.inlineCallbacks
+    def test_data_uses_cached_state(self):
+        for i in range(3):
+            yield self.announce(DriverAnnouncement.DATA_RECEIVED, 'sample %d' % i)
+        self.assertEqual(self.driver.status_calls, 1)
+        self.assertEqual(self.published, ['sample 0', 'sample 1', 'sample 2'])
+
+        # A state change forces the driver to be asked again
+        yield self.announce(DriverAnnouncement.STATE_CHANGE, 'state')
+        yield self.announce(DriverAnnouncement.DATA_RECEIVED)
+        yield self.announce(DriverAnnouncement.DATA_RECEIVED)
+        self.assertEqual(self.driver.status_calls, 2)
+
+    @defer.inlineCallbacks
+    def test_execute_forgets_state(self):
+        yield self.announce(DriverAnnouncement.DATA_RECEIVED)
+        self.assertEqual(self.driver.status_calls, 1)
+
+        # Starting autosample changes the mode without a state change announcement
+        self.agent._verify_transaction = lambda tid, optype: defer.succeed(InstErrorCode.OK)
+        self.agent._fsm.get_current_state = lambda: AgentState.OBSERVATORY_MODE
+        content = {'channels': [DriverChannel.INSTRUMENT], 'command': [DriverCommand.START_AUTO_SAMPLING],
+                   'transaction_id': 'none'}
+        yield self.agent.op_execute_device(content, {}, None)
+        self.assertEqual(self.replies[-1]['success'], InstErrorCode.OK)
+
+        yield self.announce(DriverAnnouncement.DATA_RECEIVED)
+        self.assertEqual(self.driver.status_calls, 2)
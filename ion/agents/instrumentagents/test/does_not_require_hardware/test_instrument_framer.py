@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+"""
+@file ion/agents/instrumentagents/test/does_not_require_hardware/test_instrument_framer.py
+@test ion.agents.instrumentagents.instrument_framer
+"""
+
+import ion.util.ionlog
+log = ion.util.ionlog.getLogger(__name__)
+
+from twisted.trial import unittest
+
+from ion.agents.instrumentagents.instrument_framer import LineFramer, SampleDecoder
+
+
+class LineFramerTest(unittest.TestCase):
+
+    def test_lines(self):
+        framer = LineFramer('\r\n')
+
+        self.assertEqual(framer.feed('one\r\ntw'), ['one'])
+        self.assertEqual(framer.tail, 'tw')
+
+        # A terminator split across fragments
+        self.assertEqual(framer.feed('o\r'), [])
+        self.assertEqual(framer.feed('\nthree\r\nfour\r\n'), ['two', 'three', 'four'])
+        self.assertEqual(framer.tail, '')
+
+    def test_burst(self):
+        framer = LineFramer('\r\n')
+        data = ''.join(['%d, 0.5, 1.0\r\n' % i for i in xrange(1000)])
+
+        lines = []
+        for i in xrange(0, len(data), 7):
+            lines.extend(framer.feed(data[i:i + 7]))
+
+        self.assertEqual(len(lines), 1000)
+        self.assertEqual(lines[999], '999, 0.5, 1.0')
+
+    def test_prompt(self):
+        framer = LineFramer('\r\n', ('S>', '?cmd S>'))
+
+        framer.feed('ds\r\nstatus')
+        self.assertEqual(framer.prompt(), None)
+
+        framer.feed(' ok\r\nS>')
+        self.assertEqual(framer.prompt(), 'S>')
+
+        # The longest prompt wins
+        framer.reset()
+        framer.feed('?cmd S>')
+        self.assertEqual(framer.prompt(), '?cmd S>')
+
+        framer.reset('S>')
+        self.assertEqual(framer.tail, 'S>')
+        self.assertEqual(framer.feed('\r\n'), ['S>'])
+
+    def test_max_length(self):
+        framer = LineFramer('\r\n', max_length=10)
+
+        framer.feed('x' * 11)
+        self.assertEqual(framer.tail, '')
+        self.assertEqual(framer.feed('line\r\n'), ['line'])
+
+
+class SampleDecoderTest(unittest.TestCase):
+
+    def test_decode(self):
+        decoder = SampleDecoder(r'^(-?\d+\.\d+), *(-?\d+\.\d+)$',
+                                lambda m: (float(m.group(1)), float(m.group(2))))
+
+        samples, other = decoder.decode(['20.1, 0.5', 'S>', '-1.5,2.0', 'ds'])
+        self.assertEqual(samples, [(20.1, 0.5), (-1.5, 2.0)])
+        self.assertEqual(other, ['S>', 'ds'])
@@ -15,6 +15,8 @@ import os
 import time
 
 from twisted.internet import defer
+from twisted.internet import reactor
+from twisted.internet import error
 
 from zope.interface import implements
 
@@ -22,6 +24,7 @@ from telephus.client import CassandraClient
 from telephus.protocol import ManagedCassandraClientFactory
 from telephus.cassandra.ttypes import NotFoundException, KsDef, CfDef
 from telephus.cassandra.ttypes import ColumnDef, IndexExpression, IndexOperator
+from telephus.cassandra.ttypes import UnavailableException, TimedOutException
 
 from ion.core.data import store
 from ion.core.data.store import Query, SimpleBatchRequest
@@ -29,6 +32,7 @@ from ion.core.data.store import Query, SimpleBatchRequest
 from ion.core.data.store import IndexStoreError
 
 from ion.util.tcp_connections import TCPConnection
+from ion.util.state_object import BasicLifecycleObject
 
 from ion.util.timeout import timeout
 
@@ -134,8 +138,45 @@ class QueryStats(object):
         return tuple(stats)
 
 
+class PoolStats(object):
+    """
+    Utilization of a connection pool - the number of requests outstanding when each request is sent
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sum_pending = 0
+        self.max_pending = 0
+        self.retries = 0
+        self.failures = 0
+
+    def add_stats(self, pending):
+        self.count += 1
+        self.sum_pending += pending
+        self.max_pending = max(self.max_pending, pending)
+
+    def pool_stats(self):
+        return (self.count,
+                float(self.sum_pending)/float(max(self.count,1)),
+                self.max_pending,
+                self.retries,
+                self.failures)
+
+
 # Don't let cassandra timeout cause failure
 cassandra_timeout = CONF.getValue('CassandraTimeout',60.0)
+
+# Connection pool settings for the pooled stores
+POOL_SIZE = CONF.getValue('pool_size', 4)
+POOL_POLICY = CONF.getValue('pool_policy', 'least_loaded')
+POOL_RETRIES = CONF.getValue('pool_retries', 2)
+POOL_FAILURE_BACKOFF = CONF.getValue('pool_failure_backoff', 5.0)
+
+LEAST_LOADED = 'least_loaded'
+ROUND_ROBIN = 'round_robin'
+
+# Errors which mean the node or the connection failed - the request can be sent to another host
+RETRYABLE_ERRORS = (error.ConnectError, error.ConnectionLost, error.ConnectionDone, UnavailableException, TimedOutException)
 class CassandraError(Exception):
     """
     An exception class for ION Cassandra Client errors
@@ -680,26 +721,12 @@ class CassandraIndexedStore(CassandraStore):
 
 
         predicates = query_predicates.get_predicates()
-        def fix_preds(query_tuple):
-            if query_tuple[2] == Query.EQ:
-                new_pred = IndexOperator.EQ
-            elif query_tuple[2] == Query.GT:
-                new_pred = IndexOperator.GT
-            else:
-                raise CassandraError("Illegal predicate value")
-            args = {'column_name':query_tuple[0], 'op':new_pred, 'value': query_tuple[1]}
-            return IndexExpression(**args)
-        selection_predicates = map(fix_preds, predicates)
+        selection_predicates = self._selection_predicates(predicates)
         #log.debug("Calling get_indexed_slices selection_predicate %s " % (selection_predicates,))
         
         rows = yield self.client.get_indexed_slices(self._cache_name, selection_predicates, count=row_count)
         #log.info("Got rows back")
-        result ={}
-        for row in rows:
-            row_vals = {}
-            for column in row.columns:
-                row_vals[column.column.name] = column.column.value
-            result[row.key] = row_vals
+        result = self._rows_to_dict(rows)
 
 
         toc = time.time()
@@ -715,6 +742,75 @@ class CassandraIndexedStore(CassandraStore):
 
         defer.returnValue(result)
         
+    @timeout(cassandra_timeout)
+    @defer.inlineCallbacks
+    def query_page(self, query_predicates, page_size=None, start_key=''):
+        """
+        Search for one page of the rows matching a query, in the order of the row keys in the cluster.
+
+        @param query_predicates is an instance of store.Query.
+        @param page_size the most rows to return - store.QUERY_PAGE_SIZE by default
+        @param start_key the continuation token from the previous page - the key of the first row of this page
+
+        @retVal a tuple of a dictionary containing the keys and values of the page of rows which match the query and
+        the continuation token for the next page - None if there are no more rows.
+        """
+        tic = time.time()
+
+        page_size = page_size or store.QUERY_PAGE_SIZE
+
+        predicates = query_predicates.get_predicates()
+        selection_predicates = self._selection_predicates(predicates)
+
+        # Ask for one extra row - its key starts the next page
+        rows = yield self.client.get_indexed_slices(self._cache_name, selection_predicates, count=page_size + 1, start_key=start_key)
+
+        next_key = None
+        if len(rows) > page_size:
+            next_key = rows[page_size].key
+            rows = rows[:page_size]
+
+        result = self._rows_to_dict(rows)
+
+        toc = time.time()
+
+        if toc - tic > 4.0:
+            log.info('Cassandra Query Page operation elapsed time %f; # of rows returned: %d, # of predicates in request: %d' % (toc - tic, len(rows), len(predicates)))
+
+        self.query_stats.add_stats(tic,toc,len(predicates), len(rows))
+
+        if self.query_stats.t_count >= (self.stats_out/10):
+            log.critical('Cassandra Index Store Query Stats per predicate (mean time(seconds)/max time(seconds)/mean # of rows/max # of rows/count): 1 - %f/%f/%f/%d/%d; 2 - %f/%f/%f/%d/%d; 3 - %f/%f/%f/%d/%d;' % self.query_stats.query_stats())
+            self.query_stats.__init__()
+
+        defer.returnValue((result, next_key))
+
+    def _selection_predicates(self, predicates):
+        """
+        Convert the predicates of a store.Query to thrift IndexExpressions
+
+        raises a CassandraError if a predicate is malformed.
+        """
+        def fix_preds(query_tuple):
+            if query_tuple[2] == Query.EQ:
+                new_pred = IndexOperator.EQ
+            elif query_tuple[2] == Query.GT:
+                new_pred = IndexOperator.GT
+            else:
+                raise CassandraError("Illegal predicate value")
+            args = {'column_name':query_tuple[0], 'op':new_pred, 'value': query_tuple[1]}
+            return IndexExpression(**args)
+        return map(fix_preds, predicates)
+
+    def _rows_to_dict(self, rows):
+        result ={}
+        for row in rows:
+            row_vals = {}
+            for column in row.columns:
+                row_vals[column.column.name] = column.column.value
+            result[row.key] = row_vals
+        return result
+
     @timeout(cassandra_timeout)
     @defer.inlineCallbacks
     def get_query_attributes(self):
@@ -735,6 +831,215 @@ class CassandraIndexedStore(CassandraStore):
 
 
 
+class PooledConnection(object):
+    """
+    One connection in a CassandraConnectionPool
+    """
+
+    def __init__(self, host, port, manager):
+        self.host = host
+        self.port = port
+        self.manager = manager
+        self.client = CassandraClient(manager)
+        self.connector = None
+
+        self.pending = 0
+        self.requests = 0
+        self.failures = 0
+        self.failed_until = 0.0
+
+    def connect(self):
+        self.connector = reactor.connectTCP(self.host, self.port, self.manager)
+
+    def disconnect(self):
+        if self.connector is not None:
+            self.connector.disconnect()
+            self.connector = None
+        self.manager.shutdown()
+
+
+class CassandraConnectionPool(object):
+    """
+    A pool of connections to the hosts of a Cassandra cluster. The connections are spread evenly over the hosts and
+    each request goes to the connection with the fewest requests outstanding (least_loaded) or to the next connection
+    in turn (round_robin). A request which fails because of the node or the connection is sent again on a connection
+    to another host, and the failed connection is passed over for pool_failure_backoff seconds.
+    """
+
+    stats = PoolStats()
+
+    stats_out = 10000
+
+    def __init__(self, hosts, manager_kwargs, pool_size=None, policy=None, retries=None):
+        """
+        @param hosts A list of (host, port) tuples
+        @param manager_kwargs The keyword arguments for each ManagedCassandraClientFactory
+        """
+        if not hosts:
+            raise CassandraError('A connection pool needs at least one host')
+
+        self.pool_size = max(pool_size or POOL_SIZE, len(hosts))
+        self.policy = policy or POOL_POLICY
+        if self.policy not in (LEAST_LOADED, ROUND_ROBIN):
+            raise CassandraError('Unknown connection pool policy: %s' % self.policy)
+        if retries is None:
+            retries = POOL_RETRIES
+        self.retries = retries
+
+        self.connections = []
+        for i in range(self.pool_size):
+            host, port = hosts[i % len(hosts)]
+            self.connections.append(self._new_connection(host, port, manager_kwargs))
+
+        self._next = 0
+
+    def _new_connection(self, host, port, manager_kwargs):
+        return PooledConnection(host, port, ManagedCassandraClientFactory(**manager_kwargs))
+
+    def connect(self):
+        for conn in self.connections:
+            conn.connect()
+        log.info('Connected a pool of %d connections to %s' % (len(self.connections), ', '.join(sorted(set(['%s:%s' % (conn.host, conn.port) for conn in self.connections])))))
+
+    def disconnect(self):
+        for conn in self.connections:
+            conn.disconnect()
+        log.info('Disconnected the connection pool')
+
+    def _choose(self, exclude_hosts):
+        """
+        Pick the connection for the next request, avoiding failed connections and the hosts already tried when
+        there is any alternative.
+        """
+        now = time.time()
+        healthy = [conn for conn in self.connections if conn.failed_until <= now]
+        candidates = [conn for conn in healthy if (conn.host, conn.port) not in exclude_hosts] or healthy or self.connections
+
+        if self.policy == ROUND_ROBIN:
+            conn = candidates[self._next % len(candidates)]
+            self._next += 1
+            return conn
+
+        return min(candidates, key=lambda conn: conn.pending)
+
+    @defer.inlineCallbacks
+    def submit(self, method, *args, **kwargs):
+        """
+        Call method on the client of a connection from the pool
+        """
+        tried = set()
+        attempt = 0
+        while True:
+            conn = self._choose(tried)
+
+            conn.pending += 1
+            conn.requests += 1
+            self.stats.add_stats(sum([c.pending for c in self.connections]))
+            try:
+                result = yield getattr(conn.client, method)(*args, **kwargs)
+            except RETRYABLE_ERRORS, ex:
+                conn.failures += 1
+                conn.failed_until = time.time() + POOL_FAILURE_BACKOFF
+                tried.add((conn.host, conn.port))
+
+                if attempt >= self.retries:
+                    self.stats.failures += 1
+                    raise
+
+                log.warn('Cassandra %s failed on %s:%s - retrying on another host: %s' % (method, conn.host, conn.port, ex))
+                self.stats.retries += 1
+                attempt += 1
+                continue
+            finally:
+                conn.pending -= 1
+
+            break
+
+        if self.stats.count >= self.stats_out:
+            log.critical('Cassandra Connection Pool Stats(%d requests): outstanding requests (mean/max) %f/%d; retries - %d, failures - %d;' % self.stats.pool_stats())
+            self.stats.__init__()
+
+        defer.returnValue(result)
+
+    def get_stats(self):
+        """
+        @retval A list of (host, port, requests outstanding, requests, failures) for each connection
+        """
+        return [(conn.host, conn.port, conn.pending, conn.requests, conn.failures) for conn in self.connections]
+
+
+class PooledCassandraClient(object):
+    """
+    Stands in for a telephus CassandraClient - each call is sent through a connection pool
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            return self._pool.submit(name, *args, **kwargs)
+        return call
+
+
+class CassandraPooledStore(CassandraStore):
+    """
+    A CassandraStore which sends its requests over a pool of connections to all of the hosts of the persistent
+    technology instead of a single connection to the first one.
+    """
+
+    def __init__(self, persistent_technology, persistent_archive, credentials, cache, pool_size=None, policy=None):
+        """
+        functional wrapper around a pool of client connections
+        """
+        BasicLifecycleObject.__init__(self)
+
+        hosts = [(host.host, host.port) for host in persistent_technology.hosts]
+
+        self._keyspace = persistent_archive.name
+
+        authorization_dictionary = {'username': credentials.username, 'password': credentials.password}
+        self._init_pool(hosts, {'keyspace':self._keyspace, 'credentials':authorization_dictionary}, pool_size, policy)
+
+        self._cache = cache
+        self._cache_name = cache.name
+
+    def _init_pool(self, hosts, manager_kwargs, pool_size=None, policy=None):
+        self._pool = CassandraConnectionPool(hosts, manager_kwargs, pool_size=pool_size, policy=policy)
+        self.client = PooledCassandraClient(self._pool)
+
+    def get_pool_stats(self):
+        return self._pool.get_stats()
+
+    def on_activate(self, *args, **kwargs):
+        self._pool.connect()
+
+    def on_deactivate(self, *args, **kwargs):
+        self._pool.disconnect()
+        log.info('on_deactivate: Lose TCP Connections')
+
+    def on_terminate(self, *args, **kwargs):
+        self._pool.disconnect()
+        log.info('on_terminate: Lose TCP Connections')
+
+    def on_error(self, *args, **kwargs):
+        self._pool.disconnect()
+        log.info('on_error: Lose TCP Connections')
+
+
+class CassandraPooledIndexedStore(CassandraPooledStore, CassandraIndexedStore):
+    """
+    A CassandraIndexedStore which sends its requests over a pool of connections
+    """
+
+    def __init__(self, persistent_technology, persistent_archive, credentials, cache, pool_size=None, policy=None):
+        CassandraPooledStore.__init__(self, persistent_technology, persistent_archive, credentials, cache, pool_size, policy)
+        self._query_attribute_names = None
+
+
 class CassandraStorageResource:
     """
     This class holds the connection information in the
@@ -12,6 +12,7 @@ services are not running yet.
 from telephus.client import CassandraClient
 from telephus.protocol import ManagedCassandraClientFactory
 from ion.util.tcp_connections import TCPConnection
+from ion.util.state_object import BasicLifecycleObject
 from telephus.cassandra.ttypes import KsDef, CfDef, ColumnDef, NotFoundException
 
 from twisted.internet import defer
@@ -20,7 +21,7 @@ from twisted.internet import reactor
 from ion.core.process import process
 from ion.core.process.process import ProcessFactory
 
-from ion.core.data.cassandra import CassandraStore, CassandraIndexedStore
+from ion.core.data.cassandra import CassandraStore, CassandraIndexedStore, CassandraPooledStore, CassandraPooledIndexedStore
 from ion.core.data.storage_configuration_utility import PERSISTENT_ARCHIVE, STORAGE_PROVIDER, DEFAULT_KEYSPACE_NAME
 from ion.core.data import storage_configuration_utility
 import ion.util.ionlog
@@ -41,7 +42,19 @@ def parse_cassandra_config(username, password, storage_provider, keyspace=None):
     host = storage_provider["host"]
     port = storage_provider["port"]
 
+    client_factory_kwargs = parse_client_factory_kwargs(username, password, keyspace)
 
+    manager = ManagedCassandraClientFactory(**client_factory_kwargs)
+
+    log.info('CassandraBootStrap Manager: Host - %s, Port - %s' % (host, port))
+
+    return (host, port, manager)
+
+
+def parse_client_factory_kwargs(username, password, keyspace=None):
+    """
+    Get the keyword arguments for a ManagedCassandraClientFactory
+    """
     client_factory_kwargs = {'check_api_version':True}
 
     if keyspace is not None:
@@ -51,11 +64,22 @@ def parse_cassandra_config(username, password, storage_provider, keyspace=None):
         authorization_dictionary = {"username":username, "password":password}
         client_factory_kwargs['credentials'] = authorization_dictionary
 
-    manager = ManagedCassandraClientFactory(**client_factory_kwargs)
+    return client_factory_kwargs
 
-    log.info('CassandraBootStrap Manager: Host - %s, Port - %s' % (host, port))
 
-    return (host, port, manager)
+def parse_cassandra_hosts(storage_provider):
+    """
+    Get the list of (host, port) tuples for a connection pool. The storage provider may list all the hosts of the
+    cluster in 'hosts' - each a dictionary with a host and a port - otherwise its host and port are used.
+    """
+    hosts = []
+    for host in storage_provider.get("hosts", []):
+        hosts.append((host["host"], host.get("port", storage_provider.get("port"))))
+
+    if not hosts:
+        hosts.append((storage_provider["host"], storage_provider["port"]))
+
+    return hosts
 
 class CassandraIndexedStoreBootstrap(CassandraIndexedStore):
     
@@ -99,6 +123,41 @@ class CassandraStoreBootstrap(CassandraStore):
         self._cache_name = column_family
 
 
+class CassandraPooledIndexedStoreBootstrap(CassandraPooledIndexedStore):
+
+    def __init__(self, username, password, storage_provider, keyspace, column_family):
+
+        log.info("CassandraPooledIndexedStoreBootstrap: username - %s, password - %s, storage_provider - %s, keyspace - %s, column_family - %s" %
+        (username, '******', storage_provider, keyspace, column_family))
+
+        BasicLifecycleObject.__init__(self)
+
+        hosts = parse_cassandra_hosts(storage_provider)
+        self._init_pool(hosts, parse_client_factory_kwargs(username, password, keyspace))
+
+        self._keyspace = keyspace
+
+        self._query_attribute_names = None
+        self._cache_name = column_family
+
+
+class CassandraPooledStoreBootstrap(CassandraPooledStore):
+
+    def __init__(self, username, password, storage_provider, keyspace, column_family):
+
+        log.info("CassandraPooledStoreBootstrap: username - %s, password - %s, storage_provider - %s, keyspace - %s, column_family - %s" %
+        (username, '******', storage_provider, keyspace, column_family))
+
+        BasicLifecycleObject.__init__(self)
+
+        hosts = parse_cassandra_hosts(storage_provider)
+        self._init_pool(hosts, parse_client_factory_kwargs(username, password, keyspace))
+
+        self._keyspace = keyspace
+
+        self._cache_name = column_family
+
+
 class CassandraSchemaError(Exception):
     """
     An exception class for the Cassandra Schema Initialization process
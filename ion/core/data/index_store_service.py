@@ -253,6 +253,15 @@ class IndexStoreServiceClient(ServiceClient):
             results[row.key] = cols
 
         defer.returnValue(results)
+
+    @defer.inlineCallbacks
+    def query_page(self, query_predicates, page_size=None, start_key=''):
+        """
+        The query message has no paging fields - the service returns every row as a single page.
+        """
+        results = yield self.query(query_predicates)
+
+        defer.returnValue((dict([(k, v) for k, v in results.iteritems() if k >= start_key]), None))
         
     @defer.inlineCallbacks
     def put(self, key, value, index_attributes=None):
@@ -14,10 +14,16 @@ from zope.interface import implements
 
 from twisted.internet import defer
 
+from bisect import bisect_left, bisect_right, insort
 
 import ion.util.ionlog
 log = ion.util.ionlog.getLogger(__name__)
 
+from ion.core import ioninit
+CONF = ioninit.config(__name__)
+
+# Default number of rows in a page of query results
+QUERY_PAGE_SIZE = CONF.getValue('query_page_size', 1000)
 
 
 class IndexStoreError(Exception):
@@ -191,6 +197,37 @@ class Store(object):
 
 
 
+class AttributeIndex(dict):
+    """
+    The index for one attribute of an IndexStore - a dictionary of attribute value to a set of row keys, which also
+    keeps its attribute values in a sorted list so that range predicates are found by bisection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self._sorted_values = sorted(dict.keys(self))
+
+    def __setitem__(self, attr_value, keys):
+        if not dict.__contains__(self, attr_value):
+            insort(self._sorted_values, attr_value)
+        dict.__setitem__(self, attr_value, keys)
+
+    def __delitem__(self, attr_value):
+        dict.__delitem__(self, attr_value)
+        pos = bisect_left(self._sorted_values, attr_value)
+        del self._sorted_values[pos]
+
+    def clear(self):
+        dict.clear(self)
+        self._sorted_values = []
+
+    def values_greater_than(self, attr_value):
+        """
+        Return the sorted list of attribute values greater than attr_value
+        """
+        return self._sorted_values[bisect_right(self._sorted_values, attr_value):]
+
+
 class IIndexStore(IStore):
     """
     Interface all store backend implementations.
@@ -240,6 +277,16 @@ class IIndexStore(IStore):
         @param query_predicates is a store.Query object
         @retVal a thrift representation of the rows returned by the query.
         """
+
+    def query_page(query_predicates, page_size=None, start_key=''):
+        """
+        Search for one page of the rows matching a query, in key order. Use a QueryCursor to page through all of them.
+        @param query_predicates is a store.Query object
+        @param page_size the most rows to return - QUERY_PAGE_SIZE by default
+        @param start_key the continuation token from the previous page - the first key of this page
+        @retVal a tuple of a dictionary of the rows and the continuation token for the next page - None if there are
+        no more rows.
+        """
         
     def update_index(key, index_attributes):
         """
@@ -297,7 +344,7 @@ class IndexStore(object):
         if kwargs.has_key('indices'):
             for name in kwargs.get('indices'):
                 if not self.indices.has_key(name):
-                    self.indices[name]={}
+                    self.indices[name]=AttributeIndex()
 
 
     def new_batch_request(self):
@@ -393,44 +440,96 @@ class IndexStore(object):
         """
         log.debug("In query: predicates %s" % query_predicates)
 
-        predicates = query_predicates.get_predicates()
+        keys = self._query_keys(query_predicates)
 
-        eq_filter = lambda x: x[2] == Query.EQ
-        preds_eq = filter(eq_filter, predicates)
-        keys = set()
-        if len(preds_eq) == 0:
-            raise IndexStoreError('Invalid arguments to IndexStore - must provide at least one equal to operator for search!')
-        else:
-            k,v,pred = preds_eq.pop()
-            kindex = self.indices.get(k, None)
-            if kindex:
-                keys.update(kindex.get(v,set()))
+        #log.debug("keys: "+ str(keys))
+        result = {}
+        for k in keys:
+            # This is stupid, but now remove effectively works - delete keys are no longer visible!
+            row = self.kvs.get(k, None)
+            if row is not None:
+                result[k] = row.copy()
 
-        for k,v,p in predicates:
+        log.debug("Query Results: %s" % result)
+
+        return defer.succeed(result)
+
+    def query_page(self, query_predicates, page_size=None, start_key=''):
+        """
+        @see IIndexStore.query_page
+        """
+        log.debug("In query_page: predicates %s, start key %s" % (query_predicates, start_key))
+
+        page_size = page_size or QUERY_PAGE_SIZE
+
+        keys = sorted([k for k in self._query_keys(query_predicates) if k >= start_key])
+
+        result = {}
+        next_key = None
+        for k in keys:
+            # Keys deleted by remove are still in the index
+            row = self.kvs.get(k, None)
+            if row is None:
+                continue
+
+            if len(result) == page_size:
+                next_key = k
+                break
+
+            result[k] = row.copy()
 
-            kindex = self.indices.get(k,None)
+        return defer.succeed((result, next_key))
+
+    def _query_keys(self, query_predicates):
+        """
+        Find the keys of the rows which match the query predicates
+        """
+        predicates = query_predicates.get_predicates()
+
+        # Look up the keys for each equal to predicate - an attribute which is not indexed matches nothing
+        eq_sets = []
+        gt_preds = []
+        for k,v,p in predicates:
             if p == Query.EQ:
-                
+                kindex = self.indices.get(k, None)
                 if kindex:
-                    keys.intersection_update(kindex.get(v,set()))
+                    eq_sets.append(kindex.get(v, set()))
+                else:
+                    eq_sets.append(set())
             elif p == Query.GT:
-                
-                matches = set()
-                for attr_val in kindex.keys():
-                    if attr_val > v:
-                        matches.update(kindex.get(attr_val,set()))
-                keys.intersection_update(matches)
+                gt_preds.append((k,v))
 
-        #log.debug("keys: "+ str(keys))
-        result = {}
-        for k in keys:
-            # This is stupid, but now remove effectively works - delete keys are no longer visible!
-            if self.kvs.has_key(k):
-                result[k] = self.kvs.get(k).copy()
+        if len(eq_sets) == 0:
+            raise IndexStoreError('Invalid arguments to IndexStore - must provide at least one equal to operator for search!')
 
-        log.debug("Query Results: %s" % result)
+        # Start from the most selective predicate - the intersection can only get smaller
+        eq_sets.sort(key=len)
+        keys = set(eq_sets[0])
+        for key_set in eq_sets[1:]:
+            if not keys:
+                break
+            keys.intersection_update(key_set)
+
+        for k,v in gt_preds:
+            if not keys:
+                break
+
+            kindex = self.indices.get(k)
+            if isinstance(kindex, AttributeIndex):
+                attr_values = kindex.values_greater_than(v)
+            else:
+                attr_values = [attr_val for attr_val in kindex.keys() if attr_val > v]
 
-        return defer.succeed(result)                
+            if len(attr_values) > len(keys):
+                # Cheaper to check the attribute of each remaining row than to gather the keys for the range
+                keys = set([key for key in keys if k in self.kvs.get(key, {}) and self.kvs[key][k] > v])
+            else:
+                matches = set()
+                for attr_val in attr_values:
+                    matches.update(kindex.get(attr_val,set()))
+                keys.intersection_update(matches)
+
+        return keys
     
     def _update_index(self, key, index_attributes):
         log.debug("In _update_index: key %s index_attributes %s" % (key,index_attributes))
@@ -453,8 +552,12 @@ class IndexStore(object):
 
             for k,v in changed_attrs.items():
                 kindex = self.indices.get(k)
-                # Create a set of keys if it does not already exist
-                kindex[v].discard(key)
+                keys = kindex.get(v, None)
+                if keys is not None:
+                    keys.discard(key)
+                    # Drop values with no keys so range predicates do not visit them
+                    if not keys:
+                        del kindex[v]
 
 
         for k, v in index_attributes.items():
@@ -540,6 +643,40 @@ class Query:
     
 
     
+class QueryCursor(object):
+    """
+    Pages through the rows matching a query on an IIndexStore, so that a large result is never held at once:
+
+        cursor = QueryCursor(index_store, query)
+        while not cursor.done:
+            rows = yield cursor.next_page()
+            ...
+    """
+
+    def __init__(self, index_store, query_predicates, page_size=None):
+        self.index_store = index_store
+        self.query_predicates = query_predicates
+        self.page_size = page_size or QUERY_PAGE_SIZE
+
+        self.done = False
+        self._next_key = ''
+
+    @defer.inlineCallbacks
+    def next_page(self):
+        """
+        @retval a Deferred which fires with a dictionary of the next page of rows - empty when done
+        """
+        if self.done:
+            defer.returnValue({})
+
+        rows, self._next_key = yield self.index_store.query_page(self.query_predicates, page_size=self.page_size, start_key=self._next_key)
+
+        if self._next_key is None:
+            self.done = True
+
+        defer.returnValue(rows)
+
+
 class IDataManager(Interface):
     """
     @note Proposed class to fulfill preservation service management?
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+"""
+@file ion/core/data/test/test_cassandra_pool.py
+@test ion.core.data.cassandra connection pool
+"""
+
+import ion.util.ionlog
+log = ion.util.ionlog.getLogger(__name__)
+
+from twisted.trial import unittest
+from twisted.internet import defer
+from twisted.internet import error
+
+from ion.core.data import cassandra
+from ion.core.data.cassandra import CassandraConnectionPool, PooledCassandraClient, CassandraError
+
+
+class FakeClient(object):
+    """
+    Records the calls made on one connection; each returns a deferred fired by the test
+    """
+
+    def __init__(self, host):
+        self.host = host
+        self.calls = []
+
+    def get(self, key, column_family, column=None):
+        d = defer.Deferred()
+        self.calls.append((key, d))
+        return d
+
+
+class FakeConnection(cassandra.PooledConnection):
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.client = FakeClient(host)
+
+        self.pending = 0
+        self.requests = 0
+        self.failures = 0
+        self.failed_until = 0.0
+
+
+class FakePool(CassandraConnectionPool):
+
+    def _new_connection(self, host, port, manager_kwargs):
+        return FakeConnection(host, port)
+
+
+class CassandraConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.hosts = [('node1', 9160), ('node2', 9160)]
+
+    def test_spread_over_hosts(self):
+        pool = FakePool(self.hosts, {}, pool_size=4)
+        self.assertEqual([conn.host for conn in pool.connections], ['node1', 'node2', 'node1', 'node2'])
+
+        # Never fewer connections than hosts
+        pool = FakePool(self.hosts, {}, pool_size=1)
+        self.assertEqual(len(pool.connections), 2)
+
+        self.assertRaises(CassandraError, FakePool, [], {})
+        self.assertRaises(CassandraError, FakePool, self.hosts, {}, policy='random')
+
+    def test_least_loaded(self):
+        pool = FakePool(self.hosts, {}, pool_size=4)
+        client = PooledCassandraClient(pool)
+
+        results = [client.get('key%d' % i, 'cf') for i in range(8)]
+
+        # Each connection has two outstanding requests
+        self.assertEqual([conn.pending for conn in pool.connections], [2, 2, 2, 2])
+
+        # Finish the requests on the first connection - it takes the next ones
+        for key, d in pool.connections[0].client.calls:
+            d.callback(key)
+        self.assertEqual(pool.connections[0].pending, 0)
+
+        client.get('key8', 'cf')
+        self.assertEqual(pool.connections[0].pending, 1)
+
+        self.assertEqual(results[0].result, 'key0')
+
+    def test_round_robin(self):
+        pool = FakePool(self.hosts, {}, pool_size=3, policy=cassandra.ROUND_ROBIN)
+        client = PooledCassandraClient(pool)
+
+        for i in range(6):
+            client.get('key%d' % i, 'cf')
+
+        self.assertEqual([conn.requests for conn in pool.connections], [2, 2, 2])
+
+    @defer.inlineCallbacks
+    def test_retry_on_another_host(self):
+        pool = FakePool(self.hosts, {}, pool_size=2)
+        client = PooledCassandraClient(pool)
+
+        d = client.get('key', 'cf')
+
+        # The first connection fails - the request goes to the other host
+        node1, node2 = pool.connections
+        node1.client.calls[0][1].errback(error.ConnectionLost())
+        self.assertEqual(len(node2.client.calls), 1)
+
+        node2.client.calls[0][1].callback('value')
+        result = yield d
+        self.assertEqual(result, 'value')
+
+        self.assertEqual(node1.failures, 1)
+        self.assertEqual(pool.get_stats(), [('node1', 9160, 0, 1, 1), ('node2', 9160, 0, 1, 0)])
+
+        # The failed connection is passed over until the backoff expires
+        client.get('key', 'cf')
+        self.assertEqual(len(node2.client.calls), 2)
+
+    @defer.inlineCallbacks
+    def test_retries_exhausted(self):
+        pool = FakePool(self.hosts, {}, pool_size=2, retries=1)
+        client = PooledCassandraClient(pool)
+
+        d = client.get('key', 'cf')
+
+        node1, node2 = pool.connections
+        node1.client.calls[0][1].errback(error.ConnectionLost())
+        node2.client.calls[0][1].errback(error.ConnectionLost())
+
+        yield self.assertFailure(d, error.ConnectionLost)
+
+    @defer.inlineCallbacks
+    def test_application_error_not_retried(self):
+        pool = FakePool(self.hosts, {}, pool_size=2)
+        client = PooledCassandraClient(pool)
+
+        d = client.get('key', 'cf')
+
+        node1, node2 = pool.connections
+        node1.client.calls[0][1].errback(KeyError('key'))
+
+        yield self.assertFailure(d, KeyError)
+        self.assertEqual(len(node2.client.calls), 0)
+        self.assertEqual(node1.failures, 0)
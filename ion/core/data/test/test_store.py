@@ -309,6 +309,39 @@ class IndexStoreTest(IStoreTest):
 
 
 
+    @defer.inlineCallbacks
+    def test_query_page(self):
+
+        for i in range(25):
+            yield self.ds.put('page_key%02d' % i, 'value%d' % i, {'state':'ME', 'birth_date':str(1950 + i)})
+
+        query = Query()
+        query.add_predicate_eq('state', 'ME')
+        query.add_predicate_gt('birth_date', '1952')
+
+        cursor = store.QueryCursor(self.ds, query, page_size=10)
+
+        pages = []
+        rows = {}
+        while not cursor.done:
+            page = yield cursor.next_page()
+            pages.append(len(page))
+            rows.update(page)
+
+        self.assertEqual(pages, [10, 10, 2])
+        self.assertEqual(sorted(rows.keys()), ['page_key%02d' % i for i in range(3, 25)])
+        self.assertEqual(rows['page_key07']['value'], 'value7')
+
+        # A cursor which is done returns nothing more
+        page = yield cursor.next_page()
+        self.assertEqual(page, {})
+
+        # The continuation token is the first key of the next page
+        page, next_key = yield self.ds.query_page(query, page_size=5, start_key='page_key20')
+        self.assertEqual(sorted(page.keys()), ['page_key%02d' % i for i in range(20, 25)])
+        self.assertEqual(next_key, None)
+
+
     @defer.inlineCallbacks
     def test_get_query_attributes(self):
         attrs = yield self.ds.get_query_attributes()
@@ -424,6 +457,42 @@ class IndexStoreTest(IStoreTest):
 
 
 
+    # Tests greater than with a very selective equal to predicate
+    @defer.inlineCallbacks
+    def test_query_greater_and_selective_eq(self):
+
+        query = Query()
+        query.add_predicate_gt('birth_date','')
+        query.add_predicate_eq('full_name','Howard Tayler')
+        rows = yield self.ds.query(query)
+        self.assertEqual(rows.keys(), ['htayler'])
+
+        # No birth date - does not match
+        query = Query()
+        query.add_predicate_gt('birth_date','')
+        query.add_predicate_eq('full_name','John Stewart')
+        rows = yield self.ds.query(query)
+        self.assertEqual(len(rows),0)
+
+    # Tests greater than after the indexed value changes
+    @defer.inlineCallbacks
+    def test_query_greater_after_update(self):
+
+        yield self.ds.update_index('bsanderson', {'birth_date': '1960'})
+
+        query = Query()
+        query.add_predicate_gt('birth_date','1965')
+        query.add_predicate_eq('state','UT')
+        rows = yield self.ds.query(query)
+        self.assertEqual(rows.keys(), ['htayler'])
+
+        query = Query()
+        query.add_predicate_gt('birth_date','1950')
+        query.add_predicate_eq('state','UT')
+        rows = yield self.ds.query(query)
+        self.assertEqual(sorted(rows.keys()), ['bsanderson', 'htayler'])
+
+
     @defer.inlineCallbacks
     def put_stuff_for_tests(self):
         """
@@ -564,3 +633,7 @@ class IndexStoreServiceTest(IndexStoreTest, IonTestCase):
     def test_batch(self):
 
         raise unittest.SkipTest('Not implementing batch_put in store service!')
+
+    def test_query_page(self):
+
+        raise unittest.SkipTest('The index store service returns every row of a query in one page!')
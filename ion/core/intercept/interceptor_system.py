@@ -6,6 +6,7 @@
 @brief Process Manager for capability container
 """
 
+import time
 import types
 
 from twisted.internet import defer
@@ -16,15 +17,56 @@ log = ion.util.ionlog.getLogger(__name__)
 
 from ion.core import ioninit
 from ion.core.exception import ConfigurationError
-from ion.core.intercept.interceptor import Interceptor
+from ion.core.intercept.interceptor import Interceptor, EnvelopeInterceptor
 from ion.core.process import process
 from ion.core.process.cprocess import ContainerProcess, IContainerProcess, Invocation
 from ion.util.state_object import BasicLifecycleObject
 import ion.util.procutils as pu
 
+class LatencyHistogram(object):
+    """
+    Histogram of the time taken by one step of an interceptor path
+    """
+
+    # Upper bounds of the buckets in seconds - the last bucket holds everything slower
+    BOUNDS = (0.0001, 0.0003, 0.001, 0.003, 0.01, 0.03, 0.1, 0.3, 1.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.sum_time = 0.0
+        self.max_time = 0.0
+
+    def add(self, etime):
+        bucket = 0
+        for bound in self.BOUNDS:
+            if etime <= bound:
+                break
+            bucket += 1
+        self.counts[bucket] += 1
+
+        self.count += 1
+        self.sum_time += etime
+        self.max_time = max(self.max_time, etime)
+
+    def get_stats(self):
+        """
+        @retval (count, mean time, max time, list of (bucket upper bound, count)) - the bound of the last bucket is None
+        """
+        bounds = list(self.BOUNDS) + [None]
+        return (self.count,
+                self.sum_time / max(self.count, 1),
+                self.max_time,
+                zip(bounds, self.counts))
+
+
 class InterceptorSystem(Interceptor):
     """
     Container interceptor system class.
+
+    Each path is compiled into a single chain at initialization. Interceptors which return an invocation rather than
+    a Deferred run one after the other without any Deferred in between; the chain only waits on interceptors which
+    return a Deferred. The time taken by each step is kept in a LatencyHistogram - see get_latency_stats.
     """
 
     def __init__(self):
@@ -33,6 +75,10 @@ class InterceptorSystem(Interceptor):
         self.interceptors = {}
         self.paths = {}
 
+        # The compiled chain and the latency of each step for each path
+        self.chains = {}
+        self.latency = {}
+
     # Life cycle
 
     @defer.inlineCallbacks
@@ -66,38 +112,94 @@ class InterceptorSystem(Interceptor):
             # have priorities and alternative routes
 
     # API
-    @defer.inlineCallbacks
     def process(self, invocation):
         """
         @param invocation container object for parameters
-        @retval invocation instance, may be modified
+        @retval Deferred, invocation instance, may be modified
         """
-        pathname = invocation.path
-        path = self.paths.get(pathname, None)
-        if not path:
-            raise RuntimeError("Path %s unknown" % invocation.path)
+        chain = self.chains.get(invocation.path, None)
+        if chain is None:
+            return defer.fail(RuntimeError("Path %s unknown" % invocation.path))
+        return chain(invocation)
+
+    def get_latency_stats(self):
+        """
+        @retval a dictionary of path name to a list of (step name, LatencyHistogram stats) in path order
+        """
+        stats = {}
+        for pathname, steps in self.latency.iteritems():
+            stats[pathname] = [(name, hist.get_stats()) for name, hist in steps]
+        return stats
+
+    # Helpers
+
+    def _compile_path(self, pathname, path):
+        """
+        Compile an intercept path into a callable which takes an invocation and returns a Deferred
+        """
+        steps = []
         for path_element in path:
-            invocation.path = pathname
             intc = path_element['interceptor_instance']
-            #log.debug("Process path %s step %s" % (invocation.path, path_element['name']))
-            try:
-                invocation = yield defer.maybeDeferred(intc.process, invocation)
-            except Exception, ex:
-                log.exception("Error in interceptor path %s step %s" % (
-                    invocation.path, path_element['name']))
-                invocation.error(str(ex))
-                raise ex
-
-            # Continuation
-            if invocation.status == Invocation.STATUS_DROP:
-                #log.debug("Process path %s step %s: DROP" % (invocation.path, path_element['name']))
-                break
-            if invocation.status == Invocation.STATUS_DONE:
-                #log.debug("Process path %s step %s: DONE" % (invocation.path, path_element['name']))
-                break
-        defer.returnValue(invocation)
+            steps.append((path_element['name'], self._get_step(intc, pathname), LatencyHistogram()))
+        steps = tuple(steps)
 
-    # Helpers
+        self.latency[pathname] = [(name, hist) for name, step, hist in steps]
+
+        stop_status = (Invocation.STATUS_DROP, Invocation.STATUS_DONE)
+
+        def resume(invocation, position, hist, tic):
+            hist.add(time.time() - tic)
+            if invocation.status in stop_status:
+                return invocation
+            return run(invocation, position + 1)
+
+        def resume_failed(reason, invocation, name):
+            log.error("Error in interceptor path %s step %s: %s" % (pathname, name, reason.getErrorMessage()))
+            invocation.error(str(reason.value))
+            return reason
+
+        def run(invocation, start=0):
+            for position in xrange(start, len(steps)):
+                name, step, hist = steps[position]
+                invocation.path = pathname
+
+                tic = time.time()
+                try:
+                    result = step(invocation)
+                except Exception, ex:
+                    log.exception("Error in interceptor path %s step %s" % (pathname, name))
+                    invocation.error(str(ex))
+                    return defer.fail()
+
+                if isinstance(result, defer.Deferred):
+                    # Wait for this interceptor - the rest of the chain continues when it is done
+                    result.addCallbacks(resume, resume_failed,
+                                        callbackArgs=(position, hist, tic), errbackArgs=(invocation, name))
+                    return result
+
+                hist.add(time.time() - tic)
+                invocation = result
+
+                # Continuation
+                if invocation.status in stop_status:
+                    break
+
+            return defer.succeed(invocation)
+
+        return run
+
+    def _get_step(self, intc, pathname):
+        """
+        Get the callable for one step of a path - the before or after method of an envelope interceptor, so the
+        invocation is not wrapped in a Deferred on the way, otherwise the process method.
+        """
+        if isinstance(intc, EnvelopeInterceptor) and \
+           getattr(type(intc).process, 'im_func', None) is EnvelopeInterceptor.process.im_func:
+            if pathname == Invocation.PATH_IN:
+                return intc.before
+            elif pathname == Invocation.PATH_OUT:
+                return intc.after
+        return intc.process
 
     @defer.inlineCallbacks
     def _init_system(self, config):
@@ -120,6 +222,9 @@ class InterceptorSystem(Interceptor):
             self.paths[Invocation.PATH_OUT] = out_path
             self.paths[Invocation.PATH_IN] = in_path
 
+            for pathname, path in self.paths.iteritems():
+                self.chains[pathname] = self._compile_path(pathname, path)
+
         if 'paths' in config:
             raise NotImplementedError("Not implemented")
 
@@ -22,12 +22,11 @@ from ion.core.process.cprocess import Invocation
 import time
 
 from ion.util.config import Config
+from ion.util.cache import LRUDict
 
 from ion.services.coi.datastore_bootstrap.ion_preload_config \
     import OWNED_BY_ID, HAS_ROLE_ID, ROLE_NAMES_BY_ID, ROLE_IDS_BY_NAME
-from ion.services.dm.inventory.association_service import AssociationServiceClient, ASSOCIATION_QUERY_MSG_TYPE
-from ion.services.dm.inventory.association_service import IDREF_TYPE
-from ion.core.messaging.message_client import MessageClient
+from ion.services.dm.inventory.association_service import AssociationServiceClient
 
 from google.protobuf.internal.containers import RepeatedScalarFieldContainer
 
@@ -85,6 +84,46 @@ userroledb_filename = ioninit.adjust_dir(CONF.getValue('userroledb'))
 role_user_dict = construct_user_role_lists(Config(userroledb_filename).getObject())
 user_role_dict = {} # cache the current role for an ooi_id
 
+# Authorization decisions are cached for decision_cache_ttl seconds. Only grants are cached - a denied request is
+# always evaluated again. The expiry of each message is still checked on every request.
+decision_cache_ttl = CONF.getValue('decision_cache_ttl', 60.0)
+decision_cache_size = CONF.getValue('decision_cache_size', 10000)
+
+# (ooi_id, service, operation, frozenset of resource ids or None) => time the request was authorized
+decision_cache = LRUDict(decision_cache_size)
+# ooi_id => (frozenset of the ids of the resources the user owns, time they were fetched)
+owner_cache = LRUDict(decision_cache_size)
+
+def invalidate_policy_cache(ooi_id=None):
+    """
+    Forget the cached decisions and ownership of a user, or of every user if ooi_id is None. Called when a role
+    changes, and by the datastore (and the identity registry broadcast) when an owned_by association stops naming
+    the user.
+    """
+    if ooi_id is None:
+        decision_cache.__init__(decision_cache_size)
+        owner_cache.__init__(decision_cache_size)
+        return
+
+    for key in [key for key in decision_cache.iterkeys() if key[0] == ooi_id]:
+        del decision_cache[key]
+    if ooi_id in owner_cache:
+        del owner_cache[ooi_id]
+
+def get_cached_decision(key):
+    """
+    @retval True if the request described by key was authorized less than decision_cache_ttl seconds ago
+    """
+    if key not in decision_cache:
+        return False
+    if time.time() - decision_cache[key] > decision_cache_ttl:
+        del decision_cache[key]
+        return False
+    return True
+
+def cache_decision(key):
+    decision_cache[key] = time.time()
+
 def subject_has_role(subject, role):
     if role == 'ANONYMOUS':
         return True
@@ -113,6 +152,7 @@ def get_current_roles(ooi_id):
     return list(roles)
 
 def map_ooi_id_to_role(ooi_id, role):
+    invalidate_policy_cache(ooi_id)
     if not role in role_user_dict:
         role_user_dict[role] = {'subject': set(), 'ooi_id': set()}
     role_user_dict[role]['ooi_id'].add(ooi_id)
@@ -122,6 +162,7 @@ def map_ooi_id_to_role(ooi_id, role):
     user_role_dict[ooi_id].add(role)
 
 def unmap_ooi_id_from_role(ooi_id, role):
+    invalidate_policy_cache(ooi_id)
     if role in role_user_dict:
         if ooi_id in role_user_dict[role]['ooi_id']:
             role_user_dict[role]['ooi_id'].remove(ooi_id)
@@ -258,12 +299,17 @@ class PolicyInterceptor(EnvelopeInterceptor):
                 role_entry = service_list[operation]['roles']
                 log.info('Policy Interceptor: Policy tuple [%s]' % str(role_entry))
 
-                role_match_found = False
-                for role in role_entry:
-                    if user_has_role(user_id, role):
-                        log.info('Policy Interceptor: Role <%s> authentication matches' % role)
-                        role_match_found = True
-                        break
+                role_key = (user_id, service, operation, None)
+                role_match_found = get_cached_decision(role_key)
+                if role_match_found:
+                    log.info('Policy Interceptor: Cached role authentication matches')
+                else:
+                    for role in role_entry:
+                        if user_has_role(user_id, role):
+                            log.info('Policy Interceptor: Role <%s> authentication matches' % role)
+                            role_match_found = True
+                            cache_decision(role_key)
+                            break
 
                 if role_match_found == False:
                     # Special handling for ownership role
@@ -285,12 +331,17 @@ class PolicyInterceptor(EnvelopeInterceptor):
                             log.warn('Policy Interceptor: Authentication failed for service [%s] operation [%s] resource [%s] user_id [%s] expiry [%s] for role [OWNER].' % (service, operation, '*', user_id, expiry))
                             defer.returnValue(invocation)
                             
-                        yield self.check_owner(user_id, return_uuid_list, invocation)
-                        if invocation.status != Invocation.STATUS_PROCESS:
-                            log.warn('Policy Interceptor: Authentication failed for service [%s] operation [%s] resource [%s] user_id [%s] expiry [%s] for role [OWNER].' % (service, operation, '*', user_id, expiry))
-                            defer.returnValue(invocation)
+                        owner_key = (user_id, service, operation, frozenset(return_uuid_list))
+                        if get_cached_decision(owner_key):
+                            log.info('Policy Interceptor: Cached role <OWNER> authentication matches')
                         else:
-                            log.info('Policy Interceptor: Role <OWNER> authentication matches')
+                            yield self.check_owner(user_id, return_uuid_list, invocation)
+                            if invocation.status != Invocation.STATUS_PROCESS:
+                                log.warn('Policy Interceptor: Authentication failed for service [%s] operation [%s] resource [%s] user_id [%s] expiry [%s] for role [OWNER].' % (service, operation, '*', user_id, expiry))
+                                defer.returnValue(invocation)
+                            else:
+                                log.info('Policy Interceptor: Role <OWNER> authentication matches')
+                                cache_decision(owner_key)
                     else:
                         log.warn('Policy Interceptor: Authentication failed for service [%s] operation [%s] resource [%s] user_id [%s] expiry [%s] for roles [%s]. Returning Not Authorized.' % (service, operation, '*', user_id, expiry, str(role_entry)))
                         invocation.drop(note='Not authorized', code=Invocation.CODE_UNAUTHORIZED)
@@ -314,31 +365,43 @@ class PolicyInterceptor(EnvelopeInterceptor):
 
     @defer.inlineCallbacks
     def check_owner(self, user_id, uuid_list, invocation):
-        self.mc = MessageClient(proc=invocation.process)
-        self.asc = AssociationServiceClient(proc=invocation.process)
+        """
+        Check that the user owns every resource in uuid_list - the resources the user owns are found with one
+        association lookup and cached.
+        """
+        owned, from_cache = yield self.get_owned_resources(user_id, invocation)
+
+        not_owned = set(uuid_list).difference(owned)
+        if not_owned and from_cache:
+            # The user may have been given the resource since the cache was filled
+            owned, from_cache = yield self.get_owned_resources(user_id, invocation, refresh=True)
+            not_owned = set(uuid_list).difference(owned)
+
+        if not_owned:
+            log.warn('Policy Interceptor: Authentication failed. User <%s> does not own resources <%s>.' % (user_id, ', '.join(not_owned)))
+            invocation.drop(note='Not authorized', code=Invocation.CODE_UNAUTHORIZED)
+        else:
+            log.info('Policy Interceptor: User <%s> owns resources <%s>.' % (user_id, ', '.join(uuid_list)))
 
-        for uuid in uuid_list:        
-            request = yield self.mc.create_instance(ASSOCIATION_QUERY_MSG_TYPE)
+    @defer.inlineCallbacks
+    def get_owned_resources(self, user_id, invocation, refresh=False):
+        """
+        @retval a tuple of the set of the ids of the resources owned by the user and whether it came from the cache
+        """
+        if not refresh and user_id in owner_cache:
+            owned, fetched = owner_cache[user_id]
+            if time.time() - fetched <= decision_cache_ttl:
+                defer.returnValue((owned, True))
 
-            request.object = request.CreateObject(IDREF_TYPE)
-            request.object.key = user_id
+        self.asc = AssociationServiceClient(proc=invocation.process)
 
-            request.predicate = request.CreateObject(IDREF_TYPE)
-            request.predicate.key = OWNED_BY_ID
+        log.info('Calling association service for the resources owned by user id <%s>' % user_id)
+        owner_map = yield self.asc.get_associations_map({'predicate': OWNED_BY_ID, 'object': user_id})
 
-            request.subject = request.CreateObject(IDREF_TYPE)
-            request.subject.key = uuid
+        owned = frozenset(owner_map.keys())
+        owner_cache[user_id] = (owned, time.time())
 
-            # make the request
-            log.warn('Calling association service for user id <%s> and uuid <%s>' % (user_id, uuid))
-            result = yield self.asc.association_exists(request)
-            log.warn('Return from association service call for user id <%s> and uuid <%s>' % (user_id, uuid))
-            if result.result == False:
-                log.warn('Policy Interceptor: Authentication failed. User <%s> does not own resource <%s>.' % (user_id, uuid))
-                invocation.drop(note='Not authorized', code=Invocation.CODE_UNAUTHORIZED)
-                return
-            else:
-                log.warn('Policy Interceptor: User <%s> owns resource <%s>.' % (user_id, uuid))
+        defer.returnValue((owned, False))
 
     def find_uuids(self, invocation, msg, user_id, resources):
         """
@@ -146,6 +146,57 @@ class InterceptorTest(IonTestCase):
         self.assertEqual(ti1.numafter, 1)
         self.assertEqual(ti2.numafter, 0)
 
+    @defer.inlineCallbacks
+    def test_intercept_async(self):
+        is_config1 = {
+            'interceptors':{
+                'test1':{
+                    'classname':'ion.core.intercept.test.test_interceptor.TestInterceptor',
+                },
+                'async':{
+                    'classname':'ion.core.intercept.test.test_interceptor.AsyncTestInterceptor',
+                },
+                'test3':{
+                    'classname':'ion.core.intercept.test.test_interceptor.TestInterceptor',
+                },
+            },
+            'stack':[
+                {'name':'test1', 'interceptor':'test1' },
+                {'name':'async', 'interceptor':'async' },
+                {'name':'test3', 'interceptor':'test3' },
+            ]
+        }
+
+        intercept_sys = InterceptorSystem()
+        yield intercept_sys.initialize(is_config1)
+        yield intercept_sys.activate()
+        ti1 = intercept_sys.interceptors['test1']
+        ta = intercept_sys.interceptors['async']
+        ti3 = intercept_sys.interceptors['test3']
+
+        # The chain waits for the asynchronous interceptor before going on
+        d = intercept_sys.process(Invocation(path=Invocation.PATH_IN, message="123"))
+        self.assertEqual(ti3.numbefore, 1)
+        self.assertEqual(ti1.numbefore, 0)
+        self.assertEqual(d.called, False)
+
+        ta.pending.pop().callback(None)
+        inv1b = yield d
+        self.assertEqual(ti1.numbefore, 1)
+        self.assertEqual(inv1b.status, Invocation.STATUS_PROCESS)
+
+        # Synchronous interceptors do not wait for the reactor
+        intercept_sys = InterceptorSystem()
+        del is_config1['stack'][1]
+        yield intercept_sys.initialize(is_config1)
+        d = intercept_sys.process(Invocation(path=Invocation.PATH_OUT, message="123"))
+        self.assertEqual(d.called, True)
+
+        stats = intercept_sys.get_latency_stats()
+        self.assertEqual([name for name, hist in stats[Invocation.PATH_OUT]], ['test1', 'test3'])
+        self.assertEqual([hist[0] for name, hist in stats[Invocation.PATH_OUT]], [1, 1])
+        self.assertEqual([hist[0] for name, hist in stats[Invocation.PATH_IN]], [0, 0])
+
     @defer.inlineCallbacks
     def test_intercept_fail(self):
         is_config1 = {}
@@ -240,6 +291,22 @@ class TestInterceptor(EnvelopeInterceptor):
         return invocation
 
 
+class AsyncTestInterceptor(EnvelopeInterceptor):
+    """
+    Interceptor which does not finish until the test fires its deferred
+    """
+    def on_initialize(self, *args, **kwargs):
+        self.pending = []
+
+    def before(self, invocation):
+        d = defer.Deferred()
+        d.addCallback(lambda result: invocation)
+        self.pending.append(d)
+        return d
+
+    after = before
+
+
 class TestSignature(IonTestCase):
 
     @defer.inlineCallbacks
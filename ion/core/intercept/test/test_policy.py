@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+"""
+@file ion/core/intercept/test/test_policy.py
+@test ion.core.intercept.policy decision and ownership caches
+"""
+from twisted.internet import defer
+from twisted.trial import unittest
+
+import ion.util.ionlog
+log = ion.util.ionlog.getLogger(__name__)
+
+from ion.core.intercept import policy
+from ion.core.intercept.policy import PolicyInterceptor
+from ion.core.process.cprocess import Invocation
+
+
+class FakeAssociationServiceClient(object):
+    """
+    Answers the owned by query from a dictionary of user id => list of resource ids
+    """
+    owners = {}
+    calls = []
+
+    def __init__(self, proc=None):
+        pass
+
+    def get_associations_map(self, query):
+        self.calls.append(query)
+        return defer.succeed(dict([(uuid, query['object']) for uuid in self.owners.get(query['object'], [])]))
+
+
+class PolicyCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        policy.invalidate_policy_cache()
+
+        FakeAssociationServiceClient.owners = {'user1': ['res1', 'res2']}
+        FakeAssociationServiceClient.calls = []
+        self.patch(policy, 'AssociationServiceClient', FakeAssociationServiceClient)
+
+        self.interceptor = PolicyInterceptor('policy')
+
+    def tearDown(self):
+        policy.invalidate_policy_cache()
+
+    def test_decision_cache(self):
+        key = ('user1', 'hello', 'op', None)
+        self.assertEqual(policy.get_cached_decision(key), False)
+
+        policy.cache_decision(key)
+        self.assertEqual(policy.get_cached_decision(key), True)
+
+        # Expired decisions are dropped
+        self.patch(policy, 'decision_cache_ttl', -1)
+        self.assertEqual(policy.get_cached_decision(key), False)
+        self.assertEqual(len(policy.decision_cache), 0)
+
+    def test_role_change_invalidates(self):
+        policy.cache_decision(('user1', 'hello', 'op', None))
+        policy.cache_decision(('user2', 'hello', 'op', None))
+
+        policy.map_ooi_id_to_role('user1', 'ADMIN')
+        self.assertEqual(policy.get_cached_decision(('user1', 'hello', 'op', None)), False)
+        self.assertEqual(policy.get_cached_decision(('user2', 'hello', 'op', None)), True)
+
+        policy.unmap_ooi_id_from_role('user1', 'ADMIN')
+
+    @defer.inlineCallbacks
+    def test_check_owner(self):
+        inv = Invocation()
+        yield self.interceptor.check_owner('user1', ['res1', 'res2'], inv)
+        self.assertEqual(inv.status, Invocation.STATUS_PROCESS)
+
+        # One lookup for all the resources, then the cache
+        inv = Invocation()
+        yield self.interceptor.check_owner('user1', ['res2'], inv)
+        self.assertEqual(inv.status, Invocation.STATUS_PROCESS)
+        self.assertEqual(len(FakeAssociationServiceClient.calls), 1)
+
+        # A resource which is not in the cache is looked up again before it is refused
+        FakeAssociationServiceClient.owners['user1'].append('res3')
+        inv = Invocation()
+        yield self.interceptor.check_owner('user1', ['res1', 'res3'], inv)
+        self.assertEqual(inv.status, Invocation.STATUS_PROCESS)
+        self.assertEqual(len(FakeAssociationServiceClient.calls), 2)
+
+        inv = Invocation()
+        yield self.interceptor.check_owner('user1', ['res4'], inv)
+        self.assertEqual(inv.status, Invocation.STATUS_DROP)
+        self.assertEqual(inv.code, Invocation.CODE_UNAUTHORIZED)
+        self.assertEqual(len(FakeAssociationServiceClient.calls), 3)
+
+    @defer.inlineCallbacks
+    def test_revoked_owner_denied(self):
+        inv = Invocation()
+        yield self.interceptor.check_owner('user1', ['res1'], inv)
+        self.assertEqual(inv.status, Invocation.STATUS_PROCESS)
+
+        # The datastore invalidates the former owner when the owned_by association is nulled
+        FakeAssociationServiceClient.owners['user1'].remove('res1')
+        policy.invalidate_policy_cache('user1')
+
+        inv = Invocation()
+        yield self.interceptor.check_owner('user1', ['res1'], inv)
+        self.assertEqual(inv.status, Invocation.STATUS_DROP)
+        self.assertEqual(inv.code, Invocation.CODE_UNAUTHORIZED)
+        self.assertEqual(len(FakeAssociationServiceClient.calls), 2)
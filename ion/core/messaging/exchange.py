@@ -80,6 +80,10 @@ class ExchangeManager(BasicLifecycleObject):
         @retval Deferred
         """
 
+        # Publish what the batching publishers still buffer
+        if self.exchange_space is not None:
+            yield self.exchange_space.close_batch_publishers()
+
         # Close the broker connection
         yield self.message_space.terminate()
 
@@ -7,8 +7,10 @@
 """
 
 import uuid
+import time
 
-from twisted.internet import defer
+from twisted.internet import defer, reactor
+from twisted.python import failure
 
 from txamqp.client import TwistedDelegate
 from txamqp.client import Closed
@@ -196,16 +198,80 @@ class ProcessExchangeSpace(ExchangeSpace):
         self.type = "process"
         self.exchange = Exchange(name)
 
+        # Batching publishers are kept open and shared by all the senders
+        # with the same publisher config
+        self._batch_publishers = {}
+        self._batch_publishers_lock = defer.DeferredLock()
+
     @defer.inlineCallbacks
     def send(self, to_name, message_data, publisher_config=None, **kwargs):
         if publisher_config is None: publisher_config = {}
 
+        if publisher_config.get('batch_size', 0) or publisher_config.get('confirm', False):
+            publisher = yield self._get_batch_publisher(publisher_config)
+            yield publisher.send(message_data, routing_key=str(to_name))
+            defer.returnValue(None)
+
         pub_config = {'routing_key' : str(to_name)}
         pub_config.update(publisher_config)
         publisher = yield Publisher.name(self, pub_config)
         yield publisher.send(message_data)
         publisher.close()
 
+    # The Publisher params which decide whether two batching publishers are
+    # interchangeable, with the function each value is normalized by. The
+    # routing key is given on each send and is left out.
+    BATCH_PUBLISHER_KEY_FIELDS = (('exchange', str),
+                                  ('exchange_type', str),
+                                  ('delivery_mode', int),
+                                  ('durable', bool),
+                                  ('auto_delete', bool),
+                                  ('mandatory', bool),
+                                  ('immediate', bool),
+                                  ('batch_size', int),
+                                  ('batch_window', float),
+                                  ('confirm', bool),
+                                  ('max_in_flight', int))
+
+    def _batch_publisher_key(self, publisher_config):
+        """
+        @retval a hashable key for the publisher config, made of its scalar
+        Publisher params only - other values may be unhashable
+        """
+        key = []
+        for field, normalize in self.BATCH_PUBLISHER_KEY_FIELDS:
+            value = publisher_config.get(field, None)
+            if value is not None:
+                value = normalize(value)
+            key.append(value)
+        return tuple(key)
+
+    @defer.inlineCallbacks
+    def _get_batch_publisher(self, publisher_config):
+        key = self._batch_publisher_key(publisher_config)
+
+        yield self._batch_publishers_lock.acquire()
+        try:
+            publisher = self._batch_publishers.get(key, None)
+            if publisher is None:
+                publisher = yield Publisher.name(self, publisher_config)
+                self._batch_publishers[key] = publisher
+        finally:
+            self._batch_publishers_lock.release()
+
+        defer.returnValue(publisher)
+
+    @defer.inlineCallbacks
+    def close_batch_publishers(self):
+        """
+        Flush and close the batching publishers. Called by the ExchangeManager
+        when the container terminates, before the broker connection closes.
+        """
+        publishers = self._batch_publishers.values()
+        self._batch_publishers.clear()
+        for publisher in publishers:
+            yield publisher.close()
+
 
 class TopicExchangeSpace(ExchangeSpace):
     """
@@ -392,7 +458,12 @@ class Consumer(object):
                              auto_delete=True,
                              no_ack=True,
                              binding_key=None,
+                             prefetch_count=1,
                              **kwargs): # **kwargs is a sloppy hack
+        """
+        @param prefetch_count the number of unacknowledged messages the broker
+        delivers to this consumer before waiting for an ack
+        """
         self.channel = chan
         self.queue = queue
         self.exchange = exchange
@@ -402,6 +473,7 @@ class Consumer(object):
         self.exclusive = exclusive
         self.auto_delete = auto_delete
         self.no_ack = no_ack
+        self.prefetch_count = prefetch_count
         self.consumer_tag = uuid.uuid4().hex
         self.callback = None
         self._closed = False # Assuming we were given an open channel
@@ -457,7 +529,7 @@ class Consumer(object):
                                         routing_key=routing_key,
                                         arguments=arguments)
 
-        yield self.channel.basic_qos(prefetch_size=0, prefetch_count=1,
+        yield self.channel.basic_qos(prefetch_size=0, prefetch_count=self.prefetch_count,
                                                         global_=False)
 
         defer.returnValue(self)
@@ -513,7 +585,7 @@ class Consumer(object):
 
 class Publisher(object):
     """
-    Publisher for one message
+    Publisher for one message, or for many when batching is configured
 
     delivery_modes:
     1 - non persistent
@@ -529,7 +601,20 @@ class Publisher(object):
                              auto_delete=True,
                              immediate=False,
                              mandatory=False,
+                             batch_size=0,
+                             batch_window=0.01,
+                             confirm=False,
+                             max_in_flight=1000,
                              **kwargs): # **kwargs is a sloppy hack
+        """
+        @param batch_size if more than 0, messages are buffered and published
+        together when this many are waiting or batch_window seconds after the
+        first one, whichever comes first
+        @param confirm if True the channel is transactional and each batch is
+        committed; send fires once the broker has accepted the batch
+        @param max_in_flight the most messages buffered or awaiting the broker
+        when batching; send waits for room beyond that
+        """
         self.channel = chan
         self.exchange = exchange
         self.routing_key = routing_key
@@ -542,6 +627,27 @@ class Publisher(object):
         self.immediate = immediate
         self._closed = False # Assuming we were given an open channel
 
+        self.confirm = confirm
+        self.batch_size = int(batch_size or 0)
+        if self.confirm and self.batch_size == 0:
+            # Every message is committed on its own
+            self.batch_size = 1
+        self.batch_window = batch_window
+        self.max_in_flight = max(int(max_in_flight), self.batch_size)
+
+        # Buffered messages: a list of (content, routing_key, deferred)
+        self._batch = []
+        self._flush_call = None
+        self._flush_lock = defer.DeferredLock()
+        self._in_flight = 0
+        self._room_waiters = []
+
+        self.stats = {'messages':0,
+                      'batches':0,
+                      'max_batch_size':0,
+                      'flush_seconds':0.0,
+                      'last_flush_seconds':0.0}
+
     @defer.inlineCallbacks
     def declare(self):
 
@@ -549,6 +655,9 @@ class Publisher(object):
                                       type=self.exchange_type,
                                       durable=self.durable,
                                       auto_delete=self.auto_delete)
+        if self.confirm:
+            yield self.channel.tx_select()
+
         defer.returnValue(self)
 
     @classmethod
@@ -664,20 +773,112 @@ class Publisher(object):
                                       content_encoding=content_encoding,
                                       serializer=serializer,
                                       reply_to=reply_to)
+        if self.batch_size:
+            return self._send_batched(message, routing_key)
+
         return self.channel.basic_publish(content=message,
                                         exchange=self.exchange,
                                         routing_key=routing_key,
                                         mandatory=self.mandatory,
                                         immediate=self.immediate)
 
+    @defer.inlineCallbacks
+    def _send_batched(self, message, routing_key):
+        """
+        Add a message to the batch; fires once the batch has been published
+        """
+        while self._in_flight >= self.max_in_flight:
+            room = defer.Deferred()
+            self._room_waiters.append(room)
+            yield room
+
+        self._in_flight += 1
+        d = defer.Deferred()
+        self._batch.append((message, routing_key, d))
+
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+        elif self._flush_call is None:
+            self._flush_call = reactor.callLater(self.batch_window, self.flush)
+
+        yield d
+
+    @defer.inlineCallbacks
+    def flush(self):
+        """
+        Publish the buffered messages in one go and, with confirm, commit
+        them. Errors are passed to the senders of the messages.
+        """
+        if self._flush_call is not None and self._flush_call.active():
+            self._flush_call.cancel()
+        self._flush_call = None
+
+        batch, self._batch = self._batch, []
+        if not batch:
+            defer.returnValue(None)
+
+        # Batches are published in order and a commit covers only its own batch
+        yield self._flush_lock.acquire()
+        t1 = time.time()
+        error = None
+        try:
+            published = [self.channel.basic_publish(content=message,
+                                        exchange=self.exchange,
+                                        routing_key=routing_key,
+                                        mandatory=self.mandatory,
+                                        immediate=self.immediate) for message, routing_key, d in batch]
+
+            results = yield defer.DeferredList(published, consumeErrors=True)
+            for success, result in results:
+                if not success:
+                    result.raiseException()
+
+            if self.confirm:
+                yield self.channel.tx_commit()
+        except Exception:
+            error = failure.Failure()
+            log.error('Publisher: could not publish a batch of %d messages: %s' % (len(batch), error.getErrorMessage()))
+        finally:
+            self._flush_lock.release()
+
+        elapsed = time.time() - t1
+        self.stats['messages'] += len(batch)
+        self.stats['batches'] += 1
+        self.stats['max_batch_size'] = max(self.stats['max_batch_size'], len(batch))
+        self.stats['flush_seconds'] += elapsed
+        self.stats['last_flush_seconds'] = elapsed
+        self._in_flight -= len(batch)
+
+        for message, routing_key, d in batch:
+            if error is None:
+                d.callback(None)
+            else:
+                d.errback(error)
+
+        room = self.max_in_flight - self._in_flight
+        waiters, self._room_waiters = self._room_waiters[:room], self._room_waiters[room:]
+        for waiter in waiters:
+            waiter.callback(None)
+
+    def get_stats(self):
+        """
+        @retval a dict of the batching counters with the mean batch size and
+        flush time
+        """
+        stats = dict(self.stats)
+        batches = stats['batches']
+        stats['mean_batch_size'] = float(stats['messages']) / batches if batches else 0.0
+        stats['mean_flush_seconds'] = stats['flush_seconds'] / batches if batches else 0.0
+        return stats
 
     def close(self):
         """
-        Close the amqp channel, deactivating the Consumer.
+        Publish anything buffered and close the amqp channel, deactivating the Publisher.
         """
         if not self._closed:
-            d = self.channel.channel_close()
             self._closed = True
+            d = self.flush()
+            d.addCallback(lambda _: self.channel.channel_close())
             return d
         return defer.succeed(None)
 
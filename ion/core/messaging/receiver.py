@@ -64,7 +64,7 @@ class Receiver(BasicLifecycleObject):
     rec_messages = {}
     rec_shutoff = False
 
-    def __init__(self, name, scope='global', label=None, xspace=None, process=None, group=None, handler=None, error_handler=None, raw=False, consumer_config=None, publisher_config=None):
+    def __init__(self, name, scope='global', label=None, xspace=None, process=None, group=None, handler=None, error_handler=None, raw=False, consumer_config=None, publisher_config=None, max_concurrent=None):
         """
         @param label descriptive label for the receiver
         @param name the actual exchange name. Used for routing
@@ -77,6 +77,9 @@ class Receiver(BasicLifecycleObject):
         @param consumer_config  Additional Consumer configuration params. Used by _init_receiver, these params take precedence over any
                                 other config.
         @param publisher_config Additional Publisher configuration params, used by send()
+        @param max_concurrent   The number of messages handled at once; messages of a conversation are handled in order.
+                                Defaults to the prefetch_count in the consumer_config. If neither is given every message the
+                                broker delivers (one at a time by default) is handled as it arrives.
         """
         BasicLifecycleObject.__init__(self)
 
@@ -108,6 +111,22 @@ class Receiver(BasicLifecycleObject):
         # A Deferred to await processing completion after of deactivate
         self.completion_deferred = None
 
+        if max_concurrent is None:
+            max_concurrent = self.consumer_config.get('prefetch_count', None)
+        self.max_concurrent = max(int(max_concurrent), 1) if max_concurrent is not None else None
+
+        # Messages waiting for a free handler: a list of (msg, convid, identity, deferred)
+        self._pending_messages = []
+        # The number of messages being handled, the conversations they belong
+        # to and the (user-id, expiry) they share
+        self._active_count = 0
+        self._active_convids = set()
+        self._active_identity = None
+        self._dispatching = False
+        # Conversations which finished while other messages were handled - their
+        # workbench context is cleaned up when the receiver is idle
+        self._finished_convids = []
+
     @defer.inlineCallbacks
     def attach(self, *args, **kwargs):
         """
@@ -201,12 +220,91 @@ class Receiver(BasicLifecycleObject):
         self.error_handlers.append(callback)
 
 
-    @defer.inlineCallbacks
     def receive(self, msg):
         """
-        @brief entry point for received messages; callback from Carrot. All
-                registered handlers will be called in sequence
-        @note is called from carrot as normal method; no return expected
+        @brief entry point for received messages; callback from Carrot. Up to
+                max_concurrent messages are handled at once; a message waits
+                while an earlier message of the same conversation is handled,
+                or while messages from another user are handled.
+        @param msg instance of carrot.backends.txamqp.Message
+        @retval Deferred which fires when the message has been handled
+        """
+        if self.max_concurrent is None:
+            return self._receive(msg)
+
+        try:
+            payload = msg.payload
+            convid = payload.get('conv-id', None)
+            identity = (payload.get('user-id', None), payload.get('expiry', None))
+        except Exception:
+            # Let _receive deal with a message that can not be decoded
+            convid = None
+            identity = None
+
+        d = defer.Deferred()
+        self._pending_messages.append((msg, convid, identity, d))
+        self._dispatch_pending()
+        return d
+
+    def _dispatch_pending(self):
+        """
+        Start handling pending messages, in the order they arrived, while
+        there is a free handler. Skip messages of a conversation which is
+        already being handled.
+
+        The process has one current context, which is switched by each
+        message it receives, and a handler which resumes after a yield runs
+        in whichever context was set last. Messages are only handled at the
+        same time if they carry the same user-id and expiry, so an outgoing
+        message always carries the identity of the request it is sent for.
+        A message from another user waits, and so do the messages after it,
+        until the messages being handled are done.
+        """
+        if self._dispatching:
+            # Called from a handler which completed synchronously; the loop
+            # below picks up where it left off
+            return
+
+        self._dispatching = True
+        try:
+            started = True
+            while started and self._active_count < self.max_concurrent:
+                started = False
+                for i, (msg, convid, identity, d) in enumerate(self._pending_messages):
+                    if self._active_count > 0 and identity != self._active_identity:
+                        break
+
+                    if convid is not None and convid in self._active_convids:
+                        continue
+
+                    del self._pending_messages[i]
+                    self._start_message(msg, convid, identity, d)
+                    started = True
+                    break
+        finally:
+            self._dispatching = False
+
+    def _start_message(self, msg, convid, identity, d):
+        self._active_identity = identity
+        self._active_count += 1
+        if convid is not None:
+            self._active_convids.add(convid)
+
+        def handled(result):
+            self._active_count -= 1
+            self._active_convids.discard(convid)
+            self._dispatch_pending()
+            return result
+
+        rd = defer.maybeDeferred(self._receive, msg)
+        rd.addBoth(handled)
+        rd.chainDeferred(d)
+
+    @defer.inlineCallbacks
+    def _receive(self, msg):
+        """
+        @brief Handle one received message. All registered handlers will be
+                called in sequence
         @param msg instance of carrot.backends.txamqp.Message
         """
         log.info('Start Receiver.Receive on proc: %s' % str(self.process))
@@ -351,68 +449,71 @@ class Receiver(BasicLifecycleObject):
                             # if it is not an rpc conversation - clean up the context
                             log.info('Clearing Non RPC request workbench_context: %s, in Proc: %s ' % (convid, process))
 
-                            # Clear anything created in this context
-                            workbench.manage_workbench_cache(convid)
-
-                            # Reset the context to something sensible on the way our - but what?
-                            if process.context.get('progenitor_convid') == convid:
-                                last_context = process.conversation_context.replace_context()
-
-                                if last_context is None:
-                                    # If there are no active conversations reset to a default
-                                    process.context = ContextObject()
-                                    # Lets try to clear everything!
-                                    workbench.manage_workbench_cache()
-
-
-                                else:
-                                    process.context = last_context
-
-
-                            count = workbench.count_persistent()
-                            if count > 0:
-                                    # Print a warning if someone else is using the persistence tricks...
-                                log.info('The "%s" process is holding persistent state in %d repository objects!' % (process.proc_name, count))
-
-
+                            for finished in self._conversations_to_clear(convid):
+                                self._clear_conversation(process, workbench, finished)
 
                         elif performative == 'request':
                             # if it is the end of an rpc request - clean up the context
 
                             log.info('Clearing RPC request workbench_context: %s, in Proc: %s ' % (convid, process))
 
-                            # Clear anything created in this context
-                            workbench.manage_workbench_cache(convid)
+                            for finished in self._conversations_to_clear(convid):
+                                self._clear_conversation(process, workbench, finished)
 
-                            # Reset the context to something sensible on the way our - but what?
-                            if process.context.get('progenitor_convid') == convid:
-                                last_context = process.conversation_context.replace_context()
+                        else:
+                            log.info('No context to clear in Proc: %s ' % (process))
 
-                                if last_context is None:
-                                    # If there are no active conversations reset to a default
-                                    process.context = ContextObject()
-                                    # Lets try to clear everything!
-                                    workbench.manage_workbench_cache()
 
-                                else:
-                                    process.context = last_context
+                        log.info(workbench.cache_info())
 
-                            count = workbench.count_persistent()
-                            if count > 0:
-                                    # Print a warning if someone else is using the persistence tricks...
-                                log.info('The "%s" process is holding persistent state in %d repository objects!' % (process.proc_name, count))
 
+        log.info( 'End Receiver.Receive on proc: %s' % str(self.process))
+        defer.returnValue(None)
 
+    def _conversations_to_clear(self, convid):
+        """
+        While other messages are handled concurrently, repositories made for
+        this conversation may be tagged with the context of another one, and
+        theirs with this one. Keep the workbench context of a finished
+        conversation until the receiver is idle.
+        @retval list of the conversations to clear now
+        """
+        if self.max_concurrent is None:
+            return [convid]
 
-                        else:
-                            log.info('No context to clear in Proc: %s ' % (process))
+        self._finished_convids.append(convid)
+        # This message is still counted as active
+        if self._active_count > 1:
+            return []
 
+        finished = self._finished_convids
+        self._finished_convids = []
+        return finished
 
-                        log.info(workbench.cache_info())
+    def _clear_conversation(self, process, workbench, convid):
+        """
+        Clear anything created in the context of a conversation and reset the
+        process context if it was the context of that conversation.
+        """
+        workbench.manage_workbench_cache(convid)
 
+        # Reset the context to something sensible on the way our - but what?
+        if process.context.get('progenitor_convid') == convid:
+            last_context = process.conversation_context.replace_context()
 
-        log.info( 'End Receiver.Receive on proc: %s' % str(self.process))
-        defer.returnValue(None)
+            if last_context is None:
+                # If there are no active conversations reset to a default
+                process.context = ContextObject()
+                # Lets try to clear everything!
+                workbench.manage_workbench_cache()
+
+            else:
+                process.context = last_context
+
+        count = workbench.count_persistent()
+        if count > 0:
+                # Print a warning if someone else is using the persistence tricks...
+            log.info('The "%s" process is holding persistent state in %d repository objects!' % (process.proc_name, count))
 
     @defer.inlineCallbacks
     def send(self, **kwargs):
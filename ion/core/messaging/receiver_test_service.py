@@ -34,6 +34,9 @@ class ReceiverService(ServiceProcess):
 
         self.action = defer.Deferred()
 
+        # Seconds op_c waits before replying - a stand in for a call to a store
+        self.delay = float(self.spawn_args.get('delay', 0.1))
+
     @defer.inlineCallbacks
     def op_a(self, content, headers, msg):
         """
@@ -69,6 +72,20 @@ class ReceiverService(ServiceProcess):
         self.action = defer.Deferred()
         log.info('Op B Complete!')
 
+    @defer.inlineCallbacks
+    def op_c(self, content, headers, msg):
+        """
+        Dummy operation that waits 'delay' seconds before it replies
+        """
+        log.info('Starting Op C')
+
+        yield pu.asleep(self.delay)
+
+        log.info('Replying OK')
+        yield self.reply_ok(msg, content)
+
+        log.info('Op C Complete!')
+
 
 
 factory = ProcessFactory(ReceiverService)
@@ -106,3 +123,14 @@ class ReceiverServiceClient(ServiceClient):
         (ret, heads, message) = yield self.rpc_send('b', msg)
         defer.returnValue((ret, heads, message))
 
+    @defer.inlineCallbacks
+    def c(self, msg):
+        """
+        @brief Call op_c
+        @retval ok
+        """
+        yield self._check_init()
+
+        (ret, heads, message) = yield self.rpc_send('c', msg)
+        defer.returnValue((ret, heads, message))
+
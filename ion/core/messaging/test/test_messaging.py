@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+
+"""
+@file ion/core/messaging/test/test_messaging.py
+@test ion.core.messaging.messaging Publisher batching
+"""
+import ion.util.ionlog
+log = ion.util.ionlog.getLogger(__name__)
+
+from twisted.internet import defer
+from twisted.trial import unittest
+
+from ion.core.messaging.messaging import Publisher, ProcessExchangeSpace
+from ion.core.messaging.exchange import ExchangeManager
+
+
+class RecordingChannel(object):
+    """
+    Records what a Publisher does with its channel
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def basic_publish(self, content=None, exchange=None, routing_key=None, mandatory=False, immediate=False):
+        self.calls.append(('publish', routing_key))
+        return defer.succeed(None)
+
+    def tx_select(self):
+        self.calls.append(('tx_select', None))
+        return defer.succeed(None)
+
+    def tx_commit(self):
+        self.calls.append(('tx_commit', None))
+        return defer.succeed(None)
+
+    def channel_close(self):
+        self.calls.append(('close', None))
+        return defer.succeed(None)
+
+
+class FakeMessageSpace(object):
+    """
+    Stands in for the broker connection of an exchange space
+    """
+
+    def __init__(self):
+        self.client = None
+        self.terminated = False
+
+    def terminate(self):
+        self.terminated = True
+        return defer.succeed(None)
+
+
+class PublisherBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.channel = RecordingChannel()
+
+    def test_unbatched(self):
+        publisher = Publisher(self.channel, exchange='magnet.topic', routing_key='a')
+
+        publisher.send('one')
+        publisher.send('two', routing_key='b')
+
+        self.assertEqual(self.channel.calls, [('publish', 'a'), ('publish', 'b')])
+        self.assertEqual(publisher.get_stats()['batches'], 0)
+
+    @defer.inlineCallbacks
+    def test_batch_size(self):
+        publisher = Publisher(self.channel, exchange='magnet.topic', routing_key='a', batch_size=3, batch_window=10)
+
+        sent = [publisher.send('msg %d' % i) for i in xrange(7)]
+
+        # Two full batches go straight away, the last message waits for the window
+        self.assertEqual(len(self.channel.calls), 6)
+
+        yield publisher.close()
+        yield defer.DeferredList(sent, fireOnOneErrback=True)
+
+        self.assertEqual(self.channel.calls[-1], ('close', None))
+
+        stats = publisher.get_stats()
+        self.assertEqual(stats['messages'], 7)
+        self.assertEqual(stats['batches'], 3)
+        self.assertEqual(stats['max_batch_size'], 3)
+
+    @defer.inlineCallbacks
+    def test_batch_window(self):
+        publisher = Publisher(self.channel, exchange='magnet.topic', routing_key='a', batch_size=100, batch_window=0.01)
+
+        sent = [publisher.send('msg %d' % i, routing_key=str(i)) for i in xrange(5)]
+        self.assertEqual(self.channel.calls, [])
+
+        yield defer.DeferredList(sent, fireOnOneErrback=True)
+
+        self.assertEqual(self.channel.calls, [('publish', str(i)) for i in xrange(5)])
+        self.assertEqual(publisher.get_stats()['batches'], 1)
+
+    @defer.inlineCallbacks
+    def test_confirm(self):
+        publisher = Publisher(self.channel, exchange='magnet.topic', routing_key='a', batch_size=2, confirm=True)
+
+        # Declare puts the channel in transaction mode
+        self.channel.exchange_declare = lambda **kwargs: defer.succeed(None)
+        yield publisher.declare()
+        self.assertEqual(self.channel.calls, [('tx_select', None)])
+
+        sent = [publisher.send('msg %d' % i) for i in xrange(4)]
+        yield defer.DeferredList(sent, fireOnOneErrback=True)
+
+        self.assertEqual(self.channel.calls[1:], [('publish', 'a'), ('publish', 'a'), ('tx_commit', None)] * 2)
+
+    @defer.inlineCallbacks
+    def test_max_in_flight(self):
+        commits = []
+        def tx_commit():
+            d = defer.Deferred()
+            commits.append(d)
+            return d
+        self.channel.tx_commit = tx_commit
+
+        publisher = Publisher(self.channel, exchange='magnet.topic', routing_key='a', batch_size=2, confirm=True, max_in_flight=2)
+
+        sent = [publisher.send('msg %d' % i) for i in xrange(4)]
+
+        # The first batch waits for the broker; the rest wait for room
+        self.assertEqual(len(commits), 1)
+        self.assertEqual(len(self.channel.calls), 2)
+
+        commits[0].callback(None)
+        self.assertEqual(len(commits), 2)
+        self.assertEqual(len(self.channel.calls), 4)
+
+        commits[1].callback(None)
+        yield defer.DeferredList(sent, fireOnOneErrback=True)
+
+        self.assertEqual(publisher.get_stats()['messages'], 4)
+
+    @defer.inlineCallbacks
+    def test_publish_error(self):
+        def basic_publish(**kwargs):
+            return defer.fail(RuntimeError('channel closed'))
+        self.channel.basic_publish = basic_publish
+
+        publisher = Publisher(self.channel, exchange='magnet.topic', routing_key='a', batch_size=1)
+
+        yield self.assertFailure(publisher.send('msg'), RuntimeError)
+
+
+class ExchangeSpaceBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.channel = RecordingChannel()
+
+        def name(ex_space, config):
+            return defer.succeed(Publisher(self.channel, **config))
+        self.patch(Publisher, 'name', staticmethod(name))
+
+        self.exchange_manager = ExchangeManager(None)
+        self.exchange_manager.message_space = FakeMessageSpace()
+        self.exchange_manager.exchange_space = ProcessExchangeSpace(self.exchange_manager.message_space, 'magnet.topic')
+
+    @defer.inlineCallbacks
+    def test_shared_publisher(self):
+        ex_space = self.exchange_manager.exchange_space
+
+        # Values that are not Publisher params, and may not be hashable, do not split the publishers
+        config = {'batch_size': 10, 'batch_window': 10, 'credentials': {'user': 'me'}}
+        publisher = yield ex_space._get_batch_publisher(config)
+        same = yield ex_space._get_batch_publisher({'batch_size': '10', 'batch_window': 10.0, 'credentials': ['me']})
+        self.assertIdentical(publisher, same)
+
+        other = yield ex_space._get_batch_publisher({'batch_size': 10, 'batch_window': 10, 'confirm': True})
+        self.assertNotIdentical(publisher, other)
+
+        yield ex_space.close_batch_publishers()
+
+    @defer.inlineCallbacks
+    def test_terminate_flushes(self):
+        ex_space = self.exchange_manager.exchange_space
+
+        sent = [ex_space.send('a', 'msg %d' % i, publisher_config={'batch_size': 100, 'batch_window': 10}) for i in xrange(3)]
+        self.assertEqual(self.channel.calls, [])
+
+        yield self.exchange_manager.on_terminate()
+        yield defer.DeferredList(sent, fireOnOneErrback=True)
+
+        self.assertEqual(self.channel.calls, [('publish', 'a')] * 3 + [('close', None)])
+        self.assertEqual(self.exchange_manager.message_space.terminated, True)
+        self.assertEqual(ex_space._batch_publishers, {})
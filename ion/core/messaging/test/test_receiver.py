@@ -9,6 +9,7 @@ import ion.util.ionlog
 log = ion.util.ionlog.getLogger(__name__)
 
 from twisted.internet import defer
+import time
 
 from ion.test.iontest import IonTestCase
 
@@ -123,4 +124,86 @@ class ReceiverTest(IonTestCase):
         self.assertNotEqual(context_1,context_2)
 
         self.assertEqual(a_resp.name,'David')
-        self.assertEqual(b_resp.name,'David')
\ No newline at end of file
+        self.assertEqual(b_resp.name,'David')
+
+
+
+class ReceiverThroughputTest(IonTestCase):
+    """
+    Compare the throughput of a service which handles one message at a time
+    with one which has a prefetch window and handles messages concurrently.
+    """
+
+    # Number of requests and the time op_c takes to handle each one
+    num_requests = 20
+    delay = 0.1
+
+    @defer.inlineCallbacks
+    def setUp(self):
+        yield self._start_container()
+
+        self.proc = Process()
+        yield self.proc.spawn()
+        self.rsc = ReceiverServiceClient(proc=self.proc)
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        yield self._stop_container()
+
+    @defer.inlineCallbacks
+    def _run_requests(self, **spawnargs):
+
+        spawnargs.update({'proc-name':'ReceiverService', 'delay':self.delay})
+        rs = ReceiverService(spawnargs=spawnargs)
+        yield rs.spawn()
+
+        msg = yield self.proc.message_client.create_instance(PERSON_TYPE)
+        msg.name = 'David'
+
+        t1 = time.time()
+        results = yield defer.DeferredList([self.rsc.c(msg) for i in xrange(self.num_requests)], fireOnOneErrback=True, consumeErrors=True)
+        elapsed = time.time() - t1
+
+        for success, (resp, heads, message) in results:
+            self.assertEqual(resp.name, 'David')
+
+        log.info('%s: %d requests in %.3f seconds, %.1f requests per second' % (spawnargs, self.num_requests, elapsed, self.num_requests / elapsed))
+        defer.returnValue(elapsed)
+
+    @defer.inlineCallbacks
+    def test_one_at_a_time(self):
+
+        elapsed = yield self._run_requests()
+
+        # Each request waits for the one before it
+        self.failUnless(elapsed >= self.num_requests * self.delay)
+
+    @defer.inlineCallbacks
+    def test_concurrent(self):
+
+        elapsed = yield self._run_requests(prefetch_count=10, max_concurrent=10)
+
+        # Ten requests are handled at a time
+        self.failUnless(elapsed < self.num_requests * self.delay / 2)
+
+    @defer.inlineCallbacks
+    def test_concurrent_users(self):
+
+        spawnargs = {'proc-name':'ReceiverService', 'delay':self.delay, 'prefetch_count':10, 'max_concurrent':10}
+        rs = ReceiverService(spawnargs=spawnargs)
+        yield rs.spawn()
+
+        msg = yield self.proc.message_client.create_instance(PERSON_TYPE)
+        msg.name = 'David'
+
+        # Requests from two users arrive interleaved and op_c yields before it
+        # replies - each reply must carry the user-id of its own request
+        expiry = str(int(time.time()) + 3600)
+        users = ['user%d' % (i % 2) for i in xrange(6)]
+        results = yield defer.DeferredList([self.rsc.rpc_send_protected('c', msg, user_id=user, expiry=expiry)
+                                            for user in users], fireOnOneErrback=True, consumeErrors=True)
+
+        for user, (success, (resp, heads, message)) in zip(users, results):
+            self.assertEqual(resp.name, 'David')
+            self.assertEqual(heads['user-id'], user)
+            self.assertEqual(heads['expiry'], expiry)
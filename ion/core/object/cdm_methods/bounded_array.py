@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+"""
+@file ion/core/object/cdm_methods/bounded_array.py
+@brief Wrapper methods for the cdm bounded array and ndarray objects - numpy access to the array values
+@author David Stuebe
+"""
+
+# Get the object decorator used on wrapper methods!
+from ion.core.object.object_utils import _gpb_source
+
+from ion.core.object.object_utils import OOIObjectError
+import ion.util.ionlog
+log = ion.util.ionlog.getLogger(__name__)
+
+from google.protobuf import descriptor
+
+from bisect import bisect_left, bisect_right
+
+# numpy is an optional dependency (the numpy extra in setup.py). Without it GetView, GetNDArray and the variable
+# method GetSlice raise OOIObjectError - see _check_numpy.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Fixed width field types - these can be viewed directly in the packed bytes (little endian on the wire)
+FIXED_WIDTH_DTYPES = {
+    descriptor.FieldDescriptor.TYPE_DOUBLE : '<f8',
+    descriptor.FieldDescriptor.TYPE_FLOAT : '<f4',
+    descriptor.FieldDescriptor.TYPE_FIXED64 : '<u8',
+    descriptor.FieldDescriptor.TYPE_FIXED32 : '<u4',
+    descriptor.FieldDescriptor.TYPE_SFIXED64 : '<i8',
+    descriptor.FieldDescriptor.TYPE_SFIXED32 : '<i4',
+    }
+
+# Variable width field types - these must be decoded and copied
+VARINT_DTYPES = {
+    descriptor.FieldDescriptor.TYPE_INT32 : 'i4',
+    descriptor.FieldDescriptor.TYPE_SINT32 : 'i4',
+    descriptor.FieldDescriptor.TYPE_UINT32 : 'u4',
+    descriptor.FieldDescriptor.TYPE_INT64 : 'i8',
+    descriptor.FieldDescriptor.TYPE_SINT64 : 'i8',
+    descriptor.FieldDescriptor.TYPE_UINT64 : 'u8',
+    descriptor.FieldDescriptor.TYPE_BOOL : 'bool',
+    }
+
+# Wire type for a length delimited field - packed repeated fields
+WIRETYPE_LENGTH_DELIMITED = 2
+
+
+def _check_numpy():
+    if numpy is None:
+        raise OOIObjectError('The numpy package is required for array access to CDM bounded arrays')
+
+
+def _read_varint(bytes, pos):
+    """
+    Decode a base 128 varint from a string of bytes. Returns the value and the position after it.
+    """
+    result = 0
+    shift = 0
+    while True:
+        b = ord(bytes[pos])
+        result |= (b & 0x7f) << shift
+        pos += 1
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+
+
+def intersect_hyperslab(request, bounds_list):
+    """
+    Find the part of a strided hyperslab request which is covered by a bounded array.
+
+    @param request - a list of (start, stop, step) tuples, one per dimension in the index space of the variable
+    @param bounds_list - the bounds of a bounded array (objects with origin and size), one per dimension
+    @retval None if they do not intersect, otherwise a tuple of two tuples of slice objects: the index into the
+    result of the request (with the step applied) and the index into the bounded array's values.
+    """
+    target_index = []
+    source_index = []
+    for (start, stop, step), bounds in zip(request, bounds_list):
+
+        # First index in the request which is inside these bounds
+        lo = max(start, bounds.origin)
+        offset = (lo - start) % step
+        if offset:
+            lo += step - offset
+
+        hi = min(stop, bounds.origin + bounds.size)
+        if lo >= hi:
+            return None
+
+        target_index.append(slice((lo - start) // step, (hi - start + step - 1) // step))
+        source_index.append(slice(lo - bounds.origin, hi - bounds.origin, step))
+
+    return tuple(target_index), tuple(source_index)
+
+
+class BoundedArrayIndex(object):
+    """
+    An interval index over the bounds of a list of bounded arrays. Answers which of them intersect the extent of a
+    hyperslab without testing every bounded array.
+
+    The bounded arrays are sorted by their origin along one key dimension - the one with the most distinct origins,
+    usually the dimension along which the variable was aggregated. A running maximum of their upper bounds in that
+    dimension is kept so both ends of the candidate range are found by bisection, even when the bounded arrays
+    overlap. Only the candidates are tested against the other dimensions.
+    """
+
+    def __init__(self, bounds_lists):
+        """
+        @param bounds_lists - the bounds of each bounded array (a list of objects with origin and size) in order
+        """
+        self.extents = []
+        self.rank = None
+        for position, bounds_list in enumerate(bounds_lists):
+            extent = tuple([(bounds.origin, bounds.origin + bounds.size) for bounds in bounds_list])
+            if self.rank is None:
+                self.rank = len(extent)
+            elif len(extent) != self.rank:
+                raise OOIObjectError('Bounded array %d has rank %d - expected rank %d' % (position, len(extent), self.rank))
+            self.extents.append(extent)
+
+        self.key_dim = None
+        self._order = []
+        self._starts = []
+        self._max_stops = []
+
+        if not self.rank:
+            return
+
+        # Pick the dimension which best separates the bounded arrays
+        best = 0
+        for dim in xrange(self.rank):
+            distinct = len(set([extent[dim][0] for extent in self.extents]))
+            if distinct > best:
+                best = distinct
+                self.key_dim = dim
+
+        key_dim = self.key_dim
+        self._order = sorted(xrange(len(self.extents)), key=lambda position: self.extents[position][key_dim])
+
+        max_stop = None
+        for position in self._order:
+            start, stop = self.extents[position][key_dim]
+            max_stop = stop if max_stop is None else max(max_stop, stop)
+            self._starts.append(start)
+            self._max_stops.append(max_stop)
+
+    def __len__(self):
+        return len(self.extents)
+
+    def query(self, request):
+        """
+        Find the bounded arrays whose bounds intersect the extent of a request.
+        @param request - a list of (start, stop) tuples, one per dimension. Any further items in each tuple (a step)
+        are ignored - use intersect_hyperslab to test a strided request exactly.
+        @retval a list of the positions of the matching bounded arrays in the order they were given
+        """
+        if len(request) != self.rank and len(self.extents) > 0:
+            raise OOIObjectError('Request of rank %d does not match the bounded arrays of rank %d' % (len(request), self.rank))
+
+        for req in request:
+            if req[0] >= req[1]:
+                return []
+
+        if self.key_dim is None:
+            return range(len(self.extents))
+
+        start, stop = request[self.key_dim][:2]
+
+        # Skip everything that ends before the request starts and everything that starts after it ends
+        first = bisect_right(self._max_stops, start)
+        last = bisect_left(self._starts, stop)
+
+        result = []
+        for i in xrange(first, last):
+            position = self._order[i]
+            for (lo, hi), req in zip(self.extents[position], request):
+                if req[1] <= lo or hi <= req[0]:
+                    break
+            else:
+                result.append(position)
+
+        result.sort()
+        return result
+
+
+#------------------------------------#
+# Wrapper_NDArray Specialized Methods #
+#------------------------------------#
+
+@_gpb_source
+def _get_ndarray_view(self):
+    """
+    Specialized method for CDM array objects (float32Array, float64Array etc) to return the values as a one
+    dimensional numpy array.
+
+    If the object has not been loaded yet and its values are a packed fixed width type the result is a read only view
+    directly on the serialized bytes - the values are not decoded or copied and the object is not parsed. Otherwise
+    the values are copied once into a new array.
+    """
+    _check_numpy()
+
+    field = self.DESCRIPTOR.fields_by_name.get('value', None)
+    if field is None or field.label != field.LABEL_REPEATED:
+        raise OOIObjectError('Can not get an ndarray view of an object with no repeated value field: %s' % str(self.ObjectClass))
+
+    dtype = FIXED_WIDTH_DTYPES.get(field.type, None)
+
+    bytes = self._bytes
+    if dtype is not None and bytes is not None:
+
+        if len(bytes) == 0:
+            return numpy.zeros(0, dtype=dtype)
+
+        key, pos = _read_varint(bytes, 0)
+        if key >> 3 == field.number and key & 0x7 == WIRETYPE_LENGTH_DELIMITED:
+            length, pos = _read_varint(bytes, pos)
+
+            # Only take the fast path if the packed values are the whole message
+            if pos + length == len(bytes):
+                itemsize = numpy.dtype(dtype).itemsize
+                return numpy.frombuffer(bytes, dtype=dtype, count=length / itemsize, offset=pos)
+
+        log.debug('Serialized array is not a single packed field - parsing it.')
+
+    if dtype is None:
+        dtype = VARINT_DTYPES.get(field.type, object)
+
+    # Use the GPB container directly - do not make a list of wrapped values first
+    return numpy.array(getattr(self.GPBMessage, 'value'), dtype=dtype)
+
+
+#-------------------------------------------#
+# Wrapper_BoundedArray Specialized Methods #
+#-------------------------------------------#
+
+@_gpb_source
+def _get_bounded_array_shape(self):
+    """
+    Specialized method for CDM bounded arrays to return the shape of the array as a tuple of sizes
+    """
+    return tuple([bounds.size for bounds in self.bounds])
+
+
+@_gpb_source
+def _get_bounded_array_ndarray(self):
+    """
+    Specialized method for CDM bounded arrays to return the values of the ndarray as a numpy array with the shape
+    given by the bounds. See _get_ndarray_view - when possible this is a view on the serialized data.
+    """
+    view = _get_ndarray_view(self.ndarray)
+
+    shape = _get_bounded_array_shape(self)
+    if len(shape) == 0:
+        # Scalar value
+        return view.reshape(())
+
+    count = 1
+    for size in shape:
+        count *= size
+
+    if view.size != count:
+        raise OOIObjectError('The number of values in the ndarray (%d) does not match the bounds of the bounded array %s' % (view.size, str(shape)))
+
+    return view.reshape(shape)
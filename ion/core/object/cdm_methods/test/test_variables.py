@@ -11,7 +11,7 @@ log = ion.util.ionlog.getLogger(__name__)
 from twisted.internet import defer
 
 from ion.test.iontest import IonTestCase
-from ion.core.object.object_utils import create_type_identifier
+from ion.core.object.object_utils import create_type_identifier, OOIObjectError
 from ion.services.coi.resource_registry.resource_client import ResourceClient
 from ion.services.coi.datastore_bootstrap.ion_preload_config import PRELOAD_CFG, ION_DATASETS_CFG
 
@@ -21,6 +21,7 @@ CDM_BOUNDED_ARRAY_TYPE = create_type_identifier(object_id=10021, version=1)
 CDM_F64_ARRAY_TYPE = create_type_identifier(object_id=10014, version=1)
 
 from ion.core.object.cdm_methods.variables import _flatten_index
+from ion.core.object.cdm_methods import bounded_array
 
 class CdmVariableTest(IonTestCase):
     """
@@ -193,6 +194,9 @@ class CdmVariableTest(IonTestCase):
 
                 # Assert that the stored value matches its calculated equal
                 self.assertEquals((i * num_vals) + j, val)
+
+        # Indices beyond the rank are ignored, as they always were
+        self.assertEquals(self.var.GetValue(3, 4, 99), (3 * num_vals) + 4)
     
     @defer.inlineCallbacks
     def test_GetValue_3D_multiple_BA(self):
@@ -253,6 +257,117 @@ class CdmVariableTest(IonTestCase):
                             count += 1
     
 
+    @defer.inlineCallbacks
+    def test_GetSlice_1D_multiple_BA(self):
+        yield self.setup_1D_multiple_BA()
+
+        vals = self.var.GetSlice()
+        self.assertEquals(list(vals), [float(i) for i in range(90)])
+
+        vals = self.var.GetSlice(slice(25, 65, 3))
+        self.assertEquals(list(vals), [float(i) for i in range(25, 65, 3)])
+
+        self.assertEquals(self.var.GetSlice(42), 42.0)
+
+    @defer.inlineCallbacks
+    def test_GetSlice_3D_multiple_BA(self):
+        num_dims = 3
+        num_arrs = 13
+        num_vals = 17
+        yield self.setup_nD_multiple_BA(num_dims, num_arrs, num_vals)
+
+        vals = self.var.GetSlice(slice(2, 11, 2), 5, slice(3, None))
+        self.assertEquals(vals.shape, (5, 14))
+
+        for i, ii in enumerate(range(2, 11, 2)):
+            for k, kk in enumerate(range(3, num_vals)):
+                self.assertEquals(vals[i, k], self.var.GetValue(ii, 5, kk))
+
+    @defer.inlineCallbacks
+    def test_GetNDArray(self):
+        num_dims = 2
+        num_arrs = 3
+        num_vals = 5
+        yield self.setup_nD_multiple_BA(num_dims, num_arrs, num_vals)
+
+        ba = self.var.content.bounded_arrays[1]
+        self.assertEquals(ba.GetShape(), (1, 5))
+
+        vals = ba.GetNDArray()
+        self.assertEquals(vals.shape, (1, 5))
+        self.assertEquals(list(vals[0]), [5.0, 6.0, 7.0, 8.0, 9.0])
+
+    @defer.inlineCallbacks
+    def test_GetView_serialized(self):
+        yield self.setup_1D_multiple_BA()
+
+        repo = self.var.Repository
+        repo.commit('Commit to serialize the arrays')
+        resource = yield repo.checkout('master')
+
+        var = resource.resource_object.root_group.FindVariableByName('var1')
+        ndarray = var.content.bounded_arrays[1].ndarray
+
+        # The view is made from the serialized bytes without parsing the object
+        self.assertNotEquals(ndarray._bytes, None)
+        vals = ndarray.GetView()
+        self.assertNotEquals(ndarray._bytes, None)
+
+        self.assertEquals(list(vals), [float(i) for i in range(30, 60)])
+        self.assertEquals(var.GetSlice(slice(None, None, 7)).tolist(), [float(i) for i in range(0, 90, 7)])
+
+    @defer.inlineCallbacks
+    def test_GetIntersectingBoundedArrays(self):
+        yield self.setup_1D_multiple_BA()
+
+        repo = self.var.Repository
+        repo.commit('Commit to hash the bounded arrays')
+        resource = yield repo.checkout('master')
+        var = resource.resource_object.root_group.FindVariableByName('var1')
+
+        links = var.content.bounded_arrays.GetLinks()
+
+        coverage = yield repo.create_object(CDM_BOUNDED_ARRAY_TYPE)
+        bounds = coverage.bounds.add()
+        bounds.origin = 29
+        bounds.size = 2
+        self.assertEquals(var.GetIntersectingBoundedArrays(coverage), [links[0].key, links[1].key])
+
+        # The index is cached on the variable and reused
+        index = var._bounded_array_index[1]
+        bounds.origin = 75
+        bounds.size = 100
+        self.assertEquals(var.GetIntersectingBoundedArrays(coverage), [links[2].key])
+        self.assertIdentical(var._bounded_array_index[1], index)
+
+        self.assertEquals(var.GetValue(59), 59.0)
+
+    def test_BoundedArrayIndex(self):
+
+        class Bounds(object):
+            def __init__(self, origin, size):
+                self.origin = origin
+                self.size = size
+
+        # Overlapping in the first dimension and tiled in the second
+        index = bounded_array.BoundedArrayIndex([
+            [Bounds(0, 100), Bounds(0, 10)],
+            [Bounds(10, 5), Bounds(0, 10)],
+            [Bounds(20, 5), Bounds(10, 10)],
+            [Bounds(30, 5), Bounds(0, 10)],
+            ])
+
+        self.assertEquals(index.query([(12, 13), (5, 6)]), [0, 1])
+        self.assertEquals(index.query([(20, 35), (10, 11)]), [2])
+        self.assertEquals(index.query([(100, 200), (0, 20)]), [])
+        self.assertEquals(index.query([(0, 200), (3, 3)]), [])
+        self.assertRaises(OOIObjectError, index.query, [(0, 1)])
+
+    if bounded_array.numpy is None:
+        test_GetSlice_1D_multiple_BA.skip = test_GetSlice_3D_multiple_BA.skip = 'numpy is not available'
+        test_GetNDArray.skip = test_GetView_serialized.skip = 'numpy is not available'
+
+
     def test_fail_flatten_index(self):
         self.assertRaises(AssertionError, _flatten_index, None, [])
         self.assertRaises(AssertionError, _flatten_index, [], None)
@@ -16,6 +16,7 @@ import ion.util.ionlog
 log = ion.util.ionlog.getLogger(__name__)
 
 from ion.core.object.cdm_methods import group
+from ion.core.object.cdm_methods import bounded_array
 
 from math import ceil
 
@@ -77,60 +78,184 @@ def GetValue(self, *args):
 
     usage for a 3Dimensional variable:
     as.getValue(1,3,9)
+
+    The indices are paired with the leading dimensions of the bounded arrays - extra indices are ignored. Only a
+    full set of indices, one per dimension, is looked up in the bounded array index.
     """
     
-    # @todo: Need tests for multidim arrays
-    # @todo: Check the rank outside the for loop
     # @todo: Check to make sure args are integers!
 
     value = None
-    
-    for ba in self.content.bounded_arrays:
-    
 
-        for index, bounds in zip(args, ba.bounds):
-            if bounds.origin > index or index >= bounds.origin + bounds.size :
+    bounded_arrays = self.content.bounded_arrays
+    if len(bounded_arrays) > 0 and len(args) == len(bounded_arrays[0].bounds):
+        positions = _find_intersecting_bounded_arrays(self, [(index, index + 1) for index in args])
+    else:
+        # Take the first bounded array which holds the indices in the dimensions they are given for
+        positions = []
+        for position, ba in enumerate(bounded_arrays):
+            for index, bounds in zip(args, ba.bounds):
+                if bounds.origin > index or index >= bounds.origin + bounds.size:
+                    break
+            else:
+                positions.append(position)
                 break
 
-        else:
-            # We now have the the ndarray of interest..  extract the value!
+    if positions:
+        # The first bounded array listed wins
+        ba = self.content.bounded_arrays[positions[0]]
 
-            # Create a list of this bounded_array's sizes and use origin to determine
-            # the given indices position in the ndarray
-            indices = []
-            shape = []
-            for index, bounds in zip(args, ba.bounds):
-                  indices.append(index - bounds.origin)  
-                  shape.append(bounds.size)  
-            
-            # Find the flattened index (make sure to apply the origin values as an offset!)
-            flattened_index = _flatten_index(indices, shape)
-            
-            # Grab the value from the ndarray
-            value = ba.ndarray.value[flattened_index]
-            break
+        # Create a list of this bounded_array's sizes and use origin to determine
+        # the given indices position in the ndarray
+        indices = []
+        shape = []
+        for index, bounds in zip(args, ba.bounds):
+            indices.append(index - bounds.origin)
+            shape.append(bounds.size)
+
+        # Find the flattened index (make sure to apply the origin values as an offset!)
+        flattened_index = _flatten_index(indices, shape)
 
+        # Grab the value from the ndarray
+        value = ba.ndarray.value[flattened_index]
 
     return value
 
 
 @_gpb_source
-def GetIntersectingBoundedArrays(self, bounded_array):
+def GetSlice(self, *args):
+    """
+    @Brief Get a hyperslab of the variable as a numpy array
+    @param self - a cdm variable object
+    @param args - one argument per dimension: an integer index or a slice object. Missing trailing dimensions are
+    taken in full. Integer indices remove that dimension from the result, like numpy indexing.
+
+    usage for a 3Dimensional variable:
+    var.GetSlice(slice(0,10), 4, slice(None, None, 2))
+
+    Each bounded array which intersects the request is copied into the result with one block copy. Values in the
+    request which are not covered by any bounded array are zero.
+    """
+    bounded_array._check_numpy()
+
+    shape = [dim.length for dim in self.shape]
+    if len(args) > len(shape):
+        raise OOIObjectError('Too many indices (%d) for variable "%s" of rank %d' % (len(args), self.name, len(shape)))
+
+    args = list(args) + [slice(None)] * (len(shape) - len(args))
+
+    # Normalize the request to a start, stop, step for each dimension
+    request = []
+    squeeze = []
+    for dim, (arg, length) in enumerate(zip(args, shape)):
+        if isinstance(arg, slice):
+            start, stop, step = arg.indices(length)
+            if step < 1:
+                raise OOIObjectError('Only positive slice steps are supported by GetSlice: %s' % str(arg))
+        elif isinstance(arg, (int, long)):
+            start = arg
+            if start < 0:
+                start += length
+            if start < 0 or start >= length:
+                raise OOIObjectError('Index %d out of range for dimension %d of length %d' % (arg, dim, length))
+            stop = start + 1
+            step = 1
+            squeeze.append(dim)
+        else:
+            raise OOIObjectError('Invalid index for GetSlice: "%s" - must be an integer or a slice' % str(arg))
+
+        request.append((start, stop, step))
+
+    target_shape = [max(0, (stop - start + step - 1) // step) for start, stop, step in request]
+
+    result = None
+    bounded_arrays = self.content.bounded_arrays
+    for position in _find_intersecting_bounded_arrays(self, request):
+        ba = bounded_arrays[position]
+
+        intersection = bounded_array.intersect_hyperslab(request, ba.bounds)
+        if intersection is None:
+            continue
+
+        target_index, source_index = intersection
+
+        values = bounded_array._get_bounded_array_ndarray(ba)
+        if result is None:
+            result = bounded_array.numpy.zeros(target_shape, dtype=values.dtype)
+
+        result[target_index] = values[source_index]
+
+    if result is None:
+        # Nothing intersects - return the right shape
+        result = bounded_array.numpy.zeros(target_shape)
+
+    if squeeze:
+        result = result.reshape([size for dim, size in enumerate(target_shape) if dim not in squeeze])
+
+    return result
+
+
+@_gpb_source
+def GetIntersectingBoundedArrays(self, coverage):
     """
     @brief get the SHA1 id of the bounded arrays which intersect the give coverage.
     @param self - a cdm variable object
-    @param bounded_array - a bounded array which specifies an index space coverage of interest
+    @param coverage - a bounded array which specifies an index space coverage of interest
 
     usage for a 3Dimensional variable:
-    as.getValue(1,3,9)
+    var.GetIntersectingBoundedArrays(ba)
     """
 
-    # Get the MyId attribute of the bounded arrays that intersect - that will be the sha1 name for that BA...
+    # Get the key of the links to the bounded arrays that intersect - that will be the sha1 name for that BA...
+    request = [(bounds.origin, bounds.origin + bounds.size) for bounds in coverage.bounds]
 
-    sha1_list = []
+    bounded_arrays = self.content.bounded_arrays
+    sha1_list = [bounded_arrays.GetLink(position).key for position in _find_intersecting_bounded_arrays(self, request)]
     return sha1_list
 
 
+def _get_bounded_array_index(var):
+    """
+    Get the BoundedArrayIndex for the content of a variable. It is cached on the variable and rebuilt when the
+    content changes. Returns None if the content is modified in the workspace - it may still be changing.
+    """
+    content = var.content
+    if content.Modified:
+        return None
+
+    cache = var._bounded_array_index
+    if cache is not None and cache[0] == content.MyId:
+        return cache[1]
+
+    index = bounded_array.BoundedArrayIndex([ba.bounds for ba in content.bounded_arrays])
+    var._bounded_array_index = (content.MyId, index)
+    return index
+
+
+def _find_intersecting_bounded_arrays(var, request):
+    """
+    Find the position of the bounded arrays in the content of a variable whose bounds intersect the extent of
+    request - a list of (start, stop) tuples, one per dimension. Uses the cached index when it can.
+    """
+    index = _get_bounded_array_index(var)
+    if index is not None:
+        return index.query(request)
+
+    # Not worth building an index which can not be kept - scan them
+    positions = []
+    for position, ba in enumerate(var.content.bounded_arrays):
+        if len(ba.bounds) != len(request):
+            raise OOIObjectError('Request of rank %d does not match bounded array %d of rank %d' % (len(request), position, len(ba.bounds)))
+
+        for (start, stop), bounds in zip([req[:2] for req in request], ba.bounds):
+            if stop <= bounds.origin or bounds.origin + bounds.size <= start or start >= stop:
+                break
+        else:
+            positions.append(position)
+
+    return positions
+
+
 def _flatten_index(indices, shape):
     """
     Uses the given indices representing a position in a multidimensional context to determine the
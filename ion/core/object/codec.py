@@ -27,6 +27,9 @@ STRUCTURE_TYPE = object_utils.create_type_identifier(object_id=2, version=1)
 
 ION_R1_GPB = 'ION R1 GPB'
 
+# Default upper bound on the size of one frame from pack_structure_frames
+DEFAULT_FRAME_SIZE = 4 * 1024 * 1024
+
 class CodecError(Exception):
     """
     An error class for problems that occur in the codec
@@ -86,6 +89,56 @@ def pack_structure(content):
     Return the content as a serialized container object.
     """
 
+    root_obj_se, obj_set = _find_structure_elements(content)
+
+    container_structure = _pack_container(root_obj_se, obj_set)
+    serialized = container_structure.SerializeToString()
+
+    log.debug('pack_structure: Packing Complete!')
+
+    return serialized
+
+
+def pack_structure_frames(content, max_frame_size=DEFAULT_FRAME_SIZE):
+    """
+    Generator to pack all children of the content structure as a sequence of serialized container objects. The first
+    frame carries the head, every frame carries as many structure elements as fit in max_frame_size bytes. An element
+    which is larger than max_frame_size is sent in a frame by itself.
+
+    Only one frame is serialized at a time - the elements are referenced from the repositories index hash, not copied.
+    """
+
+    root_obj_se, obj_set = _find_structure_elements(content)
+
+    # An unwrapped GPB Structure message to put stuff into!
+    cs = _pack_container(root_obj_se, [])
+    frame_size = cs.ByteSize()
+    nframes = 0
+
+    for item in obj_set:
+
+        item_size = item.__sizeof__()
+        if frame_size > 0 and frame_size + item_size > max_frame_size:
+            nframes += 1
+            yield cs.SerializeToString()
+
+            cs = object_utils.get_gpb_class_from_type_id(STRUCTURE_TYPE)()
+            frame_size = 0
+
+        _add_container_item(cs, item)
+        frame_size += item_size
+
+    nframes += 1
+    yield cs.SerializeToString()
+
+    log.debug('pack_structure_frames: Packing Complete in %d frames!' % nframes)
+
+
+def _find_structure_elements(content):
+    """
+    Helper for the sender to find the structure elements of the head and all its children which are to be sent
+    """
+
     repo = getattr(content, 'Repository', None)
     if repo is None:
         raise CodecError('Pack Structure received content which does not have a valid Repository')
@@ -138,12 +191,7 @@ def pack_structure(content):
 
         items = child_items
 
-    container_structure = _pack_container(root_obj_se, obj_set)
-    serialized = container_structure.SerializeToString()
-
-    log.debug('pack_structure: Packing Complete!')
-
-    return serialized
+    return root_obj_se, obj_set
 
 def _pack_container(head, objects):
     """
@@ -163,21 +211,26 @@ def _pack_container(head, objects):
     cs.head.value = head.value
 
     for item in objects:
+        _add_container_item(cs, item)
 
-        se = cs.items.add()
+    log.debug('_pack_container: Packed container!')
+    return cs
 
-        # Can not set the pointer directly... must set the components
-        se.key = item.key
-        se.isleaf = item.isleaf
-        se.type.object_id = item.type.object_id
-        se.type.version = item.type.version
+def _add_container_item(cs, item):
+    """
+    Helper for the sender to add one structure element to a container
+    """
+    se = cs.items.add()
 
-        # @TODO - How can we measure memory usage here to make sure this is the okay?
-        se.value = item.value # Let python's object manager keep track of the pointer to the big things!
+    # Can not set the pointer directly... must set the components
+    se.key = item.key
+    se.isleaf = item.isleaf
+    se.type.object_id = item.type.object_id
+    se.type.version = item.type.version
 
+    # @TODO - How can we measure memory usage here to make sure this is the okay?
+    se.value = item.value # Let python's object manager keep track of the pointer to the big things!
 
-    log.debug('_pack_container: Packed container!')
-    return cs
 
 def unpack_structure(serialized_container):
     """
@@ -192,6 +245,74 @@ def unpack_structure(serialized_container):
 
     repo.index_hash.update(obj_dict)
 
+    root_obj = _load_structure_root(repo, head)
+
+    log.debug('unpack_structure: returning root_obj')
+
+    return root_obj
+
+
+def unpack_structure_frames(frames):
+    """
+    Take an iterable of serialized container frames produced by pack_structure_frames and load a repository with
+    their contents. Each frame is parsed and added to the index hash as it arrives.
+    """
+    unpacker = StructureUnpacker()
+    for frame in frames:
+        unpacker.add_frame(frame)
+
+    return unpacker.finish()
+
+
+class StructureUnpacker(object):
+    """
+    Incrementally load the frames of a structure produced by pack_structure_frames. Frames may be added as they are
+    received - only the structure elements, not the serialized frames, are kept.
+    """
+
+    def __init__(self):
+
+        self.repository = repository.Repository()
+
+        self.head = None
+
+        self.frames = 0
+
+    def add_frame(self, serialized_frame):
+        """
+        Parse one frame and add its structure elements to the repository index hash
+        """
+        cs = _parse_container(serialized_frame)
+
+        if cs.HasField('head'):
+            if self.head is not None:
+                raise CodecError('Received a second head while unpacking a framed structure!')
+            self.head = gpb_wrapper.StructureElement(cs.head)
+            self.repository.index_hash[self.head.key] = self.head
+
+        index_hash = self.repository.index_hash
+        for se in cs.items:
+            wse = gpb_wrapper.StructureElement(se)
+            index_hash[wse.key] = wse
+
+        self.frames += 1
+
+    def finish(self):
+        """
+        Load the head and its linked objects once all the frames are received
+        """
+        if self.head is None:
+            raise CodecError('Can not finish unpacking a framed structure without a head!')
+
+        log.debug('StructureUnpacker: Unpacked %d frames' % self.frames)
+        return _load_structure_root(self.repository, self.head)
+
+
+def _load_structure_root(repo, head):
+    """
+    Helper for the receiver to load the head and its children once the index hash is populated
+    """
+
     # Load the object and set it as the workspace root
     root_obj = repo._load_element(head)
     repo.root_object = root_obj
@@ -215,13 +336,9 @@ def unpack_structure(serialized_container):
     # Create a commit to record the state when the message arrived
     cref = repo.commit(comment='Message for you Sir!')
 
-
-    log.debug('unpack_structure: returning root_obj')
-
     return root_obj
 
 
-
 def _unpack_container(serialized_container):
     """
     Helper for the receiver for unpacking message content
@@ -229,14 +346,7 @@ def _unpack_container(serialized_container):
     """
 
     log.debug('_unpack_container: Unpacking Container')
-    # An unwrapped GPB Structure message to put stuff into!
-    cs = object_utils.get_gpb_class_from_type_id(STRUCTURE_TYPE)()
-
-    try:
-        cs.ParseFromString(serialized_container)
-    except decoder._DecodeError, de:
-        log.debug('Received invalid content - decode error: "%s"' % str(de))
-        raise CodecError('Could not decode message content as a GPB container structure!')
+    cs = _parse_container(serialized_container)
 
     # Return arguments
     obj_dict={}
@@ -252,4 +362,19 @@ def _unpack_container(serialized_container):
 
     log.debug('_unpack_container: returning head and dictionary of %d objects' % len(obj_dict))
 
-    return head, obj_dict
\ No newline at end of file
+    return head, obj_dict
+
+def _parse_container(serialized_container):
+    """
+    Helper for the receiver to parse a serialized container
+    """
+    # An unwrapped GPB Structure message to put stuff into!
+    cs = object_utils.get_gpb_class_from_type_id(STRUCTURE_TYPE)()
+
+    try:
+        cs.ParseFromString(serialized_container)
+    except decoder._DecodeError, de:
+        log.debug('Received invalid content - decode error: "%s"' % str(de))
+        raise CodecError('Could not decode message content as a GPB container structure!')
+
+    return cs
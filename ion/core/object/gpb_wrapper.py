@@ -13,7 +13,8 @@ from ion.core.object.object_utils import get_type_from_obj, sha1bin, sha1hex,\
 
 import StringIO
 
-from ion.core.object.object_utils import CDM_GROUP_TYPE, CDM_DATASET_TYPE, CDM_ATTRIBUTE_TYPE, CDM_DIMENSION_TYPE, CDM_VARIABLE_TYPE
+from ion.core.object.object_utils import CDM_GROUP_TYPE, CDM_DATASET_TYPE, CDM_ATTRIBUTE_TYPE, CDM_DIMENSION_TYPE, CDM_VARIABLE_TYPE, CDM_BOUNDED_ARRAY_TYPE
+from ion.core.object.object_utils import CDM_ARRAY_INT32_TYPE, CDM_ARRAY_UINT32_TYPE, CDM_ARRAY_INT64_TYPE, CDM_ARRAY_UINT64_TYPE, CDM_ARRAY_FLOAT32_TYPE, CDM_ARRAY_FLOAT64_TYPE
 
 # Get the object decorators used on all wrapper methods!
 from ion.core.object.object_utils import _gpb_source, _gpb_source_root
@@ -29,6 +30,7 @@ from ion.core.object.cdm_methods import variables
 from ion.core.object.cdm_methods import attribute
 from ion.core.object.cdm_methods import group
 from ion.core.object.cdm_methods import attribute_merge
+from ion.core.object.cdm_methods import bounded_array
 
 import ion.util.ionlog
 from ion.core import ioninit
@@ -36,6 +38,10 @@ from ion.core import ioninit
 CONF = ioninit.config(__name__)
 log = ion.util.ionlog.getLogger(__name__)
 
+# Read once - wrapper classes and instances are made in the inner loops of the object model
+STR_GPBS = CONF.getValue('STR_GPBS', False)
+VALIDATE_ATTRS = CONF.getValue('VALIDATE_ATTRS', True)
+
 STRUCTURE_ELEMENT_TYPE = create_type_identifier(object_id=1, version=1)
 LINK_TYPE = create_type_identifier(object_id=3, version=1)
 
@@ -308,8 +314,10 @@ class WrappedScalarProperty(WrappedProperty):
 class CommitCounter(object):
     """
     Class used to count the number of recursive calls to commit a data structure
+    and the number of those calls which actually had to recompute a sha1 hash.
     """
     count = 0
+    rehashed = 0
 
 
 class WrapperType(type):
@@ -405,18 +413,10 @@ class WrapperType(type):
             # Special methods for certain object types:
             WrapperType._add_specializations(cls, obj_type, clsDict)
 
-            VALIDATE_ATTRS = CONF.getValue('VALIDATE_ATTRS', True)
+            # The instance state lives in the slots of Wrapper - an attribute which is not a field, a property or a
+            # slot can not be set. Without validation the class gets a __dict__ to take any attribute.
             if VALIDATE_ATTRS:
-                def obj_setter(self, k, v):
-                    if self._init and not hasattr(self, k):
-                        raise AttributeError(\
-                            '''Cant add properties to the ION object wrapper for object Class "%s".\n'''
-                            '''Unknown property name - "%s"; value - "%s"''' % (self._GPBClass, k, v))
-                    super(Wrapper, self).__setattr__(k, v)
-
-                clsDict['__setattr__'] = obj_setter
-
-            clsDict['_init'] = False
+                clsDict['__slots__'] = ()
 
             clsType = WrapperType.__new__(WrapperType, clsName, (cls,), clsDict)
 
@@ -544,6 +544,8 @@ class WrapperType(type):
             clsDict['SetDimension'] = group._set_dimension
 
             clsDict['GetValue'] = variables.GetValue
+            clsDict['GetSlice'] = variables.GetSlice
+            clsDict['GetIntersectingBoundedArrays'] = variables.GetIntersectingBoundedArrays
 
             clsDict['MergeAttSrc'] = attribute_merge.MergeAttSrc
             clsDict['MergeAttDst'] = attribute_merge.MergeAttDst
@@ -552,6 +554,14 @@ class WrapperType(type):
             clsDict['MergeAttDstOver'] = attribute_merge.MergeAttDstOver
             clsDict['_GetNumericValue'] = attribute_merge._GetNumericValue
 
+        elif obj_type == CDM_BOUNDED_ARRAY_TYPE:
+            clsDict['GetShape'] = bounded_array._get_bounded_array_shape
+            clsDict['GetNDArray'] = bounded_array._get_bounded_array_ndarray
+
+        elif obj_type.object_id in [t.object_id for t in (CDM_ARRAY_INT32_TYPE, CDM_ARRAY_UINT32_TYPE,
+                CDM_ARRAY_INT64_TYPE, CDM_ARRAY_UINT64_TYPE, CDM_ARRAY_FLOAT32_TYPE, CDM_ARRAY_FLOAT64_TYPE)]:
+            clsDict['GetView'] = bounded_array._get_ndarray_view
+
 
 class Wrapper(object):
     '''
@@ -588,6 +598,11 @@ class Wrapper(object):
 
     __metaclass__ = WrapperType
 
+    # No per instance __dict__ - there may be hundreds of thousands of wrappers in a large dataset
+    __slots__ = ('_gpbMessage', '_root', '_invalid', '_bytes', '_parent_links', '_child_links', '_derived_wrappers',
+                 '_myid', '_modified', '_read_only', '_repository', '_source', '_commit_cache',
+                 '_bounded_array_index')
+
 
     def __init__(self, gpbMessage):
         """
@@ -633,18 +648,20 @@ class Wrapper(object):
 
         self._parent_links = None
         """
-        A list of all the other wrapper objects which link to me
+        A list of all the other wrapper objects which link to me - only exists in
+        the root object and is created on first use
         """
 
         self._child_links = None
         """
-        A list of my child link wrappers
+        A list of my child link wrappers - only exists in the root object and is
+        created on first use
         """
 
         self._derived_wrappers = None
         """
         A container for all the wrapper objects which are rewrapped, derived
-        from a root object wrapper
+        from a root object wrapper - created on first use
         """
 
         self._myid = None # only exists in the root object
@@ -674,10 +691,18 @@ class Wrapper(object):
         To avoid invalidating during when there is a hash conflict in the workspace - set the twin...
         """
 
-        self.__no_string = CONF.getValue('STR_GPBS', False)
+        self._commit_cache = None # only exists in the root object
+        """
+        A tuple of the serialized value and the sha1 key from the last time this
+        object was committed or loaded. If the serialized value has not changed
+        the key can be reused without hashing it again.
+        """
 
-        # Hack to prevent setting properties in a class instance
-        self._init = True
+        self._bounded_array_index = None
+        """
+        Used by CDM variables - a tuple of the key of the content array structure
+        and the BoundedArrayIndex built from it.
+        """
 
         #frame = sys._getframe(2)
         #frames = []
@@ -704,9 +729,6 @@ class Wrapper(object):
         obj = cls(gpbMessage)
         obj._repository = None
         obj._root = obj
-        obj._parent_links = set()
-        obj._child_links = set()
-        obj._derived_wrappers = {}
         obj._read_only = False
         obj._myid = '-1'
         obj._modified = True
@@ -766,9 +788,9 @@ class Wrapper(object):
             self._merge_derived_wrappers(other._source)
 
 
-        elif self.IsRoot:
+        elif self.IsRoot and self._derived_wrappers:
             # If this is a straight invalidation - clear the derived wrappers if root
-            for item in self.DerivedWrappers.itervalues():
+            for item in self._derived_wrappers.itervalues():
                 item.Invalidate()
 
         # Source must always be set to self or another gpb_wrapper object!
@@ -780,6 +802,8 @@ class Wrapper(object):
         self._child_links = None
         self._myid = None
         self._bytes = None
+        self._commit_cache = None
+        self._bounded_array_index = None
 
         # Do not clear root or Repository
 
@@ -865,7 +889,10 @@ class Wrapper(object):
     @property
     @GPBSourceRoot
     def DerivedWrappers(self):
-        return self._derived_wrappers
+        derived = self._derived_wrappers
+        if derived is None:
+            derived = self._derived_wrappers = {}
+        return derived
 
     @GPBSourceRoot
     def _get_myid(self):
@@ -884,7 +911,10 @@ class Wrapper(object):
         """
         A list of all the wrappers which link to me
         """
-        return self._parent_links
+        links = self._parent_links
+        if links is None:
+            links = self._parent_links = set()
+        return links
 
     @GPBSourceRoot
     def _set_parent_links(self, value):
@@ -901,7 +931,10 @@ class Wrapper(object):
         """
         A list of all the wrappers which I link to
         """
-        return self._child_links
+        links = self._child_links
+        if links is None:
+            links = self._child_links = set()
+        return links
 
     @GPBSourceRoot
     def _set_child_links(self, value):
@@ -912,6 +945,13 @@ class Wrapper(object):
 
     ChildLinks = property(_get_child_links, _set_child_links)
 
+    @GPBSourceRoot
+    def _has_child_links(self):
+        """
+        Does this object link to any others - without creating the set of child links
+        """
+        return bool(self._child_links)
+
     @GPBSourceRoot
     def _get_readonly(self):
         return self._read_only
@@ -1005,8 +1045,11 @@ class Wrapper(object):
 
         self.recurse_count.count += 1
         local_cnt = self.recurse_count.count
+
+        # Leaf objects do not need a set of child links made for them
+        child_links = self._child_links or ()
         log.debug('Entering Recurse Commit: recurse counter - %d, Object Type - %s, child links - %d, objects to commit - %d, Modified - %s' %
-              (local_cnt, type(self), len(self.ChildLinks), len(structure), self.Modified))
+              (local_cnt, type(self), len(child_links), len(structure), self.Modified))
 
         if not  self.Modified:
             # This object is already committed!
@@ -1018,7 +1061,7 @@ class Wrapper(object):
         se = StructureElement()
         repo = self.Repository
 
-        for link in  self.ChildLinks:
+        for link in child_links:
 
             if link.Invalid:
                 log.error('Link in child links is invalid!')
@@ -1043,31 +1086,35 @@ class Wrapper(object):
                     child = repo.get_linked_object(link)
 
                     # Determine whether this is a leaf node
-                    if len(child.ChildLinks) == 0:
-                        link.isleaf = True
-                    else:
-                        link.isleaf = False
+                    link.isleaf = not child._has_child_links()
 
                     child.RecurseCommit(structure)
 
             # Save the link info as a convience for sending!
             se.ChildLinks.add(link.key)
 
-        se.value = self.SerializeToString()
+        value = self.SerializeToString()
+        se.value = value
         #se.key = sha1hex(se.value)
 
         # Structure element wrapper provides for setting type!
         se.type = self.ObjectType
 
-        # Calculate the sha1 from the serialized value and type!
-        # Sha1 is a property - not a method...
-        se.key = se.sha1
+        # Modified only means that something in this object or below it was touched. If the serialized value is the
+        # same as the last time it was hashed (the child keys came back the same) reuse the key. Comparing the
+        # strings is much cheaper than the double sha1!
+        commit_cache = self._commit_cache
+        if commit_cache is not None and commit_cache[0] == value:
+            se.key = commit_cache[1]
+        else:
+            # Calculate the sha1 from the serialized value and type!
+            # Sha1 is a property - not a method...
+            se.key = se.sha1
+            self.recurse_count.rehashed += 1
+            self._commit_cache = (value, se.key)
 
         # Determine whether I am a leaf
-        if len(self.ChildLinks) is 0:
-            se.isleaf = True
-        else:
-            se.isleaf = False
+        se.isleaf = len(child_links) == 0
 
         # Done setting up the Structure Element
         structure[se.key] = se
@@ -1273,7 +1320,7 @@ class Wrapper(object):
             msg = '\n' +self._gpbMessage.__str__()
         '''
 
-        if not self.__no_string:
+        if not STR_GPBS:
             return 'GPB NO STRING!'
 
         #log.critical('HOLY SHIT STILL HERE!')
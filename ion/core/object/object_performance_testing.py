@@ -0,0 +1,403 @@
+#!/usr/bin/env python
+
+"""
+@file ion/core/object/object_performance_testing.py
+@brief Benchmarks for the hot paths of the ION object model: wrapper class
+generation, building and committing a CDM dataset, checkout, pack/unpack of
+the structure, the memory held by loaded wrappers and workbench push/pull.
+
+Runs offline - repositories live in memory and push/pull are delivered between
+two loopback processes through the same codec used on the wire. Results are
+written as JSON.
+
+    python -m ion.core.object.object_performance_testing -v 10 -l 10000 -o results.json
+
+Run at two revisions with the same options to compare them.
+"""
+
+import gc
+import sys
+import time
+import resource
+from optparse import OptionParser
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from twisted.internet import defer, reactor
+
+import ion.util.ionlog
+log = ion.util.ionlog.getLogger(__name__)
+
+from ion.core.object import object_utils
+from ion.core.object import gpb_wrapper
+from ion.core.object import workbench
+from ion.core.object import codec
+from ion.core.messaging import message_client
+
+DATASET_TYPE = object_utils.create_type_identifier(object_id=10001, version=1)
+GROUP_TYPE = object_utils.create_type_identifier(object_id=10020, version=1)
+DIMENSION_TYPE = object_utils.create_type_identifier(object_id=10018, version=1)
+VARIABLE_TYPE = object_utils.create_type_identifier(object_id=10024, version=1)
+BOUNDED_ARRAY_TYPE = object_utils.create_type_identifier(object_id=10021, version=1)
+ARRAY_STRUCTURE_TYPE = object_utils.create_type_identifier(object_id=10025, version=1)
+ATTRIBUTE_TYPE = object_utils.create_type_identifier(object_id=10017, version=1)
+STRINGARRAY_TYPE = object_utils.create_type_identifier(object_id=10015, version=1)
+FLOAT32ARRAY_TYPE = object_utils.create_type_identifier(object_id=10013, version=1)
+
+CDM_TYPES = [DATASET_TYPE, GROUP_TYPE, DIMENSION_TYPE, VARIABLE_TYPE, BOUNDED_ARRAY_TYPE, ARRAY_STRUCTURE_TYPE,
+             ATTRIBUTE_TYPE, STRINGARRAY_TYPE, FLOAT32ARRAY_TYPE]
+
+ION_MESSAGE_TYPE = object_utils.create_type_identifier(object_id=11, version=1)
+
+
+def max_rss_kb():
+    """
+    Peak resident set size of this process so far
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def wrapper_bytes(wrapper):
+    """
+    Bytes held by a wrapper instance - the object, its __dict__ if it has one, its link sets and its derived wrappers
+    dictionary. The message it wraps is not counted.
+    """
+    size = sys.getsizeof(wrapper)
+    instance_dict = getattr(wrapper, '__dict__', None)
+    if instance_dict is not None:
+        size += sys.getsizeof(instance_dict)
+    for name in ('_parent_links', '_child_links', '_derived_wrappers'):
+        value = getattr(wrapper, name, None)
+        if value is not None:
+            size += sys.getsizeof(value)
+    return size
+
+
+class LoopbackProcess(object):
+    """
+    Stands in for a process with a workbench. Messages to another loopback process are packed and unpacked by the
+    codec and handed straight to the workbench op of the receiver - no broker is involved.
+    """
+
+    def __init__(self, name, registry):
+        self.proc_name = name
+        self.registry = registry
+        registry[name] = self
+
+        self.context = {}
+
+        self.workbench = workbench.WorkBench(self)
+        self.message_client = message_client.MessageClient(proc=self)
+
+        self.bytes_sent = 0
+
+    def is_spawned(self):
+        return True
+
+    def get_scoped_name(self, scope, name):
+        return name
+
+    def transmit(self, content, receiver):
+        """
+        Send content to the receiver the way the codec interceptor and the receiver do
+        """
+        content.Repository.index_hash.has_cache = False
+        serialized = codec.pack_structure(content)
+        content.Repository.index_hash.has_cache = True
+        self.bytes_sent += len(serialized)
+
+        unpacked = codec.unpack_structure(serialized)
+        if hasattr(unpacked, 'ObjectType') and unpacked.ObjectType == ION_MESSAGE_TYPE:
+            unpacked = message_client.MessageInstance(unpacked.Repository)
+
+        receiver.workbench.put_repository(unpacked.Repository)
+        return unpacked
+
+    @defer.inlineCallbacks
+    def rpc_send(self, recv, operation, content, headers=None, **kwargs):
+        target = self.registry[recv]
+
+        msg = {'reply-to': self.proc_name}
+        request = self.transmit(content, target)
+
+        yield getattr(target.workbench, 'op_' + operation)(request, msg, msg)
+
+        reply = target.transmit(msg['reply'], self)
+        defer.returnValue((reply, {}, msg))
+
+    def reply_ok(self, msg, content=None, headers=None):
+        msg['reply'] = content
+        return defer.succeed(None)
+
+
+def build_dataset(repo, variables, length, chunks):
+    """
+    Build a synthetic CDM dataset in the repository: one time dimension of the given length and float variables
+    along it, each split into the given number of bounded arrays.
+    """
+    dataset = repo.root_object
+
+    group = repo.create_object(GROUP_TYPE)
+    group.name = 'benchmark'
+    dataset.root_group = group
+
+    dimension = repo.create_object(DIMENSION_TYPE)
+    dimension.name = 'time'
+    dimension.length = length
+    group.dimensions.add()
+    group.dimensions[0] = dimension
+
+    chunk_size = max(length // chunks, 1)
+
+    for i in xrange(variables):
+        variable = repo.create_object(VARIABLE_TYPE)
+        variable.name = 'var%d' % i
+        variable.data_type = variable.DataType.FLOAT
+        variable.shape.add()
+        variable.shape[0] = dimension
+
+        attribute = repo.create_object(ATTRIBUTE_TYPE)
+        attribute.name = 'units'
+        attribute.data_type = attribute.DataType.STRING
+        attribute.array = repo.create_object(STRINGARRAY_TYPE)
+        attribute.array.value.append('unit%d' % i)
+        link = variable.attributes.add()
+        link.SetLink(attribute)
+
+        variable.content = repo.create_object(ARRAY_STRUCTURE_TYPE)
+        for origin in xrange(0, length, chunk_size):
+            size = min(chunk_size, length - origin)
+
+            array = repo.create_object(BOUNDED_ARRAY_TYPE)
+            bounds = array.bounds.add()
+            bounds.origin = origin
+            bounds.size = size
+            array.ndarray = repo.create_object(FLOAT32ARRAY_TYPE)
+            array.ndarray.value.extend([float(i + origin + j) for j in xrange(size)])
+
+            link = variable.content.bounded_arrays.add()
+            link.SetLink(array)
+
+        link = group.variables.add()
+        link.SetLink(variable)
+
+    return dataset
+
+
+class ObjectBenchmarks(object):
+    """
+    Times each object model operation over a number of repetitions and records the memory high water mark.
+    """
+
+    def __init__(self, variables=10, length=1000, chunks=1, repeat=5):
+        self.variables = variables
+        self.length = length
+        self.chunks = chunks
+        self.repeat = repeat
+
+        self.registry = {}
+        self.source = LoopbackProcess('source', self.registry)
+
+        self.results = []
+
+    def new_dataset(self, proc):
+        repo = proc.workbench.create_repository(DATASET_TYPE)
+        build_dataset(repo, self.variables, self.length, self.chunks)
+        return repo
+
+    @defer.inlineCallbacks
+    def measure(self, name, func, setup=None, **extra):
+        """
+        Call func repeat times, each time with the result of setup if given, and record the timing.
+        func may return a deferred.
+        """
+        times = []
+        rss_before = max_rss_kb()
+        for i in xrange(self.repeat):
+            arg = setup(i) if setup else None
+
+            gc.collect()
+            start = time.time()
+            if setup:
+                yield defer.maybeDeferred(func, arg)
+            else:
+                yield defer.maybeDeferred(func)
+            times.append(time.time() - start)
+
+        result = {'name': name,
+                  'repeat': self.repeat,
+                  'min': min(times),
+                  'mean': sum(times) / len(times),
+                  'max': max(times),
+                  'max_rss_kb': max_rss_kb(),
+                  'rss_growth_kb': max_rss_kb() - rss_before}
+        result.update(extra)
+        self.results.append(result)
+
+        log.info('%s: min %.6f mean %.6f max %.6f seconds' % (name, result['min'], result['mean'], result['max']))
+        defer.returnValue(result)
+
+    @defer.inlineCallbacks
+    def bench_wrapper_classes(self):
+        """
+        Generate the wrapper classes for the CDM types from scratch, then wrap with the cached classes
+        """
+        classes = [object_utils.get_gpb_class_from_type_id(t) for t in CDM_TYPES]
+        saved = dict(gpb_wrapper.WrapperType._type_cache)
+
+        def uncache(i):
+            for cls in classes:
+                gpb_wrapper.WrapperType._type_cache.pop(cls, None)
+
+        def wrap_all(arg=None):
+            for cls in classes:
+                gpb_wrapper.Wrapper(cls())
+
+        try:
+            yield self.measure('wrapper_class_generation', wrap_all, setup=uncache, types=len(classes))
+        finally:
+            # Put back the classes the live objects were made with
+            gpb_wrapper.WrapperType._type_cache.update(saved)
+
+        yield self.measure('wrapper_cached', wrap_all, types=len(classes))
+
+    @defer.inlineCallbacks
+    def bench_repository(self):
+        """
+        Build, commit, modify and check out a dataset
+        """
+        def new_repo(i):
+            return self.source.workbench.create_repository(DATASET_TYPE)
+
+        yield self.measure('dataset_build',
+                           lambda repo: build_dataset(repo, self.variables, self.length, self.chunks),
+                           setup=new_repo)
+
+        yield self.measure('commit_full', lambda repo: repo.commit('benchmark'),
+                           setup=lambda i: self.new_dataset(self.source))
+
+        repo = self.new_dataset(self.source)
+        repo.commit('benchmark')
+        self.repo = repo
+
+        def modify(i):
+            variable = repo.root_object.root_group.variables[i % self.variables]
+            variable.content.bounded_arrays[0].ndarray.value[0] = float(-i)
+            return repo
+
+        yield self.measure('commit_incremental', lambda repo: repo.commit('benchmark update'), setup=modify)
+
+        yield self.measure('checkout', lambda: repo.checkout('master'), objects=len(repo.index_hash))
+
+    @defer.inlineCallbacks
+    def bench_codec(self):
+        """
+        Pack and unpack the committed dataset
+        """
+        content = self.repo.root_object
+        serialized = codec.pack_structure(content)
+
+        yield self.measure('pack_structure', lambda: codec.pack_structure(content), bytes=len(serialized))
+        yield self.measure('unpack_structure', lambda: codec.unpack_structure(serialized), bytes=len(serialized))
+
+    @defer.inlineCallbacks
+    def bench_wrapper_memory(self):
+        """
+        Load every element of the committed dataset into a new wrapper, as a checkout does, and record the bytes each
+        wrapper holds
+        """
+        repo = self.repo
+        elements = repo.index_hash.values()
+        loaded = []
+
+        def load_all(arg=None):
+            del loaded[:]
+            for element in elements:
+                loaded.append(repo._load_element(element))
+
+        yield self.measure('wrapper_load', load_all, wrappers=len(elements))
+
+        sizes = [wrapper_bytes(wrapper) for wrapper in loaded]
+        self.results[-1]['bytes_per_wrapper'] = sum(sizes) / len(sizes)
+        self.results[-1]['wrapper_bytes'] = sum(sizes)
+        del loaded[:]
+
+    @defer.inlineCallbacks
+    def bench_push_pull(self):
+        """
+        Push the dataset to, and pull it from, a new loopback process each time
+        """
+        repo = self.repo
+
+        def new_sink(i):
+            return LoopbackProcess('sink%d' % i, self.registry)
+
+        self.source.bytes_sent = 0
+        yield self.measure('workbench_push', lambda sink: self.source.workbench.push(sink.proc_name, repo),
+                           setup=new_sink)
+        push_bytes = self.source.bytes_sent / self.repeat
+        self.results[-1]['bytes'] = push_bytes
+
+        self.source.bytes_sent = 0
+        yield self.measure('workbench_pull', lambda sink: sink.workbench.pull('source', repo.repository_key),
+                           setup=new_sink)
+        pull_bytes = self.source.bytes_sent / self.repeat
+        self.results[-1]['bytes'] = pull_bytes
+
+        self.registry.clear()
+        self.registry['source'] = self.source
+
+    @defer.inlineCallbacks
+    def run(self):
+        yield self.bench_wrapper_classes()
+        yield self.bench_repository()
+        yield self.bench_codec()
+        yield self.bench_wrapper_memory()
+        yield self.bench_push_pull()
+
+        defer.returnValue(self.report())
+
+    def report(self):
+        return {'config': {'variables': self.variables,
+                           'length': self.length,
+                           'chunks': self.chunks,
+                           'repeat': self.repeat},
+                'results': self.results}
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option("-v", "--variables", dest="variables", default=10, help="The number of variables in the dataset")
+    parser.add_option("-l", "--length", dest="length", default=1000, help="The number of values in each variable")
+    parser.add_option("-c", "--chunks", dest="chunks", default=1, help="The number of bounded arrays per variable")
+    parser.add_option("-r", "--repeat", dest="repeat", default=5, help="The number of times to run each benchmark")
+    parser.add_option("-o", "--output", dest="output", default=None, help="File to write the JSON results to, default stdout")
+    opts, args = parser.parse_args()
+
+    benchmarks = ObjectBenchmarks(variables=int(opts.variables), length=int(opts.length), chunks=int(opts.chunks),
+                                  repeat=int(opts.repeat))
+
+    def write(report):
+        if opts.output:
+            f = open(opts.output, 'w')
+            json.dump(report, f, indent=2)
+            f.close()
+        else:
+            json.dump(report, sys.stdout, indent=2)
+
+    def failed(failure):
+        log.error('Benchmark failed: %s' % failure.getTraceback())
+
+    def start():
+        d = benchmarks.run()
+        d.addCallbacks(write, failed)
+        d.addBoth(lambda _: reactor.stop())
+
+    reactor.callWhenRunning(start)
+    reactor.run()
+
+if __name__ == "__main__":
+    main()
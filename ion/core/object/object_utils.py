@@ -326,6 +326,7 @@ CDM_DATASET_TYPE = create_type_identifier(object_id=10001, version=1)
 CDM_VARIABLE_TYPE = create_type_identifier(object_id=10024, version=1)
 CDM_DIMENSION_TYPE = create_type_identifier(object_id=10018, version=1)
 CDM_ATTRIBUTE_TYPE = create_type_identifier(object_id=10017, version=1)
+CDM_BOUNDED_ARRAY_TYPE = create_type_identifier(object_id=10021, version=1)
 ARRAY_STRUCTURE_TYPE = create_type_identifier(object_id=10025, version=1)
 CDM_ARRAY_INT32_TYPE = create_type_identifier(object_id=10009, version=1)
 CDM_ARRAY_UINT32_TYPE = create_type_identifier(object_id=10010, version=1)
@@ -293,9 +293,6 @@ class ObjectContainer(object):
         obj = gpb_wrapper.Wrapper(message)
         obj._repository = self
         obj._root = obj
-        obj._parent_links = set()
-        obj._child_links = set()
-        obj._derived_wrappers={}
         obj._read_only = False
         obj._myid = obj_id
         obj._modified = True
@@ -500,12 +497,16 @@ class ObjectContainer(object):
             obj.ParseFromString(element.value)
             obj.FindChildLinks()
 
+            # Make a note in the element of the child links as well!
+            for child in obj.ChildLinks:
+                element.ChildLinks.add(child.key)
+
 
         obj.Modified = False
 
-        # Make a note in the element of the child links as well!
-        for child in obj.ChildLinks:
-            element.ChildLinks.add(child.key)
+        # Remember the serialized value and key - if the object is modified and committed again with the same content
+        # it does not need to be hashed again.
+        obj._commit_cache = (element.value, element.key)
 
         return obj
 
@@ -589,6 +590,12 @@ class Repository(ObjectContainer):
         # Only used by the datastore to track blobs worth holding onto...
         self.keys_to_keep = set()
 
+        self.rehash_count = 0
+        """
+        The number of objects which were serialized and hashed during the last commit. Objects which were modified
+        but serialized to the same value reuse their previous key and are not counted.
+        """
+
 
         ### Structures for managing associations to a repository:
 
@@ -1366,6 +1373,7 @@ class Repository(ObjectContainer):
 
             # Reset the commit counter - used for debuging only
             gpb_wrapper.WrapperType.recurse_counter.count=0
+            gpb_wrapper.WrapperType.recurse_counter.rehashed=0
 
             self._workspace_root.RecurseCommit(structure)
 
@@ -1385,7 +1393,9 @@ class Repository(ObjectContainer):
             # update the hashed elements
             self.index_hash.update(structure)
 
-            log.debug('Commited repository - Comment: "%s"' % cref.comment)
+            self.rehash_count = gpb_wrapper.WrapperType.recurse_counter.rehashed
+
+            log.debug('Commited repository - Comment: "%s", Objects hashed: %d' % (cref.comment, self.rehash_count))
                             
         else:
             raise RepositoryError('Repository in invalid state to commit')
@@ -75,6 +75,48 @@ class CodecTest(unittest.TestCase):
         self.assertEqual(res.person[0],self.ab.person[0])
 
 
+    def test_pack_frames_eq_unpack(self):
+
+        frames = list(codec.pack_structure_frames(self.ab, max_frame_size=10))
+        # A frame with the head and one for each of the two people
+        self.assertEqual(len(frames), 3)
+
+        res = codec.unpack_structure_frames(frames)
+
+        self.assertEqual(res,self.ab)
+        self.assertEqual(res.person[0],self.ab.person[0])
+        self.assertEqual(res.person[1],self.ab.person[1])
+
+    def test_pack_frames_single(self):
+
+        frames = list(codec.pack_structure_frames(self.ab))
+        self.assertEqual(len(frames), 1)
+
+        # A single frame is a valid container
+        res = codec.unpack_structure(frames[0])
+        self.assertEqual(res,self.ab)
+
+    def test_unpacker_incremental(self):
+
+        unpacker = codec.StructureUnpacker()
+        for frame in codec.pack_structure_frames(self.ab, max_frame_size=10):
+            unpacker.add_frame(frame)
+
+        self.assertEqual(unpacker.frames, 3)
+        self.assertEqual(len(unpacker.repository.index_hash), 3)
+
+        res = unpacker.finish()
+        self.assertEqual(res,self.ab)
+
+    def test_unpacker_no_head(self):
+
+        frames = list(codec.pack_structure_frames(self.ab, max_frame_size=10))
+
+        unpacker = codec.StructureUnpacker()
+        unpacker.add_frame(frames[1])
+        self.assertRaises(codec.CodecError, unpacker.finish)
+
+
     def test_unpack_error(self):
 
         self.assertRaises(codec.CodecError,codec.unpack_structure,'junk that is not a serialized container!')
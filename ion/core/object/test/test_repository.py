@@ -570,6 +570,42 @@ class RepositoryTest(unittest.TestCase):
         self.assertEqual(ab.person[0].name, 'Michael')
 
 
+    @defer.inlineCallbacks
+    def test_commit_rehash_count(self):
+        repo, ab = self.wb.init_repository(ADDRESSLINK_TYPE)
+
+        for i, name in enumerate(['David','John','Matt']):
+            p = repo.create_object(PERSON_TYPE)
+            p.name = name
+            p.id = i
+            ab.person.add()
+            ab.person[-1] = p
+
+        ab.owner = ab.person[0]
+
+        repo.commit(comment='first commit')
+        # Three people, the addresslink and the commit
+        self.assertEqual(repo.rehash_count, 5)
+
+        ab = yield repo.checkout(branchname='master')
+
+        ab.owner.name = 'Michael'
+        repo.commit(comment='changed the owner')
+        # The owner, the addresslink and the commit
+        self.assertEqual(repo.rehash_count, 3)
+
+        # Setting the same value marks the structure modified but the content is unchanged
+        ab.person[2].name = 'Matt'
+        self.assertEqual(ab.Modified, True)
+        repo.commit(comment='no real change')
+        # Only the new commit
+        self.assertEqual(repo.rehash_count, 1)
+
+        ab = yield repo.checkout(branchname='master')
+        self.assertEqual(ab.owner.name, 'Michael')
+        self.assertEqual(ab.person[2].name, 'Matt')
+
+
     def test_size(self):
 
         repo, ab = self.wb.init_repository(ADDRESSLINK_TYPE)
@@ -20,6 +20,7 @@ from net.ooici.play import addressbook_pb2
 from ion.core.object import gpb_wrapper
 from ion.core.object import workbench
 from ion.core.object import object_utils
+from ion.util.bloom import BloomFilter
 
 # For testing the message based ops of the workbench
 from ion.core.process.process import ProcessFactory, Process
@@ -538,6 +539,38 @@ class WorkBenchProcessTest(IonTestCase):
         self.assertEqual(self.repo1.root_object, repo2.root_object)
 
 
+    @defer.inlineCallbacks
+    def test_pull_update_bloom(self):
+
+        # Summarise the blobs held by the puller in a bloom filter
+        self.patch(workbench, 'PULL_BLOOM_THRESHOLD', 0)
+
+        self.repo1.persistent = True
+
+        result = yield self.proc2.workbench.pull(self.proc1.id.full, self.repo1.repository_key)
+        self.assertEqual(result.MessageResponseCode, result.ResponseCodes.OK)
+
+        repo2 = self.proc2.workbench.get_repository(self.repo1.repository_key)
+        have_keys = self.proc2.workbench.list_repository_have_keys(repo2)
+        self.assert_(have_keys[-1].startswith(workbench.HAVE_BLOOM_PREFIX))
+        self.assertEqual(len(have_keys), len(repo2._commit_index) + 1)
+
+        self.repo1.root_object.title = 'New Addressbook'
+        self.repo1.commit('An updated addressbook')
+
+        # Every key looks like a false positive - the missing blobs are fetched explicitly
+        self.patch(BloomFilter, '__contains__', lambda bloom, key: True)
+
+        result = yield self.proc2.workbench.pull(self.proc1.id.full, self.repo1.repository_key)
+        self.assertEqual(result.MessageResponseCode, result.ResponseCodes.OK)
+        self.assertEqual(len(result.blob_elements), 0)
+
+        yield repo2.checkout('master')
+
+        self.assertEqual(self.repo1.commit_head, repo2.commit_head)
+        self.assertEqual(self.repo1.root_object, repo2.root_object)
+
+
     @defer.inlineCallbacks
     def test_pull_branch(self):
 
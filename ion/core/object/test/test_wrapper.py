@@ -125,6 +125,23 @@ class WrapperMethodsTest(unittest.TestCase):
         self.assertIn(person, ab.DerivedWrappers.values())
         self.assertIn(person.GPBMessage, ab.DerivedWrappers)
 
+    def test_slots(self):
+
+        ab = gpb_wrapper.Wrapper._create_object(ADDRESSBOOK_TYPE)
+
+        # No instance dictionary - unknown attributes can not be set
+        self.failIf(hasattr(ab, '__dict__'))
+        self.assertRaises(AttributeError, setattr, ab, 'not_a_field', 5)
+
+        # The link sets are made on first use
+        self.assertEqual(ab._child_links, None)
+        self.assertEqual(ab._has_child_links(), False)
+        self.assertEqual(ab._child_links, None)
+
+        self.assertEqual(ab.ChildLinks, set())
+        self.assertEqual(ab.ParentLinks, set())
+        self.assertEqual(ab._child_links, set())
+
     def test_set_get_del(self):
 
         ab = gpb_wrapper.Wrapper._create_object(ADDRESSBOOK_TYPE)
@@ -32,9 +32,22 @@ import weakref
 
 
 from ion.util.cache import LRUDict
+from ion.util.bloom import BloomFilter
 import ion.util.ionlog
 log = ion.util.ionlog.getLogger(__name__)
 
+from ion.core import ioninit
+CONF = ioninit.config(__name__)
+
+# Repositories with fewer blobs than this list them explicitly in a pull request
+PULL_BLOOM_THRESHOLD = CONF.getValue('pull_bloom_threshold', 1000)
+PULL_BLOOM_ERROR_RATE = CONF.getValue('pull_bloom_error_rate', 0.001)
+
+# Marks the entry of a pull request's commit keys which carries a bloom filter of the blobs the puller holds
+HAVE_BLOOM_PREFIX = 'ION-HAVE-BLOOM:'
+# Marks the entries of a pull request's commit keys which name the repositories to pull in op_pull_repositories
+PULL_REPOSITORY_PREFIX = 'ION-PULL-REPOSITORY:'
+
 
 STRUCTURE_ELEMENT_TYPE = object_utils.create_type_identifier(object_id=1, version=1)
 STRUCTURE_TYPE = object_utils.create_type_identifier(object_id=2, version=1)
@@ -74,6 +87,29 @@ DATA_CHUNK_MESSAGE_TYPE = object_utils.create_type_identifier(object_id=57, vers
 GET_OBJECT_REQUEST_MESSAGE_TYPE = object_utils.create_type_identifier(object_id=55, version=1)
 GET_OBJECT_REPLY_MESSAGE_TYPE = object_utils.create_type_identifier(object_id=56, version=1)
 
+class HaveSet(object):
+    """
+    The keys a puller says it holds: the keys listed in the pull request, and any blobs summarised by a bloom filter.
+    Membership by the bloom filter may be a false positive - commits are always listed. A pull of many repositories
+    also names them in the keys - they are kept in order in repository_keys.
+    """
+
+    def __init__(self, keys):
+        self.keys = set()
+        self.bloom = None
+        self.repository_keys = []
+        for key in keys:
+            if key.startswith(HAVE_BLOOM_PREFIX):
+                self.bloom = BloomFilter.deserialize(key[len(HAVE_BLOOM_PREFIX):])
+            elif key.startswith(PULL_REPOSITORY_PREFIX):
+                self.repository_keys.append(key[len(PULL_REPOSITORY_PREFIX):])
+            else:
+                self.keys.add(key)
+
+    def __contains__(self, key):
+        return key in self.keys or (self.bloom is not None and key in self.bloom)
+
+
 class WorkBenchError(ApplicationError):
     """
     An exception class for errors that occur in the Object WorkBench class
@@ -538,7 +574,7 @@ class WorkBench(object):
 
             if get_head_content:
                 # Add all blobs to the commit list - not just the commits...
-                commit_list = self.list_repository_blobs(repo)
+                commit_list = self.list_repository_have_keys(repo)
             else:
                 # We are only concerned with the commits...
                 commit_list = self.list_repository_commits(repo)
@@ -597,10 +633,12 @@ class WorkBench(object):
 
             repo.index_hash[element.key] = element
 
+        received_keys = []
         for se in result.blob_elements:
             # Move over any blobs
             element = gpb_wrapper.StructureElement(se.GPBMessage)
             repo.index_hash[element.key] = element
+            received_keys.append(element.key)
 
         # Move over the new head object
         head_element = gpb_wrapper.StructureElement(result.repo_head_element.GPBMessage)
@@ -611,6 +649,11 @@ class WorkBench(object):
         # Now merge the state!
         self._update_repo_to_head(repo,new_head)
 
+        # Get the blobs a false positive in the bloom filter kept out of the response
+        if get_head_content and commit_list and commit_list[-1].startswith(HAVE_BLOOM_PREFIX):
+            received_keys.extend([x.GetLink('objectroot').key for x in repo.current_heads()])
+            yield self._fetch_missing_blobs(repo, targetname, received_keys)
+
 
         # Where to get objects not yet transfered.
         repo.upstream = targetname
@@ -621,6 +664,153 @@ class WorkBench(object):
 
 
 
+    @defer.inlineCallbacks
+    def pull_repositories(self, origin, repo_names, excluded_types=None):
+        """
+        Pull the current state and the head content of many repositories with one request. The origin must provide
+        op_pull_repositories - the datastore does. Blobs shared by the repositories are only sent once, to the first
+        repository which needs them - the others find them in the workbench cache.
+        @param repo_names a list of repository keys
+        @retval a dictionary of repository key => error message for each repository which could not be pulled
+        """
+
+        log.info('pull_repositories - start')
+
+        if excluded_types is not None and not hasattr(excluded_types, '__iter__'):
+            raise WorkBenchError('Invalid excluded_types argument passed to pull_repositories')
+
+        targetname = self._process.get_scoped_name('system', origin)
+
+        # repository key => (name asked for, repository)
+        requested = {}
+        ordered = []
+        cloning = set()
+        for repo_name in repo_names:
+            if not isinstance(repo_name, (str, unicode)):
+                raise TypeError('Invalid argument (repo_names) type to workbench pull_repositories. Should be a list of strings, received: "%s"' % type(repo_name))
+
+            repo = self.get_repository(repo_name)
+            if repo is None:
+                repo = repository.Repository(repository_key=repo_name, cached=True)
+                self.put_repository(repo)
+                cloning.add(repo.repository_key)
+
+            if repo.repository_key in requested:
+                continue
+
+            if excluded_types is not None:
+                repo.excluded_types = excluded_types
+
+            requested[repo.repository_key] = (repo_name, repo)
+            ordered.append(repo)
+
+        if len(ordered) == 0:
+            defer.returnValue({})
+
+        existing = [repo for repo in ordered if repo.repository_key not in cloning]
+        have_keys = self.list_repositories_have_keys(existing)
+        used_bloom = len(have_keys) > 0 and have_keys[-1].startswith(HAVE_BLOOM_PREFIX)
+
+        pullmsg = yield self._process.message_client.create_instance(PULL_MESSAGE_TYPE)
+        pullmsg.repository_key = ordered[0].repository_key
+        pullmsg.get_head_content = True
+        pullmsg.commit_keys.extend([PULL_REPOSITORY_PREFIX + repo.repository_key for repo in ordered])
+        pullmsg.commit_keys.extend(have_keys)
+
+        excluded = set()
+        for repo in ordered:
+            for extype in repo.excluded_types:
+                if (extype.object_id, extype.version) in excluded:
+                    continue
+                excluded.add((extype.object_id, extype.version))
+
+                exobj = pullmsg.excluded_types.add()
+                exobj.object_id = extype.object_id
+                exobj.version = extype.version
+
+        failed = {}
+        try:
+            result, headers, msg = yield self._process.rpc_send(targetname,'pull_repositories', pullmsg)
+        except ReceivedApplicationError, re:
+
+            ex_msg = re.msg_content
+            log.info('ReceivedApplicationError:Response code - %s, Response Message - "%s"' % (ex_msg.MessageResponseCode, ex_msg.MessageResponseBody))
+
+            for key in cloning:
+                self.clear_repository(requested[key][1])
+
+            if ex_msg.MessageResponseCode == ex_msg.ResponseCodes.NOT_FOUND:
+                for repo_name, repo in requested.itervalues():
+                    failed[repo_name] = 'Pull Operation failed: Repository Key Not Found!'
+                defer.returnValue(failed)
+
+            raise WorkBenchError('Pull Operation failed: Response code - %s, Response Message - "%s"' % (ex_msg.MessageResponseCode, ex_msg.MessageResponseBody))
+
+        if not hasattr(result, 'MessageType') or result.MessageType != PULL_RESPONSE_MESSAGE_TYPE:
+            raise WorkBenchError('Invalid response to pull request. Bad Message Type!')
+
+        # Hold the new commits and blobs while the heads are loaded - the repositories find them in the workbench cache
+        received = {}
+        for se in result.commit_elements:
+            element = gpb_wrapper.StructureElement(se.GPBMessage)
+            received[element.key] = element
+            self._workbench_cache[element.key] = element
+
+        # Each head is followed by the blobs which were sent for its repository
+        mutable_cls = object_utils.get_gpb_class_from_type_id(MUTABLE_TYPE)
+        heads = []
+        for se in result.blob_elements:
+            element = gpb_wrapper.StructureElement(se.GPBMessage)
+            received[element.key] = element
+            self._workbench_cache[element.key] = element
+
+            if element.type == MUTABLE_TYPE:
+                mutable = mutable_cls()
+                mutable.ParseFromString(element.value)
+                heads.append((str(mutable.repositorykey), element, []))
+            elif heads:
+                heads[-1][2].append(element.key)
+            else:
+                raise WorkBenchError('Invalid response to pull request. Blobs before the first repository head!')
+
+        pulled = set()
+        for repository_key, head_element, blob_keys in heads:
+
+            if repository_key not in requested:
+                raise WorkBenchError('Invalid response to pull request. Received unrequested repository "%s"' % repository_key)
+            repo_name, repo = requested[repository_key]
+
+            for key in blob_keys:
+                repo.index_hash[key] = received[key]
+
+            # Move over the new head object
+            new_head = repo._load_element(head_element)
+            new_head.Modified = True
+            new_head.MyId = repo.new_id()
+
+            # Now merge the state!
+            self._update_repo_to_head(repo,new_head)
+
+            # Get the blobs a false positive in the bloom filter kept out of the response
+            if used_bloom and repository_key not in cloning:
+                check_keys = blob_keys + [x.GetLink('objectroot').key for x in repo.current_heads()]
+                yield self._fetch_missing_blobs(repo, targetname, check_keys)
+
+            # Where to get objects not yet transfered.
+            repo.upstream = targetname
+            pulled.add(repository_key)
+
+        for repository_key, (repo_name, repo) in requested.iteritems():
+            if repository_key not in pulled:
+                failed[repo_name] = 'Pull Operation failed: Repository "%s" was not found or could not be resolved' % repository_key
+                if repository_key in cloning:
+                    self.clear_repository(repo)
+
+        log.info('pull_repositories - complete: %d of %d repositories' % (len(pulled), len(requested)))
+
+        defer.returnValue(failed)
+
+
     @defer.inlineCallbacks
     def op_pull(self,request, headers, msg):
         """
@@ -651,9 +841,9 @@ class WorkBench(object):
 
         my_commits = self.list_repository_commits(repo)
 
-        puller_has = request.commit_keys
+        puller_has = HaveSet(request.commit_keys)
 
-        puller_needs = set(my_commits).difference(puller_has)
+        puller_needs = set(my_commits).difference(puller_has.keys)
 
         response = yield self._process.message_client.create_instance(PULL_RESPONSE_MESSAGE_TYPE)
 
@@ -1034,6 +1224,87 @@ class WorkBench(object):
 
         return repo.index_hash.keys()
 
+    def list_repository_have_keys(self, repo):
+        """
+        This method creates the list of keys a puller sends to say what it already has. Small repositories list all
+        their blobs. Larger ones list their commits and add one entry with a bloom filter of the other blobs.
+        """
+        return self.list_repositories_have_keys([repo])
+
+    def list_repositories_have_keys(self, repos):
+        """
+        The list of keys a puller sends to say what it already has of several repositories. One bloom filter covers
+        the blobs of all of them.
+        """
+        commit_keys = []
+        num_blobs = 0
+        for repo in repos:
+            repo_commits = self.list_repository_commits(repo)
+            commit_keys.extend(repo_commits)
+            num_blobs += len(repo.index_hash) - len(repo_commits)
+
+        if num_blobs < PULL_BLOOM_THRESHOLD:
+            keys = []
+            for repo in repos:
+                keys.extend(self.list_repository_blobs(repo))
+            return keys
+
+        commit_set = set(commit_keys)
+        bloom = BloomFilter(num_blobs, PULL_BLOOM_ERROR_RATE)
+        for repo in repos:
+            for key in repo.index_hash.iterkeys():
+                if key not in commit_set:
+                    bloom.add(key)
+
+        return commit_keys + [HAVE_BLOOM_PREFIX + bloom.serialize()]
+
+    @defer.inlineCallbacks
+    def _fetch_missing_blobs(self, repo, address, keys):
+        """
+        Make sure the children of the given blobs are in the repository, fetching any that are not by listing them
+        explicitly. Used after a pull where a bloom filter false positive may have left out some of the head content.
+        Blobs which were already in the repository are not searched - they are no less complete than before the pull.
+        """
+        fetched = 0
+        keys_to_check = set(keys)
+        while len(keys_to_check) > 0:
+
+            missing = set()
+            for key in keys_to_check:
+                element = repo.index_hash.get(key)
+                if element is None:
+                    missing.add(key)
+                    continue
+
+                if element.isleaf:
+                    continue
+
+                obj = repo._load_element(element)
+                for link in obj.ChildLinks:
+                    if link.type.GPBMessage not in repo.excluded_types and not repo.index_hash.has_key(link.key):
+                        missing.add(link.key)
+
+            if len(missing) == 0:
+                break
+
+            blobs_request = yield self._process.message_client.create_instance(BLOBS_REQUSET_MESSAGE_TYPE)
+            blobs_request.blob_keys.extend(missing)
+            blobs_msg = yield self.fetch_blobs(address, blobs_request)
+
+            keys_to_check = set()
+            for se in blobs_msg.blob_elements:
+                element = gpb_wrapper.StructureElement(se.GPBMessage)
+                repo.index_hash[element.key] = element
+                keys_to_check.add(element.key)
+
+            if not keys_to_check.issuperset(missing):
+                raise WorkBenchError('Pull Operation failed: blobs missing from the repository could not be fetched!')
+
+            fetched += len(missing)
+
+        if fetched > 0:
+            log.info('Fetched %d blobs left out of a pull by bloom filter false positives' % fetched)
+
 
     def _update_repo_to_head(self, repo, head, truncate_commits=True, loaded_commits=None):
         log.debug('_update_repo_to_head: Loading a repository!')
@@ -18,6 +18,8 @@ from ion.core.cc.container import Container
 from ion.core.messaging.receiver import ServiceWorkerReceiver
 import ion.util.procutils as pu
 
+CONF = ioninit.config(__name__)
+
 class IServiceProcess(Interface):
     """
     Interface for all capability container service worker processes
@@ -54,6 +56,15 @@ class ServiceProcess(Process):
         self.svc_name = self.spawn_args.get('servicename', default_svcname)
         assert self.svc_name, "Service must have a declare with a valid name"
 
+        # The number of messages the broker delivers to the service before
+        # they are acknowledged, and the number handled at once. The default
+        # is one message at a time.
+        prefetch_count = self.spawn_args.get('prefetch_count', CONF.getValue('prefetch_count', None))
+        max_concurrent = self.spawn_args.get('max_concurrent', CONF.getValue('max_concurrent', None))
+        consumer_config = {}
+        if prefetch_count is not None:
+            consumer_config['prefetch_count'] = int(prefetch_count)
+
         # Create a receiver (inbound queue consumer) for service name
         self.svc_receiver = ServiceWorkerReceiver(
                 label=self.svc_name+'.'+self.receiver.label,
@@ -62,7 +73,9 @@ class ServiceProcess(Process):
                 group=self.receiver.group,
                 process=self, # David added this - is it a good idea?
                 handler=self.receive,
-                error_handler=self.receive_error)
+                error_handler=self.receive_error,
+                consumer_config=consumer_config,
+                max_concurrent=max_concurrent)
         self.add_receiver(self.svc_receiver)
 
     @defer.inlineCallbacks
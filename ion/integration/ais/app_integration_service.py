@@ -23,7 +23,8 @@ from ion.services.coi.resource_registry.resource_client import ResourceClient
 from ion.core.messaging.message_client import MessageClient
 from ion.services.dm.inventory.association_service import AssociationServiceClient
 from ion.services.coi.identity_registry import IdentityRegistryClient, get_broadcast_receiver
-from ion.core.intercept.policy import load_roles_from_associations, map_ooi_id_to_role, unmap_ooi_id_from_role
+from ion.core.intercept.policy import load_roles_from_associations, map_ooi_id_to_role, unmap_ooi_id_from_role, \
+    invalidate_policy_cache
 
 from ion.core.process.process import Process
 
@@ -86,6 +87,9 @@ class AppIntegrationService(ServiceProcess, AIS_Mixin):
 
         yield worker.spawn()
 
+        # Drop cached dataset and datasource resources as soon as they change
+        yield worker.rc.invalidate_cache_on_events()
+
         yield self.register_life_cycle_object(worker)
 
         defer.returnValue(worker)
@@ -101,8 +105,16 @@ class AppIntegrationService(ServiceProcess, AIS_Mixin):
         metadataCache = MetadataCache(data_resource_worker)
         data_resource_worker.metadataCache = metadataCache
         log.debug('Instantiated AIS Metadata Cache Object')
-        yield data_resource_worker.metadataCache.loadDataSets()
-        yield data_resource_worker.metadataCache.loadDataSources()
+        if metadataCache.loadSnapshot():
+            #
+            # Serve the metadata from the snapshot now and bring it up to date
+            # in the background; update events are handled as they arrive.
+            #
+            d = metadataCache.refresh()
+            d.addErrback(lambda failure: log.error('Metadata cache refresh failed: %s' %(str(failure))))
+        else:
+            yield data_resource_worker.metadataCache.loadDataSets()
+            yield data_resource_worker.metadataCache.loadDataSources()
 
         log.info('instantiating DatasetUpdateEventSubscriber')
         data_resource_worker.dataset_subscriber = DatasetUpdateEventSubscriber(process = data_resource_worker)
@@ -149,6 +161,8 @@ class AppIntegrationService(ServiceProcess, AIS_Mixin):
                 map_ooi_id_to_role(content['user-id'], content['role'])
             elif op == 'unset_user_role':
                 unmap_ooi_id_from_role(content['user-id'], content['role'])
+            elif op == 'invalidate_owner':
+                invalidate_policy_cache(content['user-id'])
 
 
     @defer.inlineCallbacks
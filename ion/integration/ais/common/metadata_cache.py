@@ -4,16 +4,20 @@
 @file ion/integration/ais/common/metadata_cache.py
 @author David Everett
 @brief Class to cache metadata contained in data sets and data sources.  This
-is just an in-memory cache (non-persistent); it uses a dictionary of
-dictionaries (multi-dimensional dictionary).  The rows are dictionaries of
-either data set metadata for data source metadata; they are indexed by the
-resourceID.
+is an in-memory cache; it uses a dictionary of dictionaries (multi-dimensional
+dictionary).  The rows are dictionaries of either data set metadata for data
+source metadata; they are indexed by the resourceID.  Each row has its own
+lock, and the metadata (but not the resource objects) can be kept in a
+snapshot file so that it survives a restart.  The spatial and temporal extent
+of the data sets is indexed so a bounded search only looks at candidates.
 """
 
 import ion.util.ionlog
 log = ion.util.ionlog.getLogger(__name__)
 import logging
-from twisted.internet import defer
+import os
+import cPickle
+from twisted.internet import defer, reactor
 
 from decimal import Decimal
 
@@ -30,7 +34,29 @@ from ion.services.coi.datastore_bootstrap.ion_preload_config import TYPE_OF_ID,
     DATASET_RESOURCE_TYPE_ID, DATASOURCE_RESOURCE_TYPE_ID, HAS_A_ID, OWNED_BY_ID
 
 from ion.integration.ais.common.ais_utils import AIS_Mixin
+from ion.integration.ais.common.spatial_temporal_index import SpatialTemporalIndex
 
+from ion.core import ioninit
+CONF = ioninit.config(__name__)
+
+#
+# The number of resources to load at once when warming up the cache
+#
+LOAD_CONCURRENCY = CONF.getValue('load_concurrency', 8)
+
+#
+# The number of resources to get from the datastore with one pull when warming
+# up the cache
+#
+LOAD_BATCH_SIZE = CONF.getValue('load_batch_size', 50)
+
+#
+# The file to keep a snapshot of the metadata in (None to disable it) and the
+# number of seconds to wait after a change before writing it
+#
+SNAPSHOT_FILE = CONF.getValue('snapshot_file', None)
+SNAPSHOT_DELAY = CONF.getValue('snapshot_delay', 5.0)
+SNAPSHOT_VERSION = 1
 
 #
 # Common Metadata Constants
@@ -85,7 +111,7 @@ class MetadataCache(AIS_Mixin):
     Most of the other AIS workers use an instance of the AIS worker process which is a proper mixin
     """
     
-    def __init__(self, ais):
+    def __init__(self, ais, snapshot_file=None):
         log.info('MetadataCache.__init__()')
 
         self.mc = MessageClient(proc = ais)
@@ -98,12 +124,22 @@ class MetadataCache(AIS_Mixin):
 
         self.__metadata = {}
 
+        #
+        # Spatial/temporal index of the cached data sets; kept in step with
+        # __metadata wherever a data set is added or removed
+        #
+        self.__index = SpatialTemporalIndex()
 
         #
-        # A lock to ensure exclusive access to cache when updating
+        # A lock per cache entry to ensure exclusive access to that entry
+        # when updating; created when needed and dropped when released
         #
-        self.cacheLock = {}
-        self.cacheLock = defer.DeferredLock()
+        self.__entryLocks = {}
+
+        if snapshot_file is None:
+            snapshot_file = SNAPSHOT_FILE
+        self.snapshotFile = snapshot_file
+        self.__snapshotCall = None
 
     def getNumDatasets(self):
         return self.numDSets
@@ -114,15 +150,40 @@ class MetadataCache(AIS_Mixin):
     def getDatasets(self):
         dSetList = []                
         for ds in self.__metadata.itervalues():
-            if (ds[TYPE] is DSET):
+            if (ds[TYPE] == DSET):
                 dSetList.append(ds)
         return dSetList                
 
 
+    def getDatasetsInBounds(self, bounds, dSetList=None):
+        """
+        Find the data sets which may be inside the given bounds (a loaded
+        SpatialTemporalBounds) using the spatial/temporal index.  The result
+        is a superset: the caller must still test each one with
+        bounds.isInBounds.
+        Input:
+          - bounds
+          - dSetList: the data set metadata to search (all cached data sets
+            if None); the order is kept
+        """
+
+        if dSetList is None:
+            dSetList = self.getDatasets()
+
+        latRange, lonRange, timeRange = bounds.getIndexRanges()
+        candidates = self.__index.search(latRange, lonRange, timeRange)
+        if candidates is None:
+            return list(dSetList)
+
+        dSetList = [ds for ds in dSetList if ds[RESOURCE_ID] in candidates]
+        log.debug('getDatasetsInBounds: %d of %d data sets are candidates' %(len(dSetList), len(self.__index)))
+        return dSetList
+
+
     def getDataSources(self):
         dSourceList = []
         for ds in self.__metadata.itervalues():
-            if (ds[TYPE] is DSOURCE):
+            if (ds[TYPE] == DSOURCE):
                 dSourceList.append(ds)
         return dSourceList
 
@@ -130,8 +191,8 @@ class MetadataCache(AIS_Mixin):
     def loadDataSets(self):
         """
         Find all resources of type DATASET_RESOURCE_TYPE_ID and load their
-        metadata.  The private __loadDSetMetadata method will only load
-        the metadata if the data set is in the Active.
+        metadata, LOAD_BATCH_SIZE per pull.  The private __loadDSetMetadata
+        method will only load the metadata if the data set is in the Active.
         """
 
         log.debug('loadDataSets()')
@@ -145,16 +206,13 @@ class MetadataCache(AIS_Mixin):
         numDSets =  len(dSetResults.idrefs)          
         log.debug('Found ' + str(numDSets) + ' datasets.')
 
-        try:
-            yield self.__lockCache()
-            
-            i = 0
-            while (i < numDSets):
-                yield self.__putDSetMetadata(dSetResults.idrefs[i].key)
-                i = i + 1
+        dSetIDs = [idref.key for idref in dSetResults.idrefs]
+        yield self.__loadBatched(dSetIDs, self.putDSetMetadata)
 
-        finally:
-            self.__unlockCache()
+        #
+        # Anything left from a snapshot was not reloaded - it is gone or not active
+        #
+        self.__dropUnloaded(DSET)
             
         defer.returnValue(True)
 
@@ -163,8 +221,8 @@ class MetadataCache(AIS_Mixin):
     def loadDataSources(self):
         """
         Find all resources of type DATASOURCE_RESOURCE_TYPE_ID and load their
-        metadata.  The private __loadDSetMetadata method will only load
-        the metadata if the data source is in the Active.
+        metadata, LOAD_BATCH_SIZE per pull.  The private __loadDSetMetadata
+        method will only load the metadata if the data source is in the Active.
         """
 
         log.debug('loadDataSources()')
@@ -178,26 +236,34 @@ class MetadataCache(AIS_Mixin):
         numDSources =  len(dSourceResults.idrefs)          
         log.debug('Found ' + str(numDSources) + ' datasources.')
 
-        try:
-            yield self.__lockCache()
-            
-            i = 0
-            while (i < numDSources):
-                yield self.__putDSourceMetadata(dSourceResults.idrefs[i].key)
-                i = i + 1
+        dSourceIDs = [idref.key for idref in dSourceResults.idrefs]
+        yield self.__loadBatched(dSourceIDs, self.putDSourceMetadata)
 
-        finally:
-            self.__unlockCache()
+        self.__dropUnloaded(DSOURCE)
             
         defer.returnValue(True)
 
 
+    @defer.inlineCallbacks
+    def refresh(self):
+        """
+        Reload the metadata for all data sets and data sources.  Used after
+        loadSnapshot to bring the cache up to date while it is in use.
+        """
+        
+        log.info('Refreshing the metadata cache')
+        yield self.loadDataSets()
+        yield self.loadDataSources()
+        log.info('Metadata cache refreshed: %d datasets, %d datasources' %(self.numDSets, self.numDSources))
+
+
     @defer.inlineCallbacks
     def getDSet(self, dSetID):
         """
         Get the dictionary entry containing the metadata from the data set
         represented by the given ResourceID (dSetID); return the dataset
-        object instead of the metadata.
+        object instead of the metadata.  If the entry came from a snapshot
+        the dataset object is loaded now.
         """
         
         if dSetID is None:
@@ -207,17 +273,19 @@ class MetadataCache(AIS_Mixin):
             log.debug('getDSet for dSetID %s' %(dSetID))
 
             try:
-                yield self.__lockCache()
+                yield self.__lockEntry(dSetID)
                         
                 metadata = self.__metadata[dSetID]
                 log.debug('Metadata keys for ' + dSetID + ': ' + str(metadata.keys()))
-                returnValue = metadata[DSET]
+                if DSET not in metadata:
+                    yield self.__loadResource(metadata, DSET, dSetID)
+                returnValue = metadata.get(DSET)
             except KeyError:
                 log.info('Metadata not found for datasetID: %s'  %(dSetID))
                 returnValue = None
     
             finally:
-                self.__unlockCache()
+                self.__unlockEntry(dSetID)
         
         defer.returnValue(returnValue)
 
@@ -236,7 +304,7 @@ class MetadataCache(AIS_Mixin):
             log.debug('getDSetMetadata for dSetID %s' %(dSetID))
 
             try:
-                yield self.__lockCache()
+                yield self.__lockEntry(dSetID)
                         
                 metadata = self.__metadata[dSetID]
                 log.debug('Metadata keys for ' + dSetID + ': ' + str(metadata.keys()))
@@ -246,17 +314,17 @@ class MetadataCache(AIS_Mixin):
                 returnValue = None
                 
             finally:            
-                self.__unlockCache()
+                self.__unlockEntry(dSetID)
         
         defer.returnValue(returnValue)
 
 
     @defer.inlineCallbacks
-    def putDSetMetadata(self, dSetID):
+    def putDSetMetadata(self, dSetID, dSet=None):
         """
         Get the instance of the data set represented by the given resource
-        ID (dSetID) and call the private __loadDSetMetadata method with the
-        data set as an argument. 
+        ID (dSetID), unless it is given, and call the private
+        __loadDSetMetadata method with the data set as an argument. 
         """
         
         if dSetID is None:
@@ -265,12 +333,14 @@ class MetadataCache(AIS_Mixin):
             log.debug('putDSetMetadata for dSetID %s' %(dSetID))
 
             try:
-                yield self.__lockCache()
+                yield self.__lockEntry(dSetID)
         
-                yield self.__putDSetMetadata(dSetID)
+                yield self.__putDSetMetadata(dSetID, dSet)
     
             finally:
-                self.__unlockCache()
+                self.__unlockEntry(dSetID)
+
+            self.__scheduleSnapshot()
                     
     
     @defer.inlineCallbacks
@@ -287,14 +357,16 @@ class MetadataCache(AIS_Mixin):
             log.debug('deleteDSetMetadata: deleting %s' %(dSetID))
 
             try:
-                yield self.__lockCache()
+                yield self.__lockEntry(dSetID)
     
                 #
                 # Set the persistent flag to False
                 #
                 dSetMetadata = self.__metadata.pop(dSetID)
-                dSet = dSetMetadata[DSET]
-                dSet.Repository.persistent = False
+                self.__index.remove(dSetID)
+                dSet = dSetMetadata.get(DSET)
+                if dSet is not None:
+                    dSet.Repository.persistent = False
     
 
             except KeyError:
@@ -306,7 +378,9 @@ class MetadataCache(AIS_Mixin):
     
             finally:
                 
-                self.__unlockCache()
+                self.__unlockEntry(dSetID)
+
+            self.__scheduleSnapshot()
         
         defer.returnValue(returnValue)
 
@@ -316,7 +390,8 @@ class MetadataCache(AIS_Mixin):
         """
         Get the dictionary entry containing the metadata from the data source
         represented by the given ResourceID (dSourceID); return the datasource
-        object instead of the metadata
+        object instead of the metadata.  If the entry came from a snapshot
+        the datasource object is loaded now.
         """
 
         if dSourceID is None:
@@ -326,17 +401,19 @@ class MetadataCache(AIS_Mixin):
             log.debug('getDSource for %s' %(dSourceID))
     
             try:                    
-                yield self.__lockCache()
+                yield self.__lockEntry(dSourceID)
     
                 metadata = self.__metadata[dSourceID]
                 log.debug('Metadata keys for ' + dSourceID + ': ' + str(metadata.keys()))
-                returnValue = metadata[DSOURCE]
+                if DSOURCE not in metadata:
+                    yield self.__loadResource(metadata, DSOURCE, dSourceID)
+                returnValue = metadata.get(DSOURCE)
             except KeyError:
                 log.info('Metadata not found for datasourceID: ' + dSourceID)
                 returnValue = None
     
             finally:
-                self.__unlockCache()
+                self.__unlockEntry(dSourceID)
             
         defer.returnValue(returnValue)            
         
@@ -355,7 +432,7 @@ class MetadataCache(AIS_Mixin):
             log.debug('getDSourceMetadata for %s' %(dSourceID))
             
             try:
-                yield self.__lockCache()
+                yield self.__lockEntry(dSourceID)
         
                 log.debug('getDSourceMetadata')
                         
@@ -367,16 +444,16 @@ class MetadataCache(AIS_Mixin):
                 returnValue = None
     
             finally:
-                self.__unlockCache()
+                self.__unlockEntry(dSourceID)
                 
         defer.returnValue(returnValue)
     
     
     @defer.inlineCallbacks
-    def putDSourceMetadata(self, dSourceID):
+    def putDSourceMetadata(self, dSourceID, dSource=None):
         """
         Put the instance of the data source represented by the given resource
-        ID (dSourceID). 
+        ID (dSourceID), getting it unless it is given. 
         """
 
         if dSourceID is None:
@@ -385,12 +462,14 @@ class MetadataCache(AIS_Mixin):
             log.debug('putDSourceMetadata for dSourceID %s' %(dSourceID))
 
             try:
-                yield self.__lockCache()
+                yield self.__lockEntry(dSourceID)
     
-                yield self.__putDSourceMetadata(dSourceID)
+                yield self.__putDSourceMetadata(dSourceID, dSource)
     
             finally:
-                self.__unlockCache()
+                self.__unlockEntry(dSourceID)
+
+            self.__scheduleSnapshot()
 
 
     @defer.inlineCallbacks
@@ -407,14 +486,15 @@ class MetadataCache(AIS_Mixin):
             log.debug('deleteDSourceMetadata for %s' %(dSourceID))
 
             try:
-                yield self.__lockCache()
+                yield self.__lockEntry(dSourceID)
             
                 #
                 # Set the persistent flag to False
                 #
                 dSourceMetadata = self.__metadata.pop(dSourceID)
-                dSource = dSourceMetadata[DSOURCE]
-                dSource.Repository.persistent = False
+                dSource = dSourceMetadata.get(DSOURCE)
+                if dSource is not None:
+                    dSource.Repository.persistent = False
     
 
             except KeyError:
@@ -425,45 +505,225 @@ class MetadataCache(AIS_Mixin):
                 returnValue = True
     
             finally:
-                self.__unlockCache()
+                self.__unlockEntry(dSourceID)
+
+            self.__scheduleSnapshot()
         
         defer.returnValue(returnValue)
 
 
+    def loadSnapshot(self):
+        """
+        Fill the cache from the snapshot file written by saveSnapshot.  The
+        snapshot holds the metadata but not the resource objects; those are
+        loaded when first asked for.  Returns True if a snapshot was loaded.
+        """
+
+        if not self.snapshotFile or not os.path.exists(self.snapshotFile):
+            return False
+
+        try:
+            f = open(self.snapshotFile, 'rb')
+            try:
+                snapshot = cPickle.load(f)
+            finally:
+                f.close()
+        except Exception, ex:
+            log.warn('Could not read metadata cache snapshot %s: %s' %(self.snapshotFile, str(ex)))
+            return False
+
+        if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+            log.warn('Ignoring metadata cache snapshot %s: unknown format' %(self.snapshotFile))
+            return False
+
+        for resID, metadata in snapshot['metadata'].iteritems():
+            if resID in self.__metadata:
+                continue
+
+            self.__metadata[resID] = metadata
+            if metadata[TYPE] == DSET:
+                self.__index.put(resID, metadata)
+                self.numDSets += 1
+            elif metadata[TYPE] == DSOURCE:
+                self.numDSources += 1
+
+        log.info('Loaded metadata cache snapshot %s: %d datasets, %d datasources' %(self.snapshotFile, self.numDSets, self.numDSources))
+        return True
+
+
+    def saveSnapshot(self):
+        """
+        Write the cached metadata, without the resource objects, to the
+        snapshot file.  Returns True if it was written.
+        """
+
+        if self.__snapshotCall is not None and self.__snapshotCall.active():
+            self.__snapshotCall.cancel()
+        self.__snapshotCall = None
+
+        if not self.snapshotFile:
+            return False
+
+        metadata = {}
+        for resID, entry in self.__metadata.iteritems():
+            entry = entry.copy()
+            entry.pop(DSET, None)
+            entry.pop(DSOURCE, None)
+            metadata[resID] = entry
+
+        #
+        # Write a new file and move it into place so a crash can not leave a
+        # partial snapshot
+        #
+        tmpFile = self.snapshotFile + '.tmp'
+        try:
+            f = open(tmpFile, 'wb')
+            try:
+                cPickle.dump({'version':SNAPSHOT_VERSION, 'metadata':metadata}, f, cPickle.HIGHEST_PROTOCOL)
+            finally:
+                f.close()
+            os.rename(tmpFile, self.snapshotFile)
+        except Exception, ex:
+            log.error('Could not write metadata cache snapshot %s: %s' %(self.snapshotFile, str(ex)))
+            return False
+
+        log.debug('Wrote metadata cache snapshot %s' %(self.snapshotFile))
+        return True
+
+
+    def __scheduleSnapshot(self):
+        """
+        Write the snapshot SNAPSHOT_DELAY seconds from now, unless a write is
+        already scheduled - a burst of updates is written once.
+        """
+
+        if not self.snapshotFile:
+            return
+
+        if self.__snapshotCall is None or not self.__snapshotCall.active():
+            self.__snapshotCall = reactor.callLater(SNAPSHOT_DELAY, self.saveSnapshot)
+
+
+    @defer.inlineCallbacks
+    def __loadConcurrently(self, resIDs, putMethod):
+        """
+        Call putMethod for each of the resIDs with at most LOAD_CONCURRENCY
+        outstanding at once.
+        """
+
+        semaphore = defer.DeferredSemaphore(LOAD_CONCURRENCY)
+        results = yield defer.DeferredList([semaphore.run(putMethod, resID) for resID in resIDs], consumeErrors=True)
+
+        for success, result in results:
+            if not success:
+                result.raiseException()
+
+
+    @defer.inlineCallbacks
+    def __loadBatched(self, resIDs, putMethod):
+        """
+        Get the resources LOAD_BATCH_SIZE at a time with one pull each, and
+        call putMethod with each resource that was got, LOAD_CONCURRENCY at a
+        time.
+        """
+
+        for start in range(0, len(resIDs), LOAD_BATCH_SIZE):
+            batchIDs = resIDs[start:start + LOAD_BATCH_SIZE]
+
+            try:
+                (resources, errors) = yield self.rc.get_instances(batchIDs)
+            except ResourceClientError, ex:
+                log.error('get_instances failed for %d resources: %s' %(len(batchIDs), str(ex)))
+                continue
+
+            for resID, error in errors.items():
+                log.error('get_instance failed for resource ID %s: %s' %(resID, str(error)))
+
+            gotIDs = [resID for resID in batchIDs if resID in resources]
+            yield self.__loadConcurrently(gotIDs, lambda resID: putMethod(resID, resources[resID]))
+
+
+    def __dropUnloaded(self, resType):
+        """
+        Remove the entries of the given type which have no resource object -
+        they came from a snapshot and were not reloaded.
+        """
+
+        for resID, metadata in self.__metadata.items():
+            if metadata[TYPE] == resType and resType not in metadata and resID not in self.__entryLocks:
+                log.info('Dropping %s %s from the metadata cache: not reloaded' %(resType, resID))
+                del self.__metadata[resID]
+                if resType == DSET:
+                    self.__index.remove(resID)
+                    self.numDSets -= 1
+                else:
+                    self.numDSources -= 1
 
 
     @defer.inlineCallbacks
-    def __lockCache(self):
+    def __loadResource(self, metadata, resType, resID):
         """
-        Lock the cache to insure exclusive access while updating
+        Load the resource object for an entry which came from a snapshot.
+        """
+
+        try:
+            res = yield self.rc.get_instance(resID)
+        except ResourceClientError:
+            log.error('get_instance failed for resource ID %s !' %(resID))
+        else:
+            res.Repository.purge_previous_states()
+            res.Repository.persistent = True
+            metadata[resType] = res
+
+
+    @defer.inlineCallbacks
+    def __lockEntry(self, resID):
+        """
+        Lock the cache entry for resID to insure exclusive access while updating
         """
         
-        log.debug('__lockCache requesting lock')
-        yield self.cacheLock.acquire()
-        log.debug('__lockCache lock acquired')
+        lock = self.__entryLocks.get(resID)
+        if lock is None:
+            lock = defer.DeferredLock()
+            self.__entryLocks[resID] = lock
+
+        log.debug('__lockEntry requesting lock for %s' %(resID))
+        yield lock.acquire()
+        log.debug('__lockEntry lock acquired for %s' %(resID))
 
 
-    def __unlockCache(self):
+    def __unlockEntry(self, resID):
         """
-        Unlock the cache to insure exclusive access while updating
+        Unlock the cache entry for resID
         """
         
-        log.debug('__unlockCache')
-        self.cacheLock.release()
+        log.debug('__unlockEntry %s' %(resID))
+        lock = self.__entryLocks.get(resID)
+        if lock is None:
+            return
+
+        lock.release()
+
+        #
+        # Drop the lock once nobody holds it or is waiting for it
+        #
+        if not lock.locked and self.__entryLocks.get(resID) is lock:
+            del self.__entryLocks[resID]
 
 
     @defer.inlineCallbacks
-    def __putDSetMetadata(self, dSetID):
+    def __putDSetMetadata(self, dSetID, dSet=None):
         """
         Get the instance of the data set represented by the given resource
-        ID (dSetID) and call the private __loadDSetMetadata method with the
-        data set as an argument. 
+        ID (dSetID), unless it is given, and call the private
+        __loadDSetMetadata method with the data set as an argument. 
         """
         
         log.debug('__putDSetMetadata')
 
         try:
-            dSet = yield self.rc.get_instance(dSetID)
+            if dSet is None:
+                dSet = yield self.rc.get_instance(dSetID)
 
             # Since the Resource is persistent, this must be done manually!
             dSet.Repository.purge_previous_states()
@@ -474,17 +734,18 @@ class MetadataCache(AIS_Mixin):
 
     
     @defer.inlineCallbacks
-    def __putDSourceMetadata(self, dSourceID):
+    def __putDSourceMetadata(self, dSourceID, dSource=None):
         """
         Get the instance of the data source represented by the given resource
-        ID (dSourceID) and call the private __loadDSourceMetadata method with the
-        data source as an argument. 
+        ID (dSourceID), unless it is given, and call the private
+        __loadDSourceMetadata method with the data source as an argument. 
         """
         
         log.debug('__putDSourceMetadata')
 
         try:
-            dSource = yield self.rc.get_instance(dSourceID)
+            if dSource is None:
+                dSource = yield self.rc.get_instance(dSourceID)
 
             # Since the Resource is persistent, this must be done manually!
             dSource.Repository.purge_previous_states()
@@ -509,7 +770,6 @@ class MetadataCache(AIS_Mixin):
         #
         if (dSet.ResourceLifeCycleState == dSet.ACTIVE):
             dSetMetadata = {}
-            self.numDSets += 1
             #
             # Store the entire dataset now; should be doing only that anyway.
             # Set persisence to true.  NOTE: remember to set this to false
@@ -559,7 +819,10 @@ class MetadataCache(AIS_Mixin):
             #
             # Store this dSetMetadata in the dictionary, indexed by the resourceID
             #
+            if dSet.ResourceIdentity not in self.__metadata:
+                self.numDSets += 1
             self.__metadata[dSet.ResourceIdentity] = dSetMetadata
+            self.__index.put(dSet.ResourceIdentity, dSetMetadata)
     
             if log.getEffectiveLevel() <= logging.DEBUG:
                 self.__printMetadata('Dataset Metadata', dSet)
@@ -581,7 +844,6 @@ class MetadataCache(AIS_Mixin):
         #
         if (dSource.ResourceLifeCycleState == dSource.ACTIVE):
             dSourceMetadata = {}
-            self.numDSources += 1
             #
             # Store the entire datasource now; should be doing only that anyway
             # Set persisence to true.  NOTE: remember to set this to false
@@ -610,6 +872,8 @@ class MetadataCache(AIS_Mixin):
             #
             # Store this dSourceMetadata in the dictionary, indexed by the resourceID
             #
+            if dSource.ResourceIdentity not in self.__metadata:
+                self.numDSources += 1
             self.__metadata[dSource.ResourceIdentity] = dSourceMetadata
     
             if log.getEffectiveLevel() <= logging.DEBUG:
@@ -49,6 +49,13 @@ class SpatialTemporalBounds(object):
     bIsInVerticalBounds  = True
     bIsInTimeBounds      = True
 
+    def __init__(self):
+        #
+        # Each instance needs its own bounds; a class attribute would be shared
+        # by every search
+        #
+        self.bounds = {}
+
 
     def loadBounds(self, bounds):
         """
@@ -155,6 +162,40 @@ class SpatialTemporalBounds(object):
             self.filterByTime = False
 
 
+    def getIndexRanges(self):
+        """
+        Return the latitude, longitude and time ranges to search the
+        SpatialTemporalIndex with: each is a (lo, hi) tuple (either end may be
+        None) or None if the bounds do not filter on it.  The ranges are at
+        least as wide as the tests in isInBounds, so every data set that is
+        in bounds is among the candidates found with them.
+        """
+        latRange = None
+        if self.filterByLatitude:
+            latRange = [None, None]
+            if self.bIsMaxLatitudeSet:
+                latRange[0] = self.bounds[MIN_LATITUDE]
+            if self.bIsMinLatitudeSet:
+                latRange[1] = self.bounds[MAX_LATITUDE]
+            latRange = tuple(latRange)
+
+        lonRange = None
+        if self.filterByLongitude:
+            lonRange = [None, None]
+            if self.bIsMinLongitudeSet:
+                lonRange[0] = self.bounds[MIN_LONGITUDE]
+            if self.bIsMaxLongitudeSet:
+                lonRange[1] = self.bounds[MAX_LONGITUDE]
+            lonRange = tuple(lonRange)
+
+        timeRange = None
+        if self.filterByTime:
+            timeRange = (min(self.bounds['minTime'], self.bounds['maxTime']),
+                         max(self.bounds['minTime'], self.bounds['maxTime']))
+
+        return latRange, lonRange, timeRange
+
+
     def isInBounds(self, dSetMetadata):
         """
         Determine if dataset resource is in bounds.
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+
+"""
+@file ion/integration/ais/common/spatial_temporal_index.py
+@author David Everett
+@brief In-memory index of the spatial and temporal extent of data sets, used
+to find the data sets which may be inside a set of spatial/temporal bounds
+without testing every one of them.  The index only narrows the search: the
+candidates it returns must still be tested with SpatialTemporalBounds.
+"""
+
+import ion.util.ionlog
+log = ion.util.ionlog.getLogger(__name__)
+from ion.util.procutils import isnan
+
+import time, datetime
+from bisect import bisect_left, bisect_right
+
+#
+# Metadata keys (the same as the metadata cache)
+#
+TIME_START   = 'ion_time_coverage_start'
+TIME_END     = 'ion_time_coverage_end'
+LAT_MIN      = 'ion_geospatial_lat_min'
+LAT_MAX      = 'ion_geospatial_lat_max'
+LON_MIN      = 'ion_geospatial_lon_min'
+LON_MAX      = 'ion_geospatial_lon_max'
+
+#
+# The maximum number of children of a node in the R-tree
+#
+NODE_SIZE = 16
+
+
+def _overlaps(lo, hi, qlo, qhi):
+    """
+    Does the closed interval lo, hi overlap the query range?  Either end of
+    the query range may be None: unbounded.
+    """
+    if qlo is not None and hi < qlo:
+        return False
+    if qhi is not None and lo > qhi:
+        return False
+    return True
+
+
+class BoxTree(object):
+    """
+    A static R-tree of latitude/longitude bounding boxes, bulk loaded with
+    the sort-tile-recursive algorithm.  Each node is a tuple of its bounding
+    box and its children; the children of a leaf are the (box, item) entries.
+    """
+
+    def __init__(self, entries, node_size=NODE_SIZE):
+        """
+        @param entries - a list of (box, item) tuples where box is a tuple
+        of (lat min, lat max, lon min, lon max)
+        """
+        self.size = len(entries)
+        self.root = None
+
+        level = self._pack(list(entries), node_size)
+        while len(level) > 1:
+            level = self._pack(level, node_size)
+
+        if level:
+            self.root = level[0]
+
+    def __len__(self):
+        return self.size
+
+    def _pack(self, entries, node_size):
+        """
+        Group one level of entries (or nodes) into parent nodes: sort them
+        into vertical slices by latitude, then each slice by longitude.
+        """
+        if not entries:
+            return []
+
+        num_nodes = (len(entries) + node_size - 1) // node_size
+        num_slices = int(num_nodes ** 0.5)
+        if num_slices * num_slices < num_nodes:
+            num_slices += 1
+        slice_size = num_slices * node_size
+
+        entries.sort(key=lambda entry: entry[0][0] + entry[0][1])
+
+        nodes = []
+        for i in xrange(0, len(entries), slice_size):
+            tile = entries[i:i + slice_size]
+            tile.sort(key=lambda entry: entry[0][2] + entry[0][3])
+            for j in xrange(0, len(tile), node_size):
+                children = tile[j:j + node_size]
+                box = (min([child[0][0] for child in children]),
+                       max([child[0][1] for child in children]),
+                       min([child[0][2] for child in children]),
+                       max([child[0][3] for child in children]))
+                nodes.append((box, children))
+
+        return nodes
+
+    def search(self, latRange, lonRange):
+        """
+        Find the items whose boxes overlap the query.
+        @param latRange - a (lo, hi) tuple or None for any latitude
+        @param lonRange - a (lo, hi) tuple or None for any longitude
+        @retval a list of the items
+        """
+        result = []
+        if self.root is None:
+            return result
+
+        latLo, latHi = latRange or (None, None)
+        lonLo, lonHi = lonRange or (None, None)
+
+        # Leaves are one level below the lowest nodes; track the depth so the
+        # entries are told apart from nodes without inspecting them
+        depth = self._depth()
+        stack = [(self.root, 0)]
+        while stack:
+            (box, children), level = stack.pop()
+            for child in children:
+                childBox = child[0]
+                if _overlaps(childBox[0], childBox[1], latLo, latHi) and \
+                   _overlaps(childBox[2], childBox[3], lonLo, lonHi):
+                    if level == depth:
+                        result.append(child[1])
+                    else:
+                        stack.append((child, level + 1))
+
+        return result
+
+    def _depth(self):
+        depth = 0
+        node = self.root
+        while True:
+            child = node[1][0]
+            if not isinstance(child[1], list):
+                return depth
+            node = child
+            depth += 1
+
+
+class IntervalIndex(object):
+    """
+    A static index of closed time intervals: sorted by start time with a
+    running maximum of the end times, so both ends of the candidate range are
+    found by bisection.
+    """
+
+    def __init__(self, entries):
+        """
+        @param entries - a list of ((start, end), item) tuples
+        """
+        self._entries = sorted(entries)
+        self._starts = []
+        self._max_ends = []
+
+        max_end = None
+        for (start, end), item in self._entries:
+            max_end = end if max_end is None else max(max_end, end)
+            self._starts.append(start)
+            self._max_ends.append(max_end)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def search(self, lo, hi):
+        """
+        Find the items whose intervals overlap lo, hi.
+        """
+        first = bisect_left(self._max_ends, lo)
+        last = bisect_right(self._starts, hi)
+
+        result = []
+        for (start, end), item in self._entries[first:last]:
+            if end >= lo:
+                result.append(item)
+        return result
+
+
+class SpatialTemporalIndex(object):
+    """
+    Index of the latitude/longitude bounding box (an R-tree) and the time
+    coverage (an interval index) of data set metadata.  The trees are static
+    and rebuilt on the first search after a change, so a burst of updates to
+    the metadata cache costs one rebuild.
+
+    Data sets whose extent is missing or not a number can not be placed in
+    the trees; they are always returned as candidates and left to the bounds
+    test to decide.
+    """
+
+    def __init__(self):
+        self.__boxes = {}
+        self.__intervals = {}
+        self.__unboxed = set()
+        self.__untimed = set()
+
+        self.__boxTree = None
+        self.__intervalIndex = None
+
+    def __len__(self):
+        return len(self.__boxes) + len(self.__unboxed)
+
+    def __contains__(self, resID):
+        return resID in self.__boxes or resID in self.__unboxed
+
+    def put(self, resID, metadata):
+        """
+        Add or replace the extent of the data set resID from its metadata
+        """
+        self.remove(resID)
+
+        box = self.__getBox(metadata)
+        if box is None:
+            self.__unboxed.add(resID)
+        else:
+            self.__boxes[resID] = box
+            self.__boxTree = None
+
+        interval = self.__getInterval(metadata)
+        if interval is None:
+            self.__untimed.add(resID)
+        else:
+            self.__intervals[resID] = interval
+            self.__intervalIndex = None
+
+    def remove(self, resID):
+        """
+        Remove the data set resID if it is in the index
+        """
+        if self.__boxes.pop(resID, None) is not None:
+            self.__boxTree = None
+        self.__unboxed.discard(resID)
+
+        if self.__intervals.pop(resID, None) is not None:
+            self.__intervalIndex = None
+        self.__untimed.discard(resID)
+
+    def clear(self):
+        self.__init__()
+
+    def search(self, latRange=None, lonRange=None, timeRange=None):
+        """
+        Find the data sets which may be inside the given ranges.  Each range is
+        a (lo, hi) tuple - either end may be None - or None to not filter on
+        it; times are seconds since the epoch.
+        @retval a set of resource IDs, or None if no range was given (every
+        data set is a candidate)
+        """
+        candidates = None
+
+        if latRange is not None or lonRange is not None:
+            if self.__boxTree is None:
+                log.debug('Rebuilding the spatial index of %d data sets' %(len(self.__boxes)))
+                self.__boxTree = BoxTree([(box, resID) for resID, box in self.__boxes.iteritems()])
+            candidates = set(self.__boxTree.search(latRange, lonRange))
+            candidates.update(self.__unboxed)
+
+        if timeRange is not None:
+            if self.__intervalIndex is None:
+                log.debug('Rebuilding the time index of %d data sets' %(len(self.__intervals)))
+                self.__intervalIndex = IntervalIndex([(interval, resID) for resID, interval in self.__intervals.iteritems()])
+
+            lo, hi = timeRange
+            if lo is None:
+                lo = float('-inf')
+            if hi is None:
+                hi = float('inf')
+            timeCandidates = set(self.__intervalIndex.search(lo, hi))
+            timeCandidates.update(self.__untimed)
+
+            if candidates is None:
+                candidates = timeCandidates
+            else:
+                candidates.intersection_update(timeCandidates)
+
+        return candidates
+
+    def __getBox(self, metadata):
+        try:
+            box = (metadata[LAT_MIN], metadata[LAT_MAX], metadata[LON_MIN], metadata[LON_MAX])
+        except KeyError:
+            return None
+
+        for value in box:
+            if value is None or isnan(value):
+                return None
+
+        return box
+
+    def __getInterval(self, metadata):
+        try:
+            tmpTime = datetime.datetime.strptime(metadata[TIME_START], '%Y-%m-%dT%H:%M:%SZ')
+            start = time.mktime(tmpTime.timetuple())
+
+            tmpTime = datetime.datetime.strptime(metadata[TIME_END], '%Y-%m-%dT%H:%M:%SZ')
+            end = time.mktime(tmpTime.timetuple())
+        except (KeyError, TypeError, ValueError):
+            return None
+
+        if end < start:
+            return None
+
+        return (start, end)
@@ -11,6 +11,7 @@ import ion.util.ionlog
 log = ion.util.ionlog.getLogger(__name__)
 import logging
 from twisted.internet import defer
+import ion.util.procutils as pu
 
 from decimal import Decimal
 
@@ -64,6 +65,13 @@ if DNLD_FILE_TYPE is None:
     DNLD_FILE_TYPE = '.ncml.html'
     log.error('DNLD_FILE_TYPE not set in ion.config or ionlocal.config!  Using %s' %(DNLD_FILE_TYPE))
 
+#
+# The number of data sets to add to a response before letting the reactor run,
+# and the most data sets to return in one response (None for no limit)
+#
+PAGE_SIZE = CONF.getValue('page_size', 100)
+MAX_RESULTS = CONF.getValue('max_results', None)
+
 class DatasetUpdateEventSubscriber(DatasetChangeEventSubscriber):
     def __init__(self, *args, **kwargs):
         self.ais = kwargs.get('process')
@@ -392,7 +400,9 @@ class FindDataResources(object):
         """
         Given the list of datasetIDs, determine in the data represented by
         the dataset is within the given spatial and temporal bounds, and
-        if so, add it to the response GPB.
+        if so, add it to the response GPB.  Only the candidates found in the
+        metadata cache's spatial/temporal index are tested, PAGE_SIZE at a
+        time.
         """
 
         log.debug('__getDataResources entry')        
@@ -403,6 +413,14 @@ class FindDataResources(object):
         bounds = SpatialTemporalBounds()
         bounds.loadBounds(msg.message_parameters_reference)
         #userID = msg.message_parameters_reference.user_ooi_id       
+
+        #
+        # Narrow the list down to the data sets the index says may be in bounds
+        #
+        numDSets = len(dSetList)
+        dSetList = self.metadataCache.getDatasetsInBounds(bounds, dSetList)
+        log.debug('__getDataResources: %d of %d datasets are candidates' %(len(dSetList), numDSets))
+
         #
         # Now iterate through the list if dataset resource IDs and for each ID:
         #   - get the dataset instance
@@ -416,6 +434,16 @@ class FindDataResources(object):
         i = 0
         j = 0
         while i < len(dSetList):
+            if MAX_RESULTS is not None and j >= MAX_RESULTS:
+                log.info('__getDataResources: returning the first %d datasets' %(j))
+                break
+
+            #
+            # Let other messages be handled between pages of a large search
+            #
+            if i > 0 and i % PAGE_SIZE == 0:
+                yield pu.asleep(0)
+
             dSetResID = dSetList[i]['ResourceIdentity']
             log.debug('Working on dataset: ' + dSetResID)
 
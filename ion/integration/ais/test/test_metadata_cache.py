@@ -46,6 +46,10 @@ int32Array_type = object_utils.create_type_identifier(object_id=10009, version=1
 
 from ion.integration.ais.common.metadata_cache import  MetadataCache
 
+import os
+import shutil
+import tempfile
+
 #
 # ResourceID for testing create download URL response
 #
@@ -225,6 +229,50 @@ class MetadataCacheTest(IonTestCase, AIS_Mixin):
         self.assertEqual(numDatasources, self.cache.numDSources)
 
 
+    @defer.inlineCallbacks
+    def test_snapshot(self):
+        log.debug('Testing the metadata cache snapshot.')
+
+        snapshotDir = tempfile.mkdtemp()
+        snapshotFile = os.path.join(snapshotDir, 'metadata_cache.snapshot')
+        try:
+            self.cache.snapshotFile = snapshotFile
+            self.assertEqual(self.cache.saveSnapshot(), True)
+
+            #
+            # A new cache starts with the metadata from the snapshot
+            #
+            cache = MetadataCache(self.subproc, snapshot_file=snapshotFile)
+            self.assertEqual(cache.loadSnapshot(), True)
+            self.assertEqual(cache.getNumDatasets(), self.cache.getNumDatasets())
+            self.assertEqual(cache.getNumDatasources(), self.cache.getNumDatasources())
+
+            for ds in self.cache.getDatasets():
+                dSetResID = ds['ResourceIdentity']
+                dSetMetadata = yield cache.getDSetMetadata(dSetResID)
+                self.assertEqual(dSetMetadata['title'], ds['title'])
+                self.assertEqual(dSetMetadata['OwnerID'], ds['OwnerID'])
+
+                #
+                # The resource object is loaded when it is first asked for
+                #
+                dSet = yield cache.getDSet(dSetResID)
+                self.assertEqual(dSet.ResourceIdentity, dSetResID)
+
+            #
+            # Refreshing reloads everything without counting it twice
+            #
+            yield cache.refresh()
+            self.assertEqual(cache.getNumDatasets(), self.cache.getNumDatasets())
+            self.assertEqual(cache.getNumDatasources(), self.cache.getNumDatasources())
+
+            # Writing now also cancels the delayed write scheduled by the refresh
+            self.assertEqual(cache.saveSnapshot(), True)
+        finally:
+            self.cache.snapshotFile = None
+            shutil.rmtree(snapshotDir)
+
+
     @defer.inlineCallbacks
     def test_updateMetadataCache(self):
         log.debug('Testing updateMetadataCache.')
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+"""
+@file ion/integration/ais/test/test_spatial_temporal_index.py
+@test ion.integration.ais.common.spatial_temporal_index
+@author David Everett
+"""
+
+import ion.util.ionlog
+log = ion.util.ionlog.getLogger(__name__)
+
+from decimal import Decimal
+from twisted.trial import unittest
+
+from ion.integration.ais.common.spatial_temporal_index import SpatialTemporalIndex, BoxTree, \
+    LAT_MIN, LAT_MAX, LON_MIN, LON_MAX, TIME_START, TIME_END
+
+
+def make_metadata(latMin, latMax, lonMin, lonMax, start='2010-01-01T00:00:00Z', end='2010-12-31T00:00:00Z'):
+    return {LAT_MIN : Decimal(str(latMin)),
+            LAT_MAX : Decimal(str(latMax)),
+            LON_MIN : Decimal(str(lonMin)),
+            LON_MAX : Decimal(str(lonMax)),
+            TIME_START : start,
+            TIME_END : end}
+
+
+class SpatialTemporalIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SpatialTemporalIndex()
+
+        # A grid of one degree data sets covering 0-40 N, 0-40 E
+        self.metadata = {}
+        for lat in xrange(40):
+            for lon in xrange(40):
+                resID = '%d_%d' % (lat, lon)
+                self.metadata[resID] = make_metadata(lat, lat + 1, lon, lon + 1)
+                self.index.put(resID, self.metadata[resID])
+
+    def test_no_bounds(self):
+        self.assertEqual(self.index.search(), None)
+        self.assertEqual(len(self.index), 1600)
+
+    def test_area(self):
+        result = self.index.search((Decimal('10.5'), Decimal('11.5')), (Decimal('20.5'), Decimal('21.5')))
+        self.assertEqual(result, set(['10_20', '10_21', '11_20', '11_21']))
+
+        # Open ended ranges
+        result = self.index.search((Decimal('38.5'), None), None)
+        self.assertEqual(len(result), 80)
+
+        result = self.index.search((Decimal('50'), Decimal('60')), None)
+        self.assertEqual(result, set())
+
+    def test_box_tree(self):
+        entries = [(((lat, lat + 1, lon, lon + 1)), (lat, lon)) for lat in xrange(40) for lon in xrange(40)]
+        tree = BoxTree(entries, node_size=4)
+
+        for latRange, lonRange in [((0, 3), (7, 9)), ((-5, 0), None), ((39.5, 45), (39.5, 45)), (None, (12, 12))]:
+            expected = set()
+            for box, item in entries:
+                if latRange is not None and (box[1] < latRange[0] or box[0] > latRange[1]):
+                    continue
+                if lonRange is not None and (box[3] < lonRange[0] or box[2] > lonRange[1]):
+                    continue
+                expected.add(item)
+
+            self.assertEqual(set(tree.search(latRange, lonRange)), expected)
+
+    def test_time(self):
+        self.index.put('early', make_metadata(0, 1, 0, 1, '2005-01-01T00:00:00Z', '2005-06-01T00:00:00Z'))
+
+        result = self.index.search(timeRange=(0, 1.2e9))
+        self.assertEqual(result, set(['early']))
+
+        result = self.index.search((Decimal('0.2'), Decimal('0.8')), (Decimal('0.2'), Decimal('0.8')), (0, 1.2e9))
+        self.assertEqual(result, set(['early']))
+
+        result = self.index.search(timeRange=(1.2e9, None))
+        self.assertEqual(len(result), 1600)
+
+    def test_update_and_remove(self):
+        region = ((Decimal('10.2'), Decimal('10.8')), (Decimal('10.2'), Decimal('10.8')))
+        self.assertEqual(self.index.search(*region), set(['10_10']))
+
+        # Move a data set into the region and take the old one out
+        self.index.put('0_0', make_metadata(10, 11, 10, 11))
+        self.index.remove('10_10')
+        self.assertEqual(self.index.search(*region), set(['0_0']))
+        self.assertEqual(len(self.index), 1599)
+
+    def test_unindexed_metadata(self):
+        # Missing or NaN extents can not be indexed - they are always candidates
+        self.index.put('nan', make_metadata('NaN', 1, 0, 1))
+        self.index.put('no_time', {LAT_MIN : Decimal('80'), LAT_MAX : Decimal('81'),
+                                   LON_MIN : Decimal('80'), LON_MAX : Decimal('81')})
+
+        result = self.index.search((Decimal('60'), Decimal('70')), None)
+        self.assertEqual(result, set(['nan']))
+
+        result = self.index.search(timeRange=(0, 1.2e9))
+        self.assertEqual(result, set(['no_time']))
+
+        result = self.index.search((Decimal('60'), Decimal('70')), None, (0, 1.2e9))
+        self.assertEqual(result, set())
@@ -16,6 +16,7 @@ from ion.util.cache import LRUDict
 import ion.util.ionlog
 log = ion.util.ionlog.getLogger(__name__)
 from twisted.internet import defer
+from twisted.python import failure
 
 import ion.util.procutils as pu
 from ion.core.process.process import ProcessFactory
@@ -29,7 +30,8 @@ import math
 
 from ion.core.object import object_utils
 from ion.core.object import gpb_wrapper, repository
-from ion.core.object.workbench import WorkBench, WorkBenchError, PUSH_MESSAGE_TYPE, PULL_MESSAGE_TYPE, PULL_RESPONSE_MESSAGE_TYPE, BLOBS_REQUSET_MESSAGE_TYPE, BLOBS_MESSAGE_TYPE, GET_OBJECT_REQUEST_MESSAGE_TYPE, GET_OBJECT_REPLY_MESSAGE_TYPE, GPBTYPE_TYPE, DATA_REQUEST_MESSAGE_TYPE, DATA_REPLY_MESSAGE_TYPE, DATA_CHUNK_MESSAGE_TYPE, GET_LCS_REQUEST_MESSAGE_TYPE, GET_LCS_RESPONSE_MESSAGE_TYPE
+from ion.core.object.cdm_methods import bounded_array
+from ion.core.object.workbench import WorkBench, WorkBenchError, HaveSet, PUSH_MESSAGE_TYPE, PULL_MESSAGE_TYPE, PULL_RESPONSE_MESSAGE_TYPE, BLOBS_REQUSET_MESSAGE_TYPE, BLOBS_MESSAGE_TYPE, GET_OBJECT_REQUEST_MESSAGE_TYPE, GET_OBJECT_REPLY_MESSAGE_TYPE, GPBTYPE_TYPE, DATA_REQUEST_MESSAGE_TYPE, DATA_REPLY_MESSAGE_TYPE, DATA_CHUNK_MESSAGE_TYPE, GET_LCS_REQUEST_MESSAGE_TYPE, GET_LCS_RESPONSE_MESSAGE_TYPE
 from ion.core.data import store
 from ion.core.data import cassandra
 #from ion.core.data import cassandra_bootstrap
@@ -53,9 +55,23 @@ from ion.services.coi.datastore_bootstrap.ion_preload_config import ION_PREDICAT
 
 from ion.services.coi.datastore_bootstrap.ion_preload_config import TypeMap, ANONYMOUS_USER_ID, ROOT_USER_ID, OWNED_BY_ID, ION_AIS_RESOURCES, ION_AIS_RESOURCES_CFG, OWNER_ID, HAS_ROLE_ID
 
+from ion.core.intercept.policy import invalidate_policy_cache
 from ion.core import ioninit
 CONF = ioninit.config(__name__)
 
+# Blob fetching in _get_blobs: the most keys in one batch_get, the number of
+# batch_gets outstanding at once and the most bytes one call may fetch
+GET_BLOBS_BATCH_KEYS = CONF.getValue('get_blobs_batch_keys', 200)
+GET_BLOBS_CONCURRENCY = CONF.getValue('get_blobs_concurrency', 4)
+GET_BLOBS_BYTE_LIMIT = CONF.getValue('get_blobs_byte_limit', 2**30)
+
+# Flushing the preload to the backend: the most keys and bytes in one batch_put, the number of batch_puts outstanding
+# at once and whether to skip keys which are already stored
+FLUSH_BATCH_KEYS = CONF.getValue('flush_batch_keys', 500)
+FLUSH_BATCH_BYTES = CONF.getValue('flush_batch_bytes', 2**20)
+FLUSH_CONCURRENCY = CONF.getValue('flush_concurrency', 4)
+FLUSH_SKIP_EXISTING = CONF.getValue('flush_skip_existing', True)
+
 
 LINK_TYPE = object_utils.create_type_identifier(object_id=3, version=1)
 COMMIT_TYPE = object_utils.create_type_identifier(object_id=8, version=1)
@@ -114,10 +130,9 @@ class NDArrayWrap(object):
             del self._repo.index_hash[self._key]
 
     @defer.inlineCallbacks
-    def _get_value(self):
+    def _load(self):
         """
-        Loads/retrieves an ndarray. Lazy-loads the ndarray from the datastore. Access this via
-        the value property.
+        Lazy-loads the ndarray from the datastore.
         """
         if self._ndarray is None:
             ndblobs = yield self._getblobs(self._repo, [self._key], lambda x: True)
@@ -125,10 +140,30 @@ class NDArrayWrap(object):
 
             self._ndarray = self._repo._load_element(self._repo.index_hash[self._key])
 
-        defer.returnValue(self._ndarray.value)
+        defer.returnValue(self._ndarray)
+
+    @defer.inlineCallbacks
+    def _get_value(self):
+        """
+        Loads/retrieves an ndarray. Lazy-loads the ndarray from the datastore. Access this via
+        the value property.
+        """
+        ndarray = yield self._load()
+        defer.returnValue(ndarray.value)
 
     value = property(_get_value)
 
+    @defer.inlineCallbacks
+    def _get_view(self):
+        """
+        Loads/retrieves an ndarray as a one dimensional numpy array. The array is a view on the serialized
+        blob when possible - see GetView. Access this via the view property.
+        """
+        ndarray = yield self._load()
+        defer.returnValue(ndarray.GetView())
+
+    view = property(_get_view)
+
 class NDArrayLRUDict(LRUDict):
     """
     Custom least-recently-used dictionary cache object for holding NDarrays.
@@ -162,6 +197,21 @@ class NDArrayLRUDict(LRUDict):
         value = yield ndarray.value
         defer.returnValue(value)
 
+    @defer.inlineCallbacks
+    def get_ndarray_view(self, key, bounds, itembytes, getblobs):
+        """
+        Same as get_ndarray_value, but gives back the ndarray as a one dimensional numpy array.
+        """
+        if not self.has_key(key):
+            ndarray = NDArrayWrap(key, self._repo, bounds, itembytes, getblobs)
+            self[key] = ndarray
+            log.debug("LRUDict loading, item size %d, lru now %d items %d bytes total" % (ndarray._size, len(self.keys()), self.total_size))
+        else:
+            ndarray = self.get(key)
+
+        view = yield ndarray.view
+        defer.returnValue(view)
+
 class DataStoreWorkBenchError(WorkBenchError):
     """
     An Exception class for errors in the data store workbench
@@ -187,75 +237,125 @@ class DataStoreWorkbench(WorkBench):
         raise NotImplementedError("The Datastore Service can not Push")
 
     @defer.inlineCallbacks
-    def _get_blobs(self, repo, startkeys, filtermethod=None):
+    def _get_blobs(self, repo, startkeys, filtermethod=None, children=None):
         """
         Common blob fetching helper method.
         Used by checkout and pull.
 
+        Keys are fetched in batch_gets of at most GET_BLOBS_BATCH_KEYS, with up to GET_BLOBS_CONCURRENCY outstanding.
+        The children of each batch are requested as soon as it has been parsed, so parsing overlaps the fetches still
+        in flight instead of waiting for the whole level of the tree. Fails if more than GET_BLOBS_BYTE_LIMIT bytes
+        are fetched.
+
         @param  repo            Repository for the response.
         @param  startkeys       The keys that should start the fetching process.
         @param  filtermethod    A callable to be applied to all children of fetched items. If the callable returns true,
                                 the item is included.
+        @param  children        Optional dictionary filled with key => list of the keys of its included children.
 
         @returns                A dictionary of keys => blobs.
         """
         # Slightly different machinary here than in the workbench - Could be made more similar?
         blobs={}
-        keys_to_get=set(startkeys)
         def_filter = lambda x: True
         filtermethod = filtermethod or def_filter
 
-        objects = {}
-        new_links_to_get = set()
-        while len(keys_to_get) > 0:
-            new_links_to_get.clear()
+        # Keys found but not looked at yet, and keys waiting for a batch_get
+        to_visit = list(startkeys)
+        to_fetch = []
+        requested = set()
+
+        # Results of the batch_gets as they complete - a dict or a Failure
+        completed = []
+        state = {'in_flight':0, 'wakeup':None, 'bytes':0}
+
+        def on_fetched(result):
+            completed.append(result)
+            wakeup = state['wakeup']
+            if wakeup is not None:
+                state['wakeup'] = None
+                wakeup.callback(None)
+
+        def add_children(key, obj):
+            included = [link for link in obj.ChildLinks if filtermethod(link)]
+            if children is not None:
+                children[key] = [link.key for link in included]
+            for link in included:
+                if not blobs.has_key(link.key) and link.key not in requested:
+                    to_visit.append(link.key)
+
+        error = None
+        while True:
+
+            while to_visit:
+                key = to_visit.pop()
+                if blobs.has_key(key) or key in requested:
+                    continue
 
-            batch_req = self._blob_store.new_batch_request()
-            #@TODO - put some error checking here so that we don't overflow due to a stupid request!
-            for key in keys_to_get:
                 # Short cut if we have already got it!
                 wse = repo.index_hash.get(key)
-
                 if wse:
                     blobs[wse.key]=wse
-                    # get the object
 
+                    # get the object, find its children and let it go
                     obj = repo._load_element(wse)
+                    add_children(wse.key, obj)
+                    obj.Invalidate()
+                else:
+                    requested.add(key)
+                    to_fetch.append(key)
 
-                    objects[key] = obj
+            while error is None and to_fetch and state['in_flight'] < GET_BLOBS_CONCURRENCY:
+                batch_req = self._blob_store.new_batch_request()
+                for key in to_fetch[:GET_BLOBS_BATCH_KEYS]:
+                    batch_req.add_request(key)
+                del to_fetch[:GET_BLOBS_BATCH_KEYS]
 
-                    # only add new items to get if they meet our criteria, meaning they are not in the excluded type list
-                    new_links_to_get.update(obj.ChildLinks)
-                else:
-                    batch_req.add_request( key)
+                state['in_flight'] += 1
+                d = self._blob_store.batch_get(batch_req)
+                d.addBoth(on_fetched)
 
-            result_dict = yield self._blob_store.batch_get(batch_req)
+            if state['in_flight'] == 0:
+                break
 
-            for key, blob in result_dict.iteritems():
-                # these should never happen becuase we check for them above, but leaving them in for now...
-                assert blob is not None, 'Blob not found in blob store!'
+            if not completed:
+                state['wakeup'] = defer.Deferred()
+                yield state['wakeup']
 
-                wse = gpb_wrapper.StructureElement.parse_structure_element(blob)
-                blobs[wse.key]=wse
+            while completed:
+                result = completed.pop(0)
+                state['in_flight'] -= 1
 
-                # Add it to the repository index
-                repo.index_hash[wse.key] = wse
+                if isinstance(result, failure.Failure):
+                    error = error or result
+                    continue
 
-                # load the object so we can find its children
-                obj = repo._load_element(wse)
+                if error is not None:
+                    # Let the rest of the outstanding gets finish, but stop loading
+                    continue
 
-                new_links_to_get.update(obj.ChildLinks)
+                for key, blob in result.iteritems():
+                    # these should never happen becuase we check for them above, but leaving them in for now...
+                    assert blob is not None, 'Blob not found in blob store!'
 
-            keys_to_get.clear()
-            for link in new_links_to_get:
-                if not blobs.has_key(link.key) and filtermethod(link):
-                    keys_to_get.add(link.key)
+                    state['bytes'] += len(blob)
 
-            for obj in objects.itervalues():
-                obj.Invalidate()
+                    wse = gpb_wrapper.StructureElement.parse_structure_element(blob)
+                    blobs[wse.key]=wse
+
+                    # Add it to the repository index
+                    repo.index_hash[wse.key] = wse
+
+                    # load the object so we can find its children
+                    obj = repo._load_element(wse)
+                    add_children(wse.key, obj)
+
+                if state['bytes'] > GET_BLOBS_BYTE_LIMIT:
+                    error = failure.Failure(DataStoreWorkBenchError('Fetching blobs failed: more than %d bytes requested - increase get_blobs_byte_limit if this is expected' % GET_BLOBS_BYTE_LIMIT))
+
+        if error is not None:
+            error.raiseException()
 
-            objects.clear()
-            
         defer.returnValue(blobs)
         #return blobs
 
@@ -438,9 +538,9 @@ class DataStoreWorkbench(WorkBench):
 
         my_commits = self.list_repository_commits(repo)
 
-        puller_has = request.commit_keys
+        puller_has = HaveSet(request.commit_keys)
 
-        puller_needs = set(my_commits).difference(puller_has)
+        puller_needs = set(my_commits).difference(puller_has.keys)
 
         response = yield self._process.message_client.create_instance(PULL_RESPONSE_MESSAGE_TYPE)
 
@@ -500,6 +600,114 @@ class DataStoreWorkbench(WorkBench):
 
         log.info('op_pull: Complete!')
 
+    @defer.inlineCallbacks
+    def op_pull_repositories(self, request, headers, msg):
+        """
+        The operation which responds to a pull of many repositories at once
+
+        The request is a pull message with one PULL_REPOSITORY_PREFIX entry in its commit keys for each repository,
+        along with the keys the puller already has of any of them. The content of all the heads is fetched in one
+        pass, so blobs shared between the repositories are only fetched and sent once.
+
+        The blob elements of the response hold, for each repository found, its head element followed by the content
+        of that repository which was not sent before it. The commits of all the repositories are in the commit
+        elements. A repository which can not be resolved is left out - the puller reports it as failed.
+        """
+        log.info('op_pull_repositories!')
+
+        if not hasattr(request, 'MessageType') or request.MessageType != PULL_MESSAGE_TYPE:
+            raise DataStoreWorkBenchError('Invalid pull request. Bad Message Type!', request.ResponseCodes.BAD_REQUEST)
+
+        puller_has = HaveSet(request.commit_keys)
+        if len(puller_has.repository_keys) == 0:
+            raise DataStoreWorkBenchError('Invalid pull request. No repositories requested!', request.ResponseCodes.BAD_REQUEST)
+
+        repos = []
+        for repository_key in puller_has.repository_keys:
+            try:
+                repo = yield self._resolve_repo_state(repository_key)
+            except WorkBenchError, ex:
+                log.info('op_pull_repositories: could not resolve repository "%s" - %s' % (repository_key, str(ex)))
+                continue
+
+            if repo.status == repo.MODIFIED:
+                log.info('op_pull_repositories: bad repo state for pulling "%s" - status: %s' % (repository_key, repo.status))
+                continue
+
+            repo.cached = True
+            repos.append(repo)
+
+        if len(repos) == 0:
+            raise DataStoreWorkBenchError('None of the %d requested repositories were found in the Datastore' %
+                                          len(puller_has.repository_keys), request.ResponseCodes.NOT_FOUND)
+
+        response = yield self._process.message_client.create_instance(PULL_RESPONSE_MESSAGE_TYPE)
+
+        sent = set()
+        root_keys = []
+        for repo in repos:
+            for commit_key in set(self.list_repository_commits(repo)).difference(puller_has.keys):
+                if commit_key in sent:
+                    continue
+                sent.add(commit_key)
+
+                commit_element = repo.index_hash.get(commit_key)
+                if commit_element is None:
+                    raise DataStoreWorkBenchError('Repository commit object not found in op_pull_repositories', request.ResponseCodes.NOT_FOUND)
+                link = response.commit_elements.add()
+                obj = response.Repository._wrap_message_object(commit_element._element)
+                link.SetLink(obj)
+
+            root_keys.append([x.GetLink('objectroot').key for x in repo.current_heads()])
+
+        blobs = {}
+        children = {}
+        if request.get_head_content:
+
+            def filtermethod(x):
+                """
+                Returns true if the passed in link's type is not in the excluded_types list of the passed in message.
+                """
+                return (x.type not in request.excluded_types)
+
+            startkeys = []
+            for keys in root_keys:
+                startkeys.extend(keys)
+
+            blobs = yield self._get_blobs(response.Repository, startkeys, filtermethod, children=children)
+
+        for repo, keys in zip(repos, root_keys):
+
+            head_element = self.serialize_mutable(repo._dotgit)
+            obj = response.Repository._wrap_message_object(head_element._element)
+            if not response.IsFieldSet('repo_head_element'):
+                response.repo_head_element = obj
+            link = response.blob_elements.add()
+            link.SetLink(obj)
+
+            # Walk the content of this repository - only the blobs not sent with an earlier repository follow the head
+            visited = set()
+            to_visit = list(keys)
+            while to_visit:
+                key = to_visit.pop()
+                if key in visited or key not in blobs:
+                    continue
+                visited.add(key)
+                to_visit.extend(children.get(key, ()))
+
+                # Keep all these keys after the operation completes...
+                repo.keys_to_keep.add(key)
+
+                if key not in sent and key not in puller_has:
+                    sent.add(key)
+                    link = response.blob_elements.add()
+                    obj = response.Repository._wrap_message_object(blobs[key]._element)
+                    link.SetLink(obj)
+
+        yield self._process.reply_ok(msg, content=response)
+
+        log.info('op_pull_repositories: Complete! %d of %d repositories' % (len(repos), len(puller_has.repository_keys)))
+
 
 
     @defer.inlineCallbacks
@@ -650,6 +858,8 @@ class DataStoreWorkbench(WorkBench):
         """
 
         batch = self._commit_store.new_batch_request()
+        # ids of the users that an owned_by association pointed at before this push
+        former_owners = set()
 
         for repo_key, commit_keys in new_commits.items():
             # Get the updated repository
@@ -747,9 +957,16 @@ class DataStoreWorkbench(WorkBench):
                 if key not in head_keys:
                     batch.add_request(key, index_attributes={BRANCH_NAME:''})
 
+                    # An owned_by association that is no longer the head no longer names the owner
+                    if columns.get(PREDICATE_KEY) == OWNED_BY_ID and columns.get(OBJECT_KEY):
+                        former_owners.add(columns[OBJECT_KEY])
+
         yield self._commit_store.batch_put(batch)
         # Nothing to check in the result, let any exceptions bubble up.
 
+        if former_owners:
+            yield self._announce_ownership_change(former_owners)
+
 
 
         response = yield self._process.message_client.create_instance(MessageContentTypeID=None)
@@ -759,6 +976,22 @@ class DataStoreWorkbench(WorkBench):
         yield self._process.reply_ok(msg, response)
         log.info('op_push: Complete!')
 
+    @defer.inlineCallbacks
+    def _announce_ownership_change(self, former_owners):
+        """
+        Tell the policy interceptors that the ownership of a resource was taken away from these users - the cached
+        decisions and owned resources of each user are dropped here and, through the identity registry broadcast,
+        in the other containers.
+        """
+        # The identity registry imports the datastore - import its client here
+        from ion.services.coi.identity_registry import IdentityRegistryClient
+        irc = IdentityRegistryClient(proc=self._process)
+
+        for user_id in former_owners:
+            log.info('Ownership changed for user <%s> - invalidating the policy cache' % user_id)
+            invalidate_policy_cache(user_id)
+            yield irc.broadcast({'op': 'invalidate_owner', 'user-id': user_id})
+
     @defer.inlineCallbacks
     def op_get_lcs(self, request, headers, msg):
         '''
@@ -864,65 +1097,59 @@ class DataStoreWorkbench(WorkBench):
     @defer.inlineCallbacks
     def flush_initialization_to_backend(self):
         """
-        Flush any repositories in the backend to the the workbench backend storage
-        """
-        def_list=[]
-        for repo in self._repos.itervalues():
-
-            def_list.append((self.flush_repo_to_backend(repo), repo.repository_key))
-
-        # this is a deferred list of deferred lists
-        odl_res = yield defer.DeferredList([x[0] for x in def_list])
-
-        # odl_res should always return True for each entry - we're more concerned about them underneath having failures
-        for idx, idl_res in enumerate(odl_res):
-            repo_key = def_list[idx][1]
-            # get failures from this
-            # idl_res is: (True, [(True, bla), (True, bla)...])
-            idl_fails = filter(lambda x: not x[0], idl_res[1])
+        Flush the repositories in the workbench to the backend storage in bulk, then clear the workbench.
 
-            # we are not concerned with comprehensive errors here, just error out on the first problem we find
-            if len(idl_fails) > 0:
-                raise DataStoreWorkBenchError("flush_initialization_to_backend encountered an error on repository %s" % repo_key)
+        Blobs are written first, then the commits which are not heads and last the head commits, so a repository with
+        a head in the backend is complete. test_existence only reports repositories with a head, and keys which are
+        already stored are skipped, so an interrupted preload is resumed by running it again.
+        """
+        yield self._flush_repos_to_backend(self._repos.values())
 
-        #import pprint
-        #print 'After update to heads'
-        #pprint.pprint(self._commit_store.kvs)
         log.info("Number of repositories:  %s" % len(self._repos))
         log.info("Number of blobs: %s " % len(self._workbench_cache))
-        
+
         num_commit_keys = map(lambda repo: len(repo._commit_index.keys()), self._repos.values())
         log.info("Number of commits: %s " % sum(num_commit_keys))
 
         # Now clear the in memory workbench
         self.clear()
 
-
-
     def flush_repo_to_backend(self, repo):
         """
-        Flush any repositories in the backend to the the workbench backend storage
-
-        @TODO - this has never been a problem and is not really subject to timeouts. Therefore we are not changing it to
-        use batch requests at this time.
-
-
+        Flush a repository in the workbench to the backend storage
         """
+        return self._flush_repos_to_backend([repo])
 
-        # This is simpler than a push - all of these are guaranteed to be new objects!
-        def_list = []
-        for key, element in repo.index_hash.items():
-
-            def_list.append(self._blob_store.put(key, element.serialize()))
-
-
-        # any objects in the data structure that were transmitted have already
-        # been updated now it is time to set update the commits
-        #
+    @defer.inlineCallbacks
+    def _flush_repos_to_backend(self, repos):
+        """
+        Write the blobs and commits of the repositories to the backend with _bulk_put - blobs, then commits which are
+        not heads, then head commits.
+        """
+        blobs = []
+        commits = []
+        heads = []
+        for repo in repos:
+            # This is simpler than a push - all of these are guaranteed to be new objects!
+            for key, element in repo.index_hash.iteritems():
+                blobs.append((key, element.serialize(), None))
+
+            for key, value, attributes, is_head in self._commit_writes(repo):
+                if is_head:
+                    heads.append((key, value, attributes))
+                else:
+                    commits.append((key, value, attributes))
 
-        commit_keys = repo._commit_index.keys()
+        yield self._bulk_put(self._blob_store, blobs, 'blobs')
+        yield self._bulk_put(self._commit_store, commits, 'commits')
+        yield self._bulk_put(self._commit_store, heads, 'head commits')
 
+    def _commit_writes(self, repo):
+        """
+        Get the commit store entries for the commits of a repository.
 
+        @returns    A list of (key, serialized commit, index attributes, is head) tuples.
+        """
         branch_names = []
         for branch in repo.branches:
             branch_names.append(branch.branchkey)
@@ -931,7 +1158,8 @@ class DataStoreWorkbench(WorkBench):
         for cref in repo.current_heads():
             head_keys.append( cref.MyId )
 
-        for key in commit_keys:
+        writes = []
+        for key in repo._commit_index.keys():
 
             # Set the repository name for the commit
             attributes = {REPOSITORY_KEY : str(repo.repository_key)}
@@ -968,15 +1196,8 @@ class DataStoreWorkbench(WorkBench):
             # get the wrapped structure element to put in...
             wse = self._workbench_cache.get(key)
 
-
-            if key not in head_keys:
-
-                defd = self._commit_store.put(key = key,
-                                   value = wse.serialize(),
-                                   index_attributes = attributes)
-                def_list.append(defd)
-
-            else:
+            is_head = key in head_keys
+            if is_head:
 
                 # We know it is a head - but we need to get the branch name again
                 for branch in  repo.branches:
@@ -988,23 +1209,139 @@ class DataStoreWorkbench(WorkBench):
                         else:
                             attributes[BRANCH_NAME] = ','.join([attributes[BRANCH_NAME],branch.branchkey])
 
+            writes.append((key, wse.serialize(), attributes, is_head))
+
+        return writes
+
+    @defer.inlineCallbacks
+    def _bulk_put(self, store, writes, description='keys'):
+        """
+        Write to a store in batch_puts of at most FLUSH_BATCH_KEYS keys and FLUSH_BATCH_BYTES bytes, with up to
+        FLUSH_CONCURRENCY outstanding. Progress is logged as the batches complete. If FLUSH_SKIP_EXISTING is set, the
+        keys batch_has_key finds in the store are not written again.
+
+        @param  store           The blob or commit store.
+        @param  writes          A list of (key, value, index attributes) tuples - attributes are None for the blob store.
+        @param  description     What is being written, for the log.
+
+        @returns    The number of keys written.
+        """
+        total = len(writes)
+        if total == 0:
+            defer.returnValue(0)
+
+        completed = []
+        state = {'in_flight':0, 'wakeup':None}
+        progress = {'written':0, 'skipped':0, 'bytes':0, 'logged':0}
+
+        def on_put(result):
+            completed.append(result)
+            wakeup = state['wakeup']
+            if wakeup is not None:
+                state['wakeup'] = None
+                wakeup.callback(None)
+
+        error = None
+
+        def collect():
+            # Tally the batches which have completed - returns the first failure
+            failed = None
+            while completed:
+                result = completed.pop(0)
+                state['in_flight'] -= 1
+
+                if isinstance(result, failure.Failure):
+                    failed = failed or result
+                    continue
+
+                written, skipped, nbytes = result
+                progress['written'] += written
+                progress['skipped'] += skipped
+                progress['bytes'] += nbytes
+
+            done = progress['written'] + progress['skipped']
+            if done == total or done - progress['logged'] >= total / 10:
+                progress['logged'] = done
+                log.info('Flushing %s: %d of %d done, %d written (%d bytes), %d already stored' %
+                         (description, done, total, progress['written'], progress['bytes'], progress['skipped']))
+            return failed
+
+        batch = []
+        batch_bytes = 0
+        for index, write in enumerate(writes):
+            batch.append(write)
+            batch_bytes += len(write[1])
+
+            if len(batch) < FLUSH_BATCH_KEYS and batch_bytes < FLUSH_BATCH_BYTES and index < total - 1:
+                continue
+
+            # Back pressure - wait for a batch to complete before starting another
+            while state['in_flight'] >= FLUSH_CONCURRENCY:
+                if not completed:
+                    state['wakeup'] = defer.Deferred()
+                    yield state['wakeup']
+                error = collect() or error
+
+            if error is not None:
+                break
 
-                # Now commit it!
-                defd = self._commit_store.put(key = key,
-                                   value = wse.serialize(),
-                                   index_attributes = attributes)
-                def_list.append(defd)
+            state['in_flight'] += 1
+            d = self._put_batch(store, batch)
+            d.addBoth(on_put)
 
-        # this deferred list will be checked by the flush_initialization_to_backend method
-        return defer.DeferredList(def_list)
+            batch = []
+            batch_bytes = 0
 
+        # Let the outstanding batches finish
+        while state['in_flight'] > 0:
+            if not completed:
+                state['wakeup'] = defer.Deferred()
+                yield state['wakeup']
+            error = collect() or error
 
+        if error is not None:
+            raise DataStoreWorkBenchError('Failed to flush %s to the backend: %s' % (description, error.getErrorMessage()))
 
+        defer.returnValue(progress['written'])
+
+    @defer.inlineCallbacks
+    def _put_batch(self, store, batch):
+        """
+        Put one batch of (key, value, index attributes) tuples, leaving out the keys already stored if
+        FLUSH_SKIP_EXISTING is set.
+
+        @returns    A tuple of the number of keys written, the number skipped and the bytes written.
+        """
+        skipped = 0
+        if FLUSH_SKIP_EXISTING:
+            has_req = store.new_batch_request()
+            for key, value, attributes in batch:
+                has_req.add_request(key)
+
+            exists = yield store.batch_has_key(has_req)
+
+            remaining = [write for write in batch if not exists.get(write[0])]
+            skipped = len(batch) - len(remaining)
+            batch = remaining
+
+        if not batch:
+            defer.returnValue((0, skipped, 0))
+
+        put_req = store.new_batch_request()
+        nbytes = 0
+        for key, value, attributes in batch:
+            put_req.add_request(key, value, index_attributes=attributes)
+            nbytes += len(value)
+
+        yield store.batch_put(put_req)
+
+        defer.returnValue((len(batch), skipped, nbytes))
 
     @defer.inlineCallbacks
     def test_existence(self,repo_key):
         """
-        For use in initialization - test to see if the repository already exists in the backend
+        For use in initialization - test to see if the repository already exists in the backend. Head commits are
+        flushed last, so only a repository with a head commit is complete.
         """
 
         q = Query()
@@ -1012,7 +1349,11 @@ class DataStoreWorkbench(WorkBench):
 
         rows = yield self._commit_store.query(q)
 
-        defer.returnValue(len(rows)>0)
+        for columns in rows.itervalues():
+            if columns[BRANCH_NAME]:
+                defer.returnValue(True)
+
+        defer.returnValue(False)
 
     @defer.inlineCallbacks
     def op_extract_data(self, request, headers, message):
@@ -1032,6 +1373,53 @@ class DataStoreWorkbench(WorkBench):
 
         log.debug("Extract data request bounds: %s", ["%d+%d,%d" % (x.origin, x.size, x.stride) for x in request.request_bounds])
 
+        repo, obj = yield self._load_array_structure(request.structure_array_ref)
+
+        @defer.inlineCallbacks
+        def send_chunk(seq_number, seq_max, start_index, values, ndarray_type):
+
+            # create new message to send
+            chunkmsg = yield self._process.message_client.create_instance(DATA_CHUNK_MESSAGE_TYPE)
+            chunkmsg.seq_number = seq_number
+            chunkmsg.seq_max = seq_max
+
+            # set info in this chunk
+            chunkmsg.start_index = start_index
+            chunkmsg.done = seq_number == seq_max - 1       # last chunk message?  set the done flag
+
+            # create the ndarray in this chunk
+            chunkndarray = chunkmsg.CreateObject(ndarray_type)
+
+            # these lines blow up with a TypeError if we screwed up the bounds and didn't fill in the targetarray fully,
+            # aka it contains Nones
+            chunkndarray.value[0:len(values)] = values
+            chunkmsg.ndarray = chunkndarray
+
+            # send this message to the passed in routing key
+            yield self._send_data_chunk(request.data_routing_key, chunkmsg)
+
+        try:
+            yield self._extract_data(repo, obj, request.request_bounds, send_chunk)
+        except Exception, ex:
+            class FakeMsg(object):
+                pass
+            fakemsg = FakeMsg()
+            fakemsg.payload = { 'reply-to': request.data_routing_key,
+                                'protocol': 'rpc'}
+            yield self._process.reply_err(fakemsg, exception=ex)
+            raise ex
+            
+        self._process.reply_ok(message, response)
+        log.info("/op_extract_data")
+
+    @defer.inlineCallbacks
+    def _load_array_structure(self, structure_array_ref):
+        """
+        Load an array structure and its bounded arrays - but not their ndarrays - into an anonymous repository.
+        Used by extract_data.
+
+        @returns                A tuple of the repository and the array structure object.
+        """
         # create an anonymous repo to load things into
         repo = self.create_repository(root_type=ARRAY_STRUCTURE_TYPE)
 
@@ -1045,11 +1433,11 @@ class DataStoreWorkbench(WorkBench):
                       CDM_ARRAY_OPAQUE_TYPE]
 
         # get some blobs into the repo
-        blobs = yield self._get_blobs(repo, [request.structure_array_ref], lambda x: x not in filterlist)
+        blobs = yield self._get_blobs(repo, [structure_array_ref], lambda x: x not in filterlist)
         repo.index_hash.update(blobs)
 
         # get element pointed to by key
-        se = repo.index_hash[request.structure_array_ref]
+        se = repo.index_hash[structure_array_ref]
         assert se
         obj = repo._load_element(se)
 
@@ -1060,6 +1448,24 @@ class DataStoreWorkbench(WorkBench):
             if extype not in repo.excluded_types:
                 repo.excluded_types.append(extype)
 
+        defer.returnValue((repo, obj))
+
+    @defer.inlineCallbacks
+    def _extract_data(self, repo, obj, request_bounds, send_chunk, engine=None):
+        """
+        Extract the data in request_bounds from the bounded arrays of an array structure and pass it to send_chunk in
+        order, one chunk at a time.
+
+        @param  repo            The repository the array structure is loaded in.
+        @param  obj             The array structure object.
+        @param  request_bounds  A list of bounds (origin, size and stride), one per dimension.
+        @param  send_chunk      A callable taking (seq_number, seq_max, start_index, values, ndarray_type) which may
+                                return a deferred. Called once for each chunk.
+        @param  engine          'blocks' to copy with numpy block operations or 'strips' to copy strip by strip in
+                                python. Defaults to the extract_engine config value. String and opaque arrays always
+                                use 'strips'. 'blocks' raises DataStoreWorkBenchError if numpy is not installed.
+        """
+
         # now onto the fun.  let's traverse all the bounded arrays we find!
 
         log.debug("op_extract_data: obj has %d bounded arrays" % len(obj.bounded_arrays))
@@ -1067,20 +1473,190 @@ class DataStoreWorkbench(WorkBench):
         # get the type of bounded array we have here
         assert len(obj.bounded_arrays) > 0
 
+        # sidestep: figure out size of each item in a BA, and set chunk factor to 5mb (default, configurable)
+
+        # our default, safe assumptions say to expect the biggest
+        # we don't actually know what to put for CDM_ARRAY_STRING_TYPE as that varies and CDM_ARRAY_OPAQUE_TYPE,
+        # could be many things.
+        ITEM_SIZE = 8
+
+        ndarray_type = obj.bounded_arrays[0].GetLink('ndarray').type
+        # @TODO: cmon, the in syntax doesn't use the correct __eq__ overload or whatever? this is silly.
+        numeric = True
+        if ndarray_type.object_id in [CDM_ARRAY_INT32_TYPE.object_id, CDM_ARRAY_UINT32_TYPE.object_id, CDM_ARRAY_FLOAT32_TYPE.object_id]:
+            ITEM_SIZE = 4
+        elif ndarray_type.object_id in [CDM_ARRAY_INT64_TYPE.object_id, CDM_ARRAY_UINT64_TYPE.object_id, CDM_ARRAY_FLOAT64_TYPE.object_id]:
+            ITEM_SIZE = 8
+        else:
+            # String and opaque arrays have no numpy view (GetView)
+            numeric = False
+
+        # max size for a data chunk AND the LRU dict
+        LRU_DICT_LIMIT = int(CONF.getValue('extract_cache_size', 20 * 1024 * 1024))
+
+        # @TODO: Bug OOIION-159 is preventing us from setting a proper chunk limit of 5mb.
+        #                       The overflow point appears to be 16482 -> 16483, which in bytes, looks suspiciously
+        #                       like an arithmetic overflow somewhere.
+        #
+        # the CHUNK_FACTOR must respect the data type - limits appear to be:   8 byte type -> 8162 maximum items
+        #                                                                      4 byte type -> 16324 maximum items
+        #
+        # without the msgpack bug, we should be using this line:
+        # CHUNK_FACTOR = LRU_DICT_LIMIT / ITEM_SIZE
+
+        # chunk factor is expressed in # of items, not bytes
+        CHUNK_FACTOR = 8000
+        if ITEM_SIZE < 8:
+            CHUNK_FACTOR = 16000
+
+        log.debug("LRU Cache Limit set at %d bytes, CHUNK_FACTOR is %d elements" % (LRU_DICT_LIMIT, CHUNK_FACTOR))
+
+        # create a least-recently-used cache for ndarrays, using 5mb as the default max size
+        ndarray_cache = NDArrayLRUDict(LRU_DICT_LIMIT, repo)
+
+        if engine is None:
+            engine = CONF.getValue('extract_engine', 'blocks')
+
+        if engine == 'blocks' and numeric:
+            if bounded_array.numpy is None:
+                raise DataStoreWorkBenchError("The 'blocks' extract engine requires numpy, which is not installed. Install the numpy extra or set extract_engine to 'strips'.")
+            yield self._extract_blocks(obj.bounded_arrays, request_bounds, ndarray_cache, ITEM_SIZE, CHUNK_FACTOR, send_chunk)
+        else:
+            yield self._extract_strips(obj.bounded_arrays, request_bounds, ndarray_cache, ITEM_SIZE, CHUNK_FACTOR, send_chunk)
+
+    @defer.inlineCallbacks
+    def _extract_blocks(self, bounded_arrays, request_bounds, ndarray_cache, item_size, chunk_factor, send_chunk):
+        """
+        Extraction engine for _extract_data using numpy. The intersection of the request with every bounded array is
+        computed in one pass, then the result is assembled in bands along the slowest varying dimension - each
+        intersecting bounded array is copied into a band with one strided block copy. Each band is sent in chunks of
+        chunk_factor elements, so at most one band is held in memory.
+        """
+        numpy = bounded_array.numpy
+
+        request = [(x.origin, x.origin + x.size, x.stride or 1) for x in request_bounds]
+        target_shape = [(stop - start + step - 1) // step for start, stop, step in request]
+
+        # ===================================================================
+        # STEP 1: Intersect the request with every bounded array
+        # ===================================================================
+        blocks = []
+        for ba in bounded_arrays:
+
+            # need to be the same rank
+            if not len(ba.bounds) == len(request):
+                raise DataStoreWorkBenchError("Bounds dimensionality mismatch: this ba has %d dims, our request has %d" % (len(ba.bounds), len(request)))
+
+            intersection = bounded_array.intersect_hyperslab(request, ba.bounds)
+            if intersection is not None:
+                blocks.append((ba, intersection[0], intersection[1]))
+
+        log.debug("Number of intersecting bounded arrays: %d" % len(blocks))
+
+        if len(blocks) == 0:
+            return
+
+        # Treat a scalar as a one element array
+        if len(target_shape) == 0:
+            target_shape = [1]
+            blocks = [(ba, (slice(0, 1),), (slice(0, 1, 1),)) for ba, tidx, sidx in blocks]
+
+        # ===================================================================
+        # STEP 2: Assign the blocks to bands of the slowest varying dimension
+        # ===================================================================
+        row_size = 1
+        for size in target_shape[1:]:
+            row_size *= size
+
+        nrows = target_shape[0]
+        rows_per_band = max(1, chunk_factor // max(1, row_size))
+        nbands = (nrows + rows_per_band - 1) // rows_per_band
+
+        # The first bounded array listed wins where they overlap - add them to each band in reverse order
+        band_blocks = [[] for band in xrange(nbands)]
+        for block in reversed(blocks):
+            rows = block[1][0]
+            for band in xrange(rows.start // rows_per_band, (rows.stop - 1) // rows_per_band + 1):
+                band_blocks[band].append(block)
+
+        seq_max = 0
+        for band in xrange(nbands):
+            band_size = (min(nrows, (band + 1) * rows_per_band) - band * rows_per_band) * row_size
+            seq_max += (band_size + chunk_factor - 1) // chunk_factor
+
+        # ===================================================================
+        # STEP 3: Copy each band and send it
+        # ===================================================================
+        seq_number = 0
+        for band, bblocks in enumerate(band_blocks):
+            first_row = band * rows_per_band
+            last_row = min(nrows, first_row + rows_per_band)
+            band_shape = [last_row - first_row] + target_shape[1:]
+
+            values = None
+            filled = numpy.zeros(band_shape, dtype=bool)
+
+            for ba, tidx, sidx in bblocks:
+                rows = tidx[0]
+                lo = max(rows.start, first_row)
+                hi = min(rows.stop, last_row)
+                if lo >= hi:
+                    continue
+
+                # Restrict the block to the rows in this band
+                srows = sidx[0]
+                src_start = srows.start + (lo - rows.start) * srows.step
+                src_stop = srows.start + (hi - 1 - rows.start) * srows.step + 1
+
+                target_index = (slice(lo - first_row, hi - first_row),) + tidx[1:]
+                source_index = (slice(src_start, src_stop, srows.step),) + sidx[1:]
+
+                # get/possibly load from ndarray_cache
+                view = yield ndarray_cache.get_ndarray_view(ba.GetLink('ndarray').key, ba.bounds, item_size, self._get_blobs)
+                view = view.reshape([x.size for x in ba.bounds] or [1])
+
+                if values is None:
+                    values = numpy.empty(band_shape, dtype=view.dtype)
+
+                values[target_index] = view[source_index]
+                filled[target_index] = True
+
+            # ensure we filled this band
+            if values is None or not filled.all():
+                log.error("extract_data: Unfilled values in band %d, rows %d to %d" % (band, first_row, last_row))
+                raise DataStoreWorkBenchError("Data extraction did not properly fill in all members of response ndarray!")
+
+            flat = values.ravel()
+            for offset in xrange(0, flat.size, chunk_factor):
+
+                # SEND THIS CHUNK
+                yield send_chunk(seq_number, seq_max, first_row * row_size + offset, flat[offset:offset + chunk_factor].tolist(), bblocks[0][0].GetLink('ndarray').type)
+                seq_number += 1
+
+    @defer.inlineCallbacks
+    def _extract_strips(self, bounded_arrays, request_bounds, ndarray_cache, item_size, chunk_factor, send_chunk):
+        """
+        Extraction engine for _extract_data in pure python. Matching strips along the fastest varying dimension are
+        found with _get_slices, compressed, then copied value by value into chunks.
+        """
+        # ===================================================================
+        # STEP 1: Match bounded arrays
+        # ===================================================================
+
         # a list of matching bounded arrays
         bounded_includes_list = []
-        targetshape = [x.size for x in request.request_bounds]
+        targetshape = [x.size for x in request_bounds]
 
         # ===================================================================
         # STEP 1: Match bounded arrays
         # ===================================================================
 
         # iterate bounded arrays in this object
-        for ba in obj.bounded_arrays:
+        for ba in bounded_arrays:
 
             # need to be the same rank
-            if not len(ba.bounds) == len(request.request_bounds):
-                raise DataStoreWorkBenchError("Bounds dimensionality mismatch: this ba has %d dims, our request has %d" % (len(ba.bounds), len(request.request_bounds)))
+            if not len(ba.bounds) == len(request_bounds):
+                raise DataStoreWorkBenchError("Bounds dimensionality mismatch: this ba has %d dims, our request has %d" % (len(ba.bounds), len(request_bounds)))
 
             target_range = []
             src_range = []
@@ -1091,7 +1667,7 @@ class DataStoreWorkbench(WorkBench):
             # - computing the intersection slices for each of those dimensions if they do intersect.
             # - if we make it through the for without a rejection on a dimension, the else: clause is run, which marks
             #   an array as being a required to copy array along with the ranges in both target and source.
-            for reqbounds, babounds in zip(request.request_bounds, ba.bounds):
+            for reqbounds, babounds in zip(request_bounds, ba.bounds):
 
                 #log.debug("Cur bounds: %d+%d, Req bounds: %d+%d" % (babounds.origin, babounds.size, reqbounds.origin, reqbounds.size))
 
@@ -1124,41 +1700,6 @@ class DataStoreWorkbench(WorkBench):
                 # format: (bounded array, target range of data (multidim), source bounded array range (multidim))
                 bounded_includes_list.append((ba, target_range, src_range))
 
-        # sidestep: figure out size of each item in a BA, and set chunk factor to 5mb (default, configurable)
-
-        # our default, safe assumptions say to expect the biggest
-        # we don't actually know what to put for CDM_ARRAY_STRING_TYPE as that varies and CDM_ARRAY_OPAQUE_TYPE,
-        # could be many things.
-        ITEM_SIZE = 8
-
-        if len(bounded_includes_list) > 0:
-            ndarray_type = bounded_includes_list[0][0].GetLink('ndarray').type
-            # @TODO: cmon, the in syntax doesn't use the correct __eq__ overload or whatever? this is silly.
-            if ndarray_type.object_id in [CDM_ARRAY_INT32_TYPE.object_id, CDM_ARRAY_UINT32_TYPE.object_id, CDM_ARRAY_FLOAT32_TYPE.object_id]:
-                ITEM_SIZE = 4
-            elif ndarray_type.object_id in [CDM_ARRAY_INT64_TYPE.object_id, CDM_ARRAY_UINT64_TYPE.object_id, CDM_ARRAY_FLOAT64_TYPE.object_id]:
-                ITEM_SIZE = 8
-
-        # max size for a data chunk AND the LRU dict
-        LRU_DICT_LIMIT = int(CONF.getValue('extract_cache_size', 20 * 1024 * 1024))
-
-        # @TODO: Bug OOIION-159 is preventing us from setting a proper chunk limit of 5mb.
-        #                       The overflow point appears to be 16482 -> 16483, which in bytes, looks suspiciously
-        #                       like an arithmetic overflow somewhere.
-        #
-        # the CHUNK_FACTOR must respect the data type - limits appear to be:   8 byte type -> 8162 maximum items
-        #                                                                      4 byte type -> 16324 maximum items
-        #
-        # without the msgpack bug, we should be using this line:
-        # CHUNK_FACTOR = LRU_DICT_LIMIT / ITEM_SIZE
-
-        # chunk factor is expressed in # of items, not bytes
-        CHUNK_FACTOR = 8000
-        if ITEM_SIZE < 8:
-            CHUNK_FACTOR = 16000
-
-        log.debug("LRU Cache Limit set at %d bytes, CHUNK_FACTOR is %d elements" % (LRU_DICT_LIMIT, CHUNK_FACTOR))
-
         # ===================================================================
         # STEP 2: Compress/Optimize bounded_includes_list for overlap
         # ===================================================================
@@ -1168,7 +1709,7 @@ class DataStoreWorkbench(WorkBench):
         # STEP 3: Generate a list of matching strips from each BA
         # ===================================================================
         striplist = []
-        strides = [x.stride or 1 for x in request.request_bounds]
+        strides = [x.stride or 1 for x in request_bounds]
 
         for batuple in bounded_includes_list:
             ba, targetranges, srcranges = batuple
@@ -1182,22 +1723,22 @@ class DataStoreWorkbench(WorkBench):
                 ba_shape = [x.size for x in ba.bounds]
 
                 for targetslice, srcslice, laststridelen in self._get_slices(targetshape, ba_shape, targetranges, srcranges, strides):
-                    # make sure we do not exceed the CHUNK_FACTOR in a single strip here
+                    # make sure we do not exceed the chunk_factor in a single strip here
                     targetslicelen = targetslice[1] - targetslice[0]
                     srcslicelen = srcslice[1] - srcslice[0]
-                    if targetslicelen > CHUNK_FACTOR:
-                        log.debug("target slice len (%d) exceeds CHUNK_FACTOR, splitting" % targetslicelen)
+                    if targetslicelen > chunk_factor:
+                        log.debug("target slice len (%d) exceeds chunk_factor, splitting" % targetslicelen)
 
-                        upperbound = targetslicelen / CHUNK_FACTOR      # this is int division, we want to know about whole chunks only here, we'll catch leftovers below
+                        upperbound = targetslicelen / chunk_factor      # this is int division, we want to know about whole chunks only here, we'll catch leftovers below
 
                         # figure out our chunk factor for the source as we may have striding applied
-                        src_chunk_factor = (srcslicelen * CHUNK_FACTOR) / targetslicelen
+                        src_chunk_factor = (srcslicelen * chunk_factor) / targetslicelen
 
                         log.debug("upperbound: %d, src chunk factor: %d" % (upperbound, src_chunk_factor))
 
                         for i in xrange(upperbound):
-                            offset = i * CHUNK_FACTOR
-                            thislen = min(targetslicelen - offset, CHUNK_FACTOR)
+                            offset = i * chunk_factor
+                            thislen = min(targetslicelen - offset, chunk_factor)
 
                             src_offset = i * src_chunk_factor
                             src_len = min(srcslicelen - src_offset, src_chunk_factor)
@@ -1212,7 +1753,7 @@ class DataStoreWorkbench(WorkBench):
                             striplist.append((ba, newtslice, newsslice, thislen, laststridelen))
 
                         # get any remnants
-                        left = targetslicelen % CHUNK_FACTOR
+                        left = targetslicelen % chunk_factor
                         if left > 0:
                             log.debug("Adding remainder of %d items" % left)
 
@@ -1260,7 +1801,7 @@ class DataStoreWorkbench(WorkBench):
             # - the possible accumulated strip's total length is over the max size for chunking messages
             if srcslice[0] == accumstrip[2][1] and \
                laststridelen == accumstrip[4] and \
-               accumstrip[3] + leng <= CHUNK_FACTOR:
+               accumstrip[3] + leng <= chunk_factor:
                 # update accumstrip
                 accumstrip = (accumstrip[0], (accumstrip[1][0], targetslice[1]), (accumstrip[2][0], srcslice[1]), srcslice[1] - accumstrip[2][0], accumstrip[4])
             else:
@@ -1346,7 +1887,7 @@ class DataStoreWorkbench(WorkBench):
                 continue
 
             # can we fit the new strip?
-            if curlen + cstrip[3] <= CHUNK_FACTOR:
+            if curlen + cstrip[3] <= chunk_factor:
                 curstep.append(csidx)
                 curlen += cstrip[3]
             else:
@@ -1362,83 +1903,50 @@ class DataStoreWorkbench(WorkBench):
         # STEP 7: Perform extractions
         # ===================================================================
 
-        # create a least-recently-used cache for ndarrays, using 5mb as the default max size
-        ndarray_cache = NDArrayLRUDict(LRU_DICT_LIMIT, repo)
-
-        try:
-            for exidx, exstep in enumerate(extraction_plan):
-                curstrips = []
-                for sidx in exstep:
-                    curstrips.append(compressed_striplist[sidx])
+        for exidx, exstep in enumerate(extraction_plan):
+            curstrips = []
+            for sidx in exstep:
+                curstrips.append(compressed_striplist[sidx])
 
-                # get the start index.. should be in the first item
-                targetstartidx = curstrips[0][1][0]
+            # get the start index.. should be in the first item
+            targetstartidx = curstrips[0][1][0]
 
-                # calculate number of elements we are going to output in this chunk, create temp storage for it
-                elemcount = reduce(lambda x, y: x+y, [x[3] for x in curstrips])
-                targetndarray = [None] * elemcount
+            # calculate number of elements we are going to output in this chunk, create temp storage for it
+            elemcount = reduce(lambda x, y: x+y, [x[3] for x in curstrips])
+            targetndarray = [None] * elemcount
 
-                log.debug("Extraction step %d, # strips: %d, element count: %d, start index: %d" % (exidx, len(curstrips), elemcount, targetstartidx))
-
-                # ok, now we can perform the extractions on this step
-                targetoffset = 0
-                for curstrip in curstrips:
-                    ba, targetidxs, srcidxs, leng, stride = curstrip
-
-                    # get/possibly load from ndarray_cache
-                    ndobjval = yield ndarray_cache.get_ndarray_value(ba.GetLink('ndarray').key, ba.bounds, ITEM_SIZE, self._get_blobs)
-
-                    srcslice = ndobjval[srcidxs[0]:srcidxs[1]]
-                    if stride == 1:
-                        targetslice = srcslice
-                    else:
-                        targetslice = [d for i, d in enumerate(srcslice) if i % stride == 0]
+            log.debug("Extraction step %d, # strips: %d, element count: %d, start index: %d" % (exidx, len(curstrips), elemcount, targetstartidx))
 
-                    #log.debug("SETTING TNDARRAY[%d:%d]" % (targetoffset, targetoffset+leng))
-                    targetndarray[targetoffset:targetoffset+leng] = targetslice
+            # ok, now we can perform the extractions on this step
+            targetoffset = 0
+            for curstrip in curstrips:
+                ba, targetidxs, srcidxs, leng, stride = curstrip
 
-                    # add length to target offset
-                    targetoffset += leng
+                # get/possibly load from ndarray_cache
+                ndobjval = yield ndarray_cache.get_ndarray_value(ba.GetLink('ndarray').key, ba.bounds, item_size, self._get_blobs)
 
-                # ensure we filled this chunk
-                nonelist = [i for i,d in enumerate(targetndarray) if d is None]
-                if len(nonelist) > 0:
-                    log.error("extract_data: Nones found in targetndarray prior to send: %s" % str(nonelist))
-                    raise DataStoreWorkBenchError("Data extraction did not properly fill in all members of response ndarray!")
+                srcslice = ndobjval[srcidxs[0]:srcidxs[1]]
+                if stride == 1:
+                    targetslice = srcslice
+                else:
+                    targetslice = [d for i, d in enumerate(srcslice) if i % stride == 0]
 
-                # SEND THIS CHUNK
+                #log.debug("SETTING TNDARRAY[%d:%d]" % (targetoffset, targetoffset+leng))
+                targetndarray[targetoffset:targetoffset+leng] = targetslice
 
-                # create new message to send
-                chunkmsg = yield self._process.message_client.create_instance(DATA_CHUNK_MESSAGE_TYPE)
-                chunkmsg.seq_number = exidx
-                chunkmsg.seq_max = len(extraction_plan)
+                # add length to target offset
+                targetoffset += leng
 
-                # set info in this chunk
-                chunkmsg.start_index = targetstartidx
-                chunkmsg.done = exidx == len(extraction_plan) - 1       # last chunk message?  set the done flag
+            # ensure we filled this chunk
+            nonelist = [i for i,d in enumerate(targetndarray) if d is None]
+            if len(nonelist) > 0:
+                log.error("extract_data: Nones found in targetndarray prior to send: %s" % str(nonelist))
+                raise DataStoreWorkBenchError("Data extraction did not properly fill in all members of response ndarray!")
 
-                # create the ndarray in this chunk
-                chunkndarray = chunkmsg.CreateObject(curstrips[0][0].GetLink('ndarray').type)
+            # SEND THIS CHUNK
+            yield send_chunk(exidx, len(extraction_plan), targetstartidx, targetndarray, curstrips[0][0].GetLink('ndarray').type)
 
-                # these lines blow up with a TypeError if we screwed up the bounds and didn't fill in the targetarray fully,
-                # aka it contains Nones
-                chunkndarray.value[0:elemcount] = targetndarray[:]
-                chunkmsg.ndarray = chunkndarray
 
-                # send this message to the passed in routing key
-                yield self._send_data_chunk(request.data_routing_key, chunkmsg)
-        except Exception, ex:
-            class FakeMsg(object):
-                pass
-            fakemsg = FakeMsg()
-            fakemsg.payload = { 'reply-to': request.data_routing_key,
-                                'protocol': 'rpc'}
-            yield self._process.reply_err(fakemsg, exception=ex)
-            raise ex
-            
-        self._process.reply_ok(message, response)
-        log.info("/op_extract_data")
-        
     @defer.inlineCallbacks
     def _send_data_chunk(self, data_routing_key, chunkmsg):
         """
@@ -1791,6 +2299,7 @@ class DataStoreService(ServiceProcess):
 
         self.op_fetch_blobs = self.workbench.op_fetch_blobs
         self.op_pull = self.workbench.op_pull
+        self.op_pull_repositories = self.workbench.op_pull_repositories
         self.op_push = self.workbench.op_push
         self.op_checkout = self.workbench.op_checkout
         self.op_get_lcs = self.workbench.op_get_lcs
@@ -2125,6 +2634,13 @@ class DataStoreClient(ServiceClient):
         (content, headers, msg) = yield self.rpc_send('pull', content)
         defer.returnValue(content)
 
+    @defer.inlineCallbacks
+    def pull_repositories(self, content):
+        yield self._check_init()
+
+        (content, headers, msg) = yield self.rpc_send('pull_repositories', content)
+        defer.returnValue(content)
+
     @defer.inlineCallbacks
     def checkout(self, content):
         yield self._check_init()
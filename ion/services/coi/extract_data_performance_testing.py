@@ -0,0 +1,154 @@
+"""
+@file ion/services/coi/extract_data_performance_testing.py
+@author David Stuebe
+@brief Benchmark the datastore extract_data engines against each other using the in memory store.
+
+Run it with:
+python -m ion.services.coi.extract_data_performance_testing -n 5
+"""
+from ion.core.data import store
+from ion.core.object import workbench
+from ion.core.object.object_utils import ARRAY_STRUCTURE_TYPE, CDM_BOUNDED_ARRAY_TYPE, CDM_ARRAY_FLOAT64_TYPE
+from ion.services.coi.datastore import DataStoreWorkbench
+from twisted.internet import defer
+from twisted.internet import reactor
+
+import time
+from optparse import OptionParser
+
+import ion.util.ionlog
+log = ion.util.ionlog.getLogger(__name__)
+
+
+class RequestBounds(object):
+    """
+    Stand in for the bounds in a data request message
+    """
+    def __init__(self, origin, size, stride=1):
+        self.origin = origin
+        self.size = size
+        self.stride = stride
+
+
+# name: (shape of each bounded array, number of bounded arrays along the first dimension)
+CASES = {
+    '1D': ([100000], 20),
+    '2D': ([100, 1000], 20),
+    '4D': ([5, 20, 20, 50], 20),
+    }
+
+
+class ExtractDataBenchmarks:
+
+    def __init__(self, repeat=3, engines=('strips', 'blocks')):
+
+        self.repeat = repeat
+        self.engines = engines
+
+        self.workbench = DataStoreWorkbench(None, store.Store(), store.Store())
+        self.local_workbench = workbench.WorkBench('Extract data benchmark')
+
+        self.structures = {}
+        self.results = []
+
+    def create_structure(self, name, ba_shape, num_bas):
+        """
+        Create an array structure of float64 values tiled along the first dimension and put its blobs in the store
+        """
+        repo = self.local_workbench.create_repository(ARRAY_STRUCTURE_TYPE)
+        content = repo.root_object
+
+        ba_size = reduce(lambda x, y: x*y, ba_shape)
+        for i in xrange(num_bas):
+            ba = repo.create_object(CDM_BOUNDED_ARRAY_TYPE)
+            for dim, size in enumerate(ba_shape):
+                bounds = ba.bounds.add()
+                bounds.origin = i * size if dim == 0 else 0
+                bounds.size = size
+
+            arr = repo.create_object(CDM_ARRAY_FLOAT64_TYPE)
+            arr.value.extend([float(val) for val in xrange(i * ba_size, (i + 1) * ba_size)])
+            ba.ndarray = arr
+
+            ref = content.bounded_arrays.add()
+            ref.SetLink(ba)
+
+        repo.commit()
+
+        for key, se in repo.index_hash.iteritems():
+            self.workbench._blob_store.put(key, se.serialize())
+
+        shape = [ba_shape[0] * num_bas] + ba_shape[1:]
+        self.structures[name] = (content.MyId, shape)
+
+        log.info('Created %s structure: shape %s, %d values' % (name, shape, ba_size * num_bas))
+
+    @defer.inlineCallbacks
+    def run_extract(self, name, engine, request_bounds):
+
+        key, shape = self.structures[name]
+
+        counter = {'chunks':0, 'values':0}
+        def send_chunk(seq_number, seq_max, start_index, values, ndarray_type):
+            counter['chunks'] += 1
+            counter['values'] += len(values)
+
+        times = []
+        for i in xrange(self.repeat):
+            t1 = time.time()
+            repo, obj = yield self.workbench._load_array_structure(key)
+            yield self.workbench._extract_data(repo, obj, request_bounds, send_chunk, engine=engine)
+            times.append(time.time() - t1)
+
+            self.workbench.clear_repository(repo)
+
+        best = min(times)
+        values = counter['values'] / self.repeat
+        result = {'case':name,
+                  'engine':engine,
+                  'request':['%d+%d,%d' % (x.origin, x.size, x.stride) for x in request_bounds],
+                  'values':values,
+                  'chunks':counter['chunks'] / self.repeat,
+                  'seconds':best,
+                  'values_per_second':values / best if best > 0 else 0.0}
+        self.results.append(result)
+
+        print "%(case)s %(engine)-6s request %(request)s: %(values)d values in %(chunks)d chunks, %(seconds).4f s, %(values_per_second).0f values/s" % result
+
+    @defer.inlineCallbacks
+    def runBenchMarks(self):
+
+        for name, (ba_shape, num_bas) in sorted(CASES.items()):
+            self.create_structure(name, ba_shape, num_bas)
+
+            key, shape = self.structures[name]
+            requests = [
+                # The whole variable
+                [RequestBounds(0, size) for size in shape],
+                # A strided subset of the middle half of each dimension
+                [RequestBounds(size / 4, size / 2, 2 if size > 1 else 1) for size in shape],
+                ]
+
+            for request_bounds in requests:
+                for engine in self.engines:
+                    yield self.run_extract(name, engine, request_bounds)
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option("-n", "--repeat", dest="repeat", default=3, help="The number of times to repeat each extraction - the best time is reported")
+    parser.add_option("-e", "--engine", dest="engines", action="append", default=None, help="An engine to benchmark (strips or blocks) - may be given more than once")
+    opts, args = parser.parse_args()
+
+    tester = ExtractDataBenchmarks(repeat=int(opts.repeat), engines=opts.engines or ('strips', 'blocks'))
+
+    def run():
+        d = tester.runBenchMarks()
+        d.addErrback(log.error)
+        d.addBoth(lambda x: reactor.stop())
+
+    reactor.callWhenRunning(run)
+    reactor.run()
+
+if __name__ == "__main__":
+    main()
@@ -34,7 +34,8 @@ from ion.core.intercept.policy import subject_has_admin_role, \
                                       subject_has_marine_operator_role, \
                                       map_ooi_id_to_subject_marine_operator_role, \
                                       map_ooi_id_to_role, unmap_ooi_id_from_role, \
-                                      get_current_roles, all_roles, load_roles_from_associations
+                                      get_current_roles, all_roles, load_roles_from_associations, \
+                                      invalidate_policy_cache
 
 from ion.services.coi.datastore_bootstrap.ion_preload_config \
     import IDENTITY_RESOURCE_TYPE_ID, TYPE_OF_ID, HAS_ROLE_ID, ROLE_NAMES_BY_ID, ROLE_IDS_BY_NAME
@@ -627,6 +628,8 @@ class IdentityRegistryService(ServiceProcess):
                 map_ooi_id_to_role(content['user-id'], content['role'])
             elif op == 'unset_user_role':
                 unmap_ooi_id_from_role(content['user-id'], content['role'])
+            elif op == 'invalidate_owner':
+                invalidate_policy_cache(content['user-id'])
 
     @defer.inlineCallbacks
     def _findUser(self, Subject):
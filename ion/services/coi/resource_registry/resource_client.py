@@ -36,6 +36,7 @@ from ion.core.exception import ApplicationError, ReceivedError
 from google.protobuf import message
 from google.protobuf.internal import containers
 from ion.core.object import object_utils
+from ion.util.cache import LRUDict
 
 import weakref
 
@@ -45,12 +46,93 @@ IDREF_TYPE = object_utils.create_type_identifier(object_id=4, version=1)
 
 CONF = ioninit.config(__name__)
 
+# The most resource instances cached by each process - 0 turns the cache off
+RESOURCE_CACHE_SIZE = CONF.getValue('resource_cache_size', 100)
+
 class ResourceClientError(ApplicationError):
     """
     A class for resource client exceptions
     """
 
 
+class ResourceCache(object):
+    """
+    @brief The resource instances a process has checked out, keyed by resource id and branch. An entry is only
+    returned by get_instance after a commit only pull shows that the head of the branch in the datastore has not
+    moved. Entries are dropped when a resource modified event arrives for the resource.
+    The cache is shared by all the resource clients of a process - see get_resource_cache.
+    """
+
+    def __init__(self, size=RESOURCE_CACHE_SIZE):
+        self.size = size
+        # (resource id, branch) => (resource instance, commit id at the head of the branch when it was checked out)
+        self._entries = LRUDict(size)
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self.subscribers = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """
+        @retval a tuple of the resource instance and its commit id, or None
+        """
+        return self._entries.get(key)
+
+    def put(self, key, resource, commit_id):
+        self._entries[key] = (resource, commit_id)
+
+    def discard(self, key):
+        if key in self._entries:
+            del self._entries[key]
+
+    def invalidate(self, resource_id=None):
+        """
+        Drop the entries for every branch of the resource, or all entries if resource_id is None
+        """
+        if resource_id is None:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            return
+
+        for key in [key for key in self._entries.iterkeys() if key[0] == resource_id]:
+            del self._entries[key]
+            self.invalidations += 1
+
+    def on_resource_modified(self, data):
+        """
+        Subscriber handler for resource modified events - the origin of the event is the resource id
+        """
+        resource_id = str(data['content'].origin)
+        log.debug('Resource modified event - invalidating cached resource "%s"' % resource_id)
+        self.invalidate(resource_id)
+
+    def stats(self):
+        return {'hits':self.hits,
+                'misses':self.misses,
+                'invalidations':self.invalidations,
+                'entries':len(self._entries),
+                'size':self.size}
+
+
+def get_resource_cache(proc):
+    """
+    @retval the resource cache of the process, created on first use
+    """
+    cache = getattr(proc, '_resource_cache', None)
+    if cache is None:
+        cache = ResourceCache()
+        proc._resource_cache = cache
+    return cache
+
+
 class ResourceClient(object):
     """
     @brief This is the base class for a resource client. It is a factory for resource
@@ -93,6 +175,11 @@ class ResourceClient(object):
         # Make a weak value dictionary to hold the resource instance - make sure there is only one wrapper for each repository
         self.myresources=weakref.WeakValueDictionary()
 
+        # Resource instances checked out by this process - shared with its other resource clients
+        self.resource_cache = None
+        if RESOURCE_CACHE_SIZE:
+            self.resource_cache = get_resource_cache(self.proc)
+
 
     @defer.inlineCallbacks
     def _check_init(self):
@@ -106,6 +193,81 @@ class ResourceClient(object):
         assert isinstance(self.workbench, workbench.WorkBench),\
         'Process workbench is not initialized'
 
+    @defer.inlineCallbacks
+    def invalidate_cache_on_events(self, event_ids=None):
+        """
+        @brief Subscribe the resource cache of the process to resource modified events so that cached instances are
+        dropped as soon as the resource changes. The head of the branch is still checked before a cached instance is
+        used - the events only let go of stale instances early.
+        @param event_ids the resource modified event ids to subscribe to, default dataset and datasource changes
+        """
+        cache = self.resource_cache
+        if cache is None or cache.subscribers:
+            return
+
+        # Imported here - the events module depends on the messaging stack which is not ready when this module loads
+        from ion.services.dm.distribution import events
+
+        if event_ids is None:
+            event_ids = (events.DATASET_CHANGE_EVENT_ID,
+                         events.DATASOURCE_CHANGE_EVENT_ID,
+                         events.DATASET_SUPPLEMENT_ADDED_EVENT_ID,
+                         events.DATASOURCE_UNAVAILABLE_EVENT_ID)
+
+        for event_id in event_ids:
+            subscriber = events.ResourceModifiedEventSubscriber(event_id=event_id, process=self.proc)
+            subscriber.ondata = cache.on_resource_modified
+            yield self.proc.register_life_cycle_object(subscriber)
+            cache.subscribers.append(subscriber)
+
+    def _branch_head(self, repo, branch):
+        """
+        @retval the commit id at the head of the branch, or None if the branch does not have a single head
+        """
+        head = repo.get_branch(branch)
+        if head is None or len(head.commitrefs) != 1:
+            return None
+        return head.commitrefs.GetLink(0).key
+
+    @defer.inlineCallbacks
+    def _get_cached_instance(self, reference, branch):
+        """
+        @brief Get the cached instance of the resource if the head of the branch in the datastore is still the
+        commit it was checked out at. Only the commits are pulled to find out.
+        @retval the ResourceInstance or None
+        """
+        cache = self.resource_cache
+        key = (reference, branch)
+
+        entry = cache.get(key)
+        if entry is None:
+            cache.misses += 1
+            defer.returnValue(None)
+
+        resource, commit_id = entry
+
+        # The workbench may have let go of the repository, or the instance has been changed and not put
+        repo = self.workbench.get_repository(reference)
+        if repo is not resource.Repository or repo.status != repo.UPTODATE:
+            cache.discard(key)
+            cache.misses += 1
+            defer.returnValue(None)
+
+        try:
+            yield self.workbench.pull(self.datastore_service, reference, get_head_content=False)
+        except workbench.WorkBenchError, ex:
+            log.error('Resource client error during pull operation: Resource ID "%s" \nException - %s' % (reference, str(ex)))
+            raise ResourceClientError(
+                'Could not pull the requested resource from the datastore. Workbench exception: \n %s' % ex)
+
+        if self._branch_head(repo, branch) != commit_id:
+            cache.discard(key)
+            cache.misses += 1
+            defer.returnValue(None)
+
+        cache.hits += 1
+        defer.returnValue(resource)
+
 
     @defer.inlineCallbacks
     def create_instance(self, type_id, ResourceName, ResourceDescription=''):
@@ -164,18 +326,11 @@ class ResourceClient(object):
         defer.returnValue(resource)
 
 
-    @defer.inlineCallbacks
-    def get_instance(self, resource_id, excluded_types=None):
+    def _parse_resource_id(self, resource_id):
         """
-        @brief Get the latest version of the identified resource from the data store
-        @param resource_id can be either a string resource identity or an IDRef
-        object which specifies the resource identity as well as optional parameters
-        version and version state.
-        @retval the specified ResourceInstance
-
+        @brief Unpack the argument of get_instance
+        @retval a tuple of the resource identity, branch, commit, treeish and whether the treeish came from a string
         """
-        yield self._check_init()
-
         reference = None
         branch = 'master'
         commit = None
@@ -213,14 +368,13 @@ class ResourceClient(object):
             raise ResourceClientError('''Illegal argument type in get_instance:
                                       \n type: %s \nvalue: %s''' % (type(resource_id), str(resource_id)))
 
-            # Pull the repository
-        try:
-            result = yield self.workbench.pull(self.datastore_service, reference, get_head_content=not has_treeish, excluded_types=excluded_types)
-        except workbench.WorkBenchError, ex:
-            log.error('Resource client error during pull operation: Resource ID "%s" \nException - %s' % (reference, str(ex)))
-            raise ResourceClientError(
-                'Could not pull the requested resource from the datastore. Workbench exception: \n %s' % ex)
+        return reference, branch, commit, treeish, has_treeish
 
+    @defer.inlineCallbacks
+    def _checkout_instance(self, reference, branch, commit, treeish, has_treeish, excluded_types, cacheable):
+        """
+        @brief Check out a pulled repository and wrap it in a resource instance
+        """
         # Get the repository
         repo = self.workbench.get_repository(reference)
 
@@ -252,11 +406,103 @@ class ResourceClient(object):
         self.workbench.set_repository_nickname(reference, resource.ResourceName)
         # Is this a good use of the resource name? Is it safe?
 
+        if cacheable:
+            commit_id = self._branch_head(repo, branch)
+            if commit_id is not None and repo.merge is None:
+                self.resource_cache.put((reference, branch), resource, commit_id)
+
+        defer.returnValue(resource)
+
+    @defer.inlineCallbacks
+    def get_instance(self, resource_id, excluded_types=None):
+        """
+        @brief Get the latest version of the identified resource from the data store
+        @param resource_id can be either a string resource identity or an IDRef
+        object which specifies the resource identity as well as optional parameters
+        version and version state.
+        @retval the specified ResourceInstance
+
+        """
+        yield self._check_init()
+
+        reference, branch, commit, treeish, has_treeish = self._parse_resource_id(resource_id)
+
+        # Only the latest state of a branch is cached
+        cacheable = self.resource_cache is not None and commit is None and treeish is None and excluded_types is None
+        if cacheable:
+            resource = yield self._get_cached_instance(reference, branch)
+            if resource is not None:
+                defer.returnValue(resource)
+
+            # Pull the repository
+        try:
+            result = yield self.workbench.pull(self.datastore_service, reference, get_head_content=not has_treeish, excluded_types=excluded_types)
+        except workbench.WorkBenchError, ex:
+            log.error('Resource client error during pull operation: Resource ID "%s" \nException - %s' % (reference, str(ex)))
+            raise ResourceClientError(
+                'Could not pull the requested resource from the datastore. Workbench exception: \n %s' % ex)
+
+        resource = yield self._checkout_instance(reference, branch, commit, treeish, has_treeish, excluded_types, cacheable)
+
         # Get owner and ownership association:
         #owner_associations = yield self.get_associations(subject=resource, predicate_or_predicates=OWNED_BY_ID)
 
         defer.returnValue(resource)
 
+    @defer.inlineCallbacks
+    def get_instances(self, resource_ids, excluded_types=None):
+        """
+        @brief Get many resources from the data store with one pull. The datastore resolves all of them in one
+        request and fetches their content in one pass.
+        @param resource_ids a list of string resource identities or IDRef objects, as taken by get_instance
+        @retval a tuple of a dictionary of resource id => ResourceInstance and a dictionary of resource id =>
+        ResourceClientError (or RepositoryError for a bad treeish) for the resources which could not be got.
+        Resource ids are the identities without any treeish.
+        """
+        yield self._check_init()
+
+        requests = []
+        for resource_id in resource_ids:
+            requests.append(self._parse_resource_id(resource_id))
+
+        references = []
+        for request in requests:
+            if request[0] not in references:
+                references.append(request[0])
+
+        try:
+            failed = yield self.workbench.pull_repositories(self.datastore_service, references, excluded_types=excluded_types)
+        except workbench.WorkBenchError, ex:
+            log.error('Resource client error during pull_repositories operation: %d resources \nException - %s' % (len(references), str(ex)))
+            raise ResourceClientError(
+                'Could not pull the requested resources from the datastore. Workbench exception: \n %s' % ex)
+
+        resources = {}
+        errors = {}
+        for reference, reason in failed.iteritems():
+            log.info('get_instances: could not pull resource "%s" - %s' % (reference, reason))
+            errors[reference] = ResourceClientError('Could not pull the requested resource from the datastore: %s' % reason)
+
+        for reference, branch, commit, treeish, has_treeish in requests:
+            if reference in errors:
+                continue
+
+            cacheable = self.resource_cache is not None and commit is None and treeish is None and excluded_types is None
+            try:
+                resource = yield self._checkout_instance(reference, branch, commit, treeish, has_treeish, excluded_types, cacheable)
+            except (ResourceClientError, repository.RepositoryError), ex:
+                errors[reference] = ex
+                continue
+            except Exception, ex:
+                # One bad resource must not lose the ones already checked out
+                log.exception('get_instances: could not check out resource "%s"' % reference)
+                errors[reference] = ResourceClientError('Could not check out the requested resource: %s' % ex)
+                continue
+
+            resources[reference] = resource
+
+        defer.returnValue((resources, errors))
+
     @defer.inlineCallbacks
     def put_instance(self, instance, comment=None):
         """
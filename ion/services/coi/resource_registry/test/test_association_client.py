@@ -243,3 +243,33 @@ class AssociationClientTest(IonTestCase):
 
             self.assertEqual(association.SubjectReference.key, ds_resource.ResourceIdentity)
             self.assertEqual(association.ObjectReference.key, anon_resource.ResourceIdentity)
+
+
+    @defer.inlineCallbacks
+    def test_null_owner_invalidates_policy(self):
+        '''
+        Taking the ownership of a resource away from a user drops the user from the policy cache
+        '''
+        from ion.services.coi import datastore
+
+        invalidated = []
+        self.patch(datastore, 'invalidate_policy_cache', invalidated.append)
+
+        proc = Process()
+        yield proc.spawn()
+
+        ac = AssociationClient(proc=proc)
+        rc = ResourceClient(proc=proc)
+
+        ds_resource = yield rc.get_instance(SAMPLE_PROFILE_DATASET_ID)
+        anon_resource = yield rc.get_instance(ANONYMOUS_USER_ID)
+
+        results = yield ac.find_associations(ds_resource, OWNED_BY_ID, anon_resource)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(invalidated, [])
+
+        association = results.pop()
+        association.SetNull()
+        yield rc.put_instance(association)
+
+        self.assertEqual(invalidated, [ANONYMOUS_USER_ID])
@@ -108,6 +108,93 @@ class ResourceClientTest(IonTestCase):
 
         self.assertEqual(my_resource.ResourceName, 'Test AddressLink Resource')
 
+    @defer.inlineCallbacks
+    def test_get_resource_cached(self):
+
+        resource = yield self.rc.create_instance(ADDRESSLINK_TYPE, ResourceName='Test AddressLink Resource', ResourceDescription='A test resource')
+        res_id = resource.ResourceIdentity
+
+        services = [
+            {'name':'my_process','module':'ion.core.process.process','class':'Process'}]
+
+        sup = yield self._spawn_processes(services)
+
+        child_ps1 = yield self.sup.get_child_id('my_process')
+        proc_ps1 = self._get_procinstance(child_ps1)
+
+        my_rc = ResourceClient(proc=proc_ps1)
+        cache = my_rc.resource_cache
+
+        my_resource = yield my_rc.get_instance(res_id)
+        self.assertEqual(cache.misses, 1)
+        self.assertIn((res_id, 'master'), cache)
+
+        # The head has not moved - the same instance comes back from any client of the process
+        other_resource = yield ResourceClient(proc=proc_ps1).get_instance(res_id)
+        self.assertIdentical(other_resource, my_resource)
+        self.assertEqual(cache.hits, 1)
+
+        # A new version in the datastore is checked out again
+        resource.ResourceDescription = 'An updated resource'
+        yield self.rc.put_instance(resource)
+
+        my_resource = yield my_rc.get_instance(res_id)
+        self.assertEqual(my_resource.ResourceDescription, 'An updated resource')
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 2)
+
+        # Resource modified events drop the instance
+        cache.invalidate(res_id)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.invalidations, 1)
+
+    @defer.inlineCallbacks
+    def test_get_instances(self):
+
+        resource1 = yield self.rc.create_instance(ADDRESSLINK_TYPE, ResourceName='Test AddressLink Resource 1', ResourceDescription='A test resource')
+        resource2 = yield self.rc.create_instance(ADDRESSLINK_TYPE, ResourceName='Test AddressLink Resource 2', ResourceDescription='A test resource')
+
+        services = [
+            {'name':'my_process','module':'ion.core.process.process','class':'Process'}]
+
+        sup = yield self._spawn_processes(services)
+
+        child_ps1 = yield self.sup.get_child_id('my_process')
+        proc_ps1 = self._get_procinstance(child_ps1)
+
+        my_rc = ResourceClient(proc=proc_ps1)
+
+        ids = [resource1.ResourceIdentity, resource2.ResourceIdentity, 'not-a-resource-id']
+        resources, errors = yield my_rc.get_instances(ids)
+
+        self.assertEqual(resources[ids[0]].ResourceName, 'Test AddressLink Resource 1')
+        self.assertEqual(resources[ids[1]].ResourceName, 'Test AddressLink Resource 2')
+
+        # Partial failure is reported per resource
+        self.assertEqual(errors.keys(), ['not-a-resource-id'])
+        self.assertIsInstance(errors['not-a-resource-id'], ResourceClientError)
+        self.assertEqual(proc_ps1.workbench.get_repository('not-a-resource-id'), None)
+
+        # Pull again after an update - only the new state is sent
+        resource2.ResourceDescription = 'An updated resource'
+        yield self.rc.put_instance(resource2)
+
+        resources, errors = yield my_rc.get_instances(ids[:2])
+        self.assertEqual(len(errors), 0)
+        self.assertEqual(resources[ids[1]].ResourceDescription, 'An updated resource')
+
+        # Any other failure to check out a resource is reported for that resource only
+        checkout = my_rc._checkout_instance
+        def failing_checkout(reference, *args):
+            if reference == ids[0]:
+                return defer.fail(KeyError(reference))
+            return checkout(reference, *args)
+        self.patch(my_rc, '_checkout_instance', failing_checkout)
+
+        resources, errors = yield my_rc.get_instances(ids[:2])
+        self.assertEqual(resources.keys(), [ids[1]])
+        self.assertIsInstance(errors[ids[0]], ResourceClientError)
+
     @defer.inlineCallbacks
     def test_get_resource_with_treeish(self):
         """
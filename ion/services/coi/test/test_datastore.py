@@ -10,7 +10,7 @@ from twisted.trial import unittest
 from ion.core.exception import ReceivedContainerError, ReceivedApplicationError
 from ion.core.messaging.receiver import Receiver, WorkerReceiver
 from ion.core.process.process import Process
-from ion.core.object.object_utils import ARRAY_STRUCTURE_TYPE, CDM_ARRAY_FLOAT64_TYPE, CDM_ARRAY_FLOAT32_TYPE, CDM_ARRAY_FLOAT32_TYPE, CDM_ATTRIBUTE_TYPE
+from ion.core.object.object_utils import ARRAY_STRUCTURE_TYPE, CDM_ARRAY_FLOAT64_TYPE, CDM_ARRAY_STRING_TYPE, CDM_ARRAY_FLOAT32_TYPE, CDM_ARRAY_FLOAT32_TYPE, CDM_ATTRIBUTE_TYPE
 
 from ion.core.object.test.test_workbench import WorkBenchProcess
 
@@ -36,6 +36,7 @@ from ion.core.data.storage_configuration_utility import BLOB_CACHE, COMMIT_CACHE
 
 from telephus.cassandra.ttypes import InvalidRequestException
 
+from ion.services.coi import datastore
 from ion.services.coi.datastore import ION_DATASETS_CFG, PRELOAD_CFG, ID_CFG, DataStoreClient, CDM_BOUNDED_ARRAY_TYPE
 # Pick three to test existence
 from ion.services.coi.datastore_bootstrap.ion_preload_config import HAS_A_ID, DATASET_RESOURCE_TYPE_ID, ROOT_USER_ID, NAME_CFG, CONTENT_ARGS_CFG, PREDICATE_CFG, ION_RESOURCE_TYPES_CFG, ION_PREDICATES_CFG, ION_IDENTITIES_CFG, SAMPLE_PROFILE_DATA_SOURCE_ID
@@ -44,6 +45,7 @@ from ion.services.coi.datastore_bootstrap.ion_preload_config import ION_DATASETS
 
 from ion.core.object.workbench import REQUEST_COMMIT_BLOBS_MESSAGE_TYPE, BLOBS_MESSAGE_TYPE, IDREF_TYPE, GET_OBJECT_REQUEST_MESSAGE_TYPE, GPBTYPE_TYPE, DATA_REQUEST_MESSAGE_TYPE, GET_LCS_REQUEST_MESSAGE_TYPE
 from ion.core.object.gpb_wrapper import StructureElement
+from ion.core.object.cdm_methods import bounded_array
 
 person_type = object_utils.create_type_identifier(object_id=20001, version=1)
 addresslink_type = object_utils.create_type_identifier(object_id=20003, version=1)
@@ -777,9 +779,74 @@ class DataStoreTest(IonTestCase):
             log.info(mem)
 
 
+    @defer.inlineCallbacks
+    def test_get_blobs_small_batches(self):
+
+        wb = self.ds1.workbench
+
+        obj_repo = yield create_large_object(wb)
+
+        # Many small concurrent batch gets must fetch the same blobs as one large one
+        load_repo = yield wb.create_repository(OPAQUE_ARRAY_TYPE)
+        expected = yield wb._get_blobs(load_repo,[obj_repo.commit_head.MyId])
+        wb.clear_repository(load_repo)
+
+        self.patch(datastore, 'GET_BLOBS_BATCH_KEYS', 1)
+        self.patch(datastore, 'GET_BLOBS_CONCURRENCY', 3)
+
+        load_repo = yield wb.create_repository(OPAQUE_ARRAY_TYPE)
+        blobs = yield wb._get_blobs(load_repo,[obj_repo.commit_head.MyId])
+        wb.clear_repository(load_repo)
+
+        self.assertEqual(set(blobs.keys()), set(expected.keys()))
+
+
+    @defer.inlineCallbacks
+    def test_get_blobs_byte_limit(self):
+
+        wb = self.ds1.workbench
+
+        obj_repo = yield create_large_object(wb)
+
+        self.patch(datastore, 'GET_BLOBS_BYTE_LIMIT', 1000)
+
+        load_repo = yield wb.create_repository(OPAQUE_ARRAY_TYPE)
+        yield self.failUnlessFailure(wb._get_blobs(load_repo,[obj_repo.commit_head.MyId]), datastore.DataStoreWorkBenchError)
+        wb.clear_repository(load_repo)
+
+
 
 
 
+    @defer.inlineCallbacks
+    def test_flush_small_batches(self):
+
+        wb = self.ds1.workbench
+
+        self.patch(datastore, 'FLUSH_BATCH_KEYS', 1)
+        self.patch(datastore, 'FLUSH_CONCURRENCY', 2)
+
+        repo = wb.create_repository(addresslink_type)
+        p = repo.create_object(person_type)
+        p.name = 'Flush'
+        repo.root_object.owner = p
+        repo.root_object.title = 'Flushed in small batches'
+        repo.commit()
+
+        is_there = yield wb.test_existence(repo.repository_key)
+        self.assertEqual(is_there, False)
+
+        yield wb.flush_repo_to_backend(repo)
+
+        is_there = yield wb.test_existence(repo.repository_key)
+        self.assertEqual(is_there, True)
+
+        # Flushing again - as when resuming a preload - writes nothing
+        blobs = [(key, element.serialize(), None) for key, element in repo.index_hash.iteritems()]
+        written = yield wb._bulk_put(wb._blob_store, blobs)
+        self.assertEqual(written, 0)
+
+
     @defer.inlineCallbacks
     def test_large_objects(self):
 
@@ -1273,11 +1340,39 @@ class DataStoreExtractDataTest(IonTestCase):
         self.second_struct_repo_key = repo.repository_key
         self.second_struct_as_key = content.MyId
 
+        # create a third, 2d array structure of strings as two bounded arrays
+        repo = self.wb1.workbench.create_repository(ARRAY_STRUCTURE_TYPE)
+
+        content = repo.root_object
+        for x in xrange(2):
+            ba = yield repo.create_object(CDM_BOUNDED_ARRAY_TYPE)
+
+            ba.bounds.add()
+            ba.bounds[0].origin = x
+            ba.bounds[0].size = 1
+
+            ba.bounds.add()
+            ba.bounds[1].origin = 0
+            ba.bounds[1].size = 5
+
+            arr = yield repo.create_object(CDM_ARRAY_STRING_TYPE)
+            arr.value.extend(('s%d' % val for val in xrange(x * 5, (x+1) * 5)))
+
+            ba.ndarray = arr
+
+            ref = content.bounded_arrays.add()
+            ref.SetLink(ba)
+
+        repo.commit()
+
+        self.string_struct_repo_key = repo.repository_key
+        self.string_struct_as_key = content.MyId
+
         # send the array structs to the datastore (as putblobs)
 
         msg = yield self.wb1.message_client.create_instance(BLOBS_MESSAGE_TYPE)
 
-        for repokey in [self.first_struct_repo_key, self.second_struct_repo_key]:
+        for repokey in [self.first_struct_repo_key, self.second_struct_repo_key, self.string_struct_repo_key]:
             for key,val in self.wb1.workbench.get_repository(repokey).index_hash.iteritems():
                 link = msg.blob_elements.add()
                 obj = msg.Repository._wrap_message_object(val._element)
@@ -1649,3 +1744,64 @@ class DataStoreExtractDataTest(IonTestCase):
         # now the next index in our returned array
         nextidx = 10 * 10
         self.failUnlessEquals(int(bigndarray[nextidx]), nextval)
+
+    @defer.inlineCallbacks
+    def _extract_with_engines(self, struct_as_key, request_bounds):
+        """
+        Extract the request bounds from an array structure with each engine
+        @retval dict of engine name => list of the values extracted
+        """
+        msg = yield self.dsc.proc.message_client.create_instance(DATA_REQUEST_MESSAGE_TYPE)
+        msg.structure_array_ref = struct_as_key
+
+        for origin, size, stride in request_bounds:
+            bounds = msg.request_bounds.add()
+            bounds.origin = origin
+            bounds.size = size
+            bounds.stride = stride
+
+        results = {}
+        for engine in ['strips', 'blocks']:
+            received = []
+            def send_chunk(seq_number, seq_max, start_index, values, ndarray_type):
+                received.append((start_index, list(values)))
+
+            repo, obj = yield self.ds1.workbench._load_array_structure(struct_as_key)
+            yield self.ds1.workbench._extract_data(repo, obj, msg.request_bounds, send_chunk, engine=engine)
+
+            values = []
+            for start_index, chunk in received:
+                self.failUnlessEquals(start_index, len(values))
+                values.extend(chunk)
+            results[engine] = values
+
+        defer.returnValue(results)
+
+    @defer.inlineCallbacks
+    def test_engines_agree_multi_ba(self):
+
+        # Strided and partial in every dimension, crossing the bounded arrays in the first
+        results = yield self._extract_with_engines(self.second_struct_as_key,
+                                                   [(1, 3, 1), (3, 15, 4), (0, 20, 3), (7, 11, 1)])
+
+        self.failUnlessEquals(len(results['blocks']), 3 * 4 * 7 * 11)
+        self.failUnlessEquals(results['blocks'], results['strips'])
+
+    @defer.inlineCallbacks
+    def test_engines_agree_string_ba(self):
+
+        # String arrays have no numpy view - the blocks engine falls back to strips
+        results = yield self._extract_with_engines(self.string_struct_as_key, [(0, 2, 1), (1, 4, 2)])
+
+        self.failUnlessEquals(results['strips'], ['s1', 's3', 's6', 's8'])
+        self.failUnlessEquals(results['blocks'], results['strips'])
+
+    def test_blocks_engine_requires_numpy(self):
+
+        # Numeric arrays are not silently copied strip by strip when the blocks engine can not run
+        self.patch(bounded_array, 'numpy', None)
+        return self.assertFailure(self._extract_with_engines(self.second_struct_as_key, [(0, 1, 1), (0, 1, 1), (0, 1, 1), (0, 1, 1)]),
+                                  datastore.DataStoreWorkBenchError)
+
+    if bounded_array.numpy is None:
+        test_engines_agree_multi_ba.skip = 'numpy is not available'
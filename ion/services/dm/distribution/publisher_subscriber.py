@@ -109,7 +109,7 @@ class Publisher(BasicLifecycleObject, PSCRegisterable):
     to be instantiated within another class/process/codebase, as an object for sending data to OOI.
     """
 
-    def __init__(self, xp_name=None, routing_key=None, credentials=None, process=None, *args, **kwargs):
+    def __init__(self, xp_name=None, routing_key=None, credentials=None, process=None, publisher_config=None, *args, **kwargs):
         """
         Initializer for a Publisher.
 
@@ -118,6 +118,8 @@ class Publisher(BasicLifecycleObject, PSCRegisterable):
                             publish.
         @param  credentials Credentials to use.
         @param  process     The owning process of this Publisher. Must be specified.
+        @param  publisher_config    Additional messaging Publisher params, e.g. batch_size, batch_window and confirm
+                            to batch the messages of a high rate publisher.
         """
         BasicLifecycleObject.__init__(self)
 
@@ -131,15 +133,17 @@ class Publisher(BasicLifecycleObject, PSCRegisterable):
         self._process = process
 
         # TODO: will the user specify this? will the PSC get it?
-        publisher_config = { 'exchange'      : xp_name,
-                             'exchange_type' : 'topic',
-                             'durable': False,
-                             'mandatory': True,
-                             'immediate': False,
-                             'warn_if_exists': False }
+        pub_config = { 'exchange'      : xp_name,
+                       'exchange_type' : 'topic',
+                       'durable': False,
+                       'mandatory': True,
+                       'immediate': False,
+                       'warn_if_exists': False }
+        if publisher_config:
+            pub_config.update(publisher_config)
 
         # we use base Receiver here as we only send with it, no consumption which the base Receiver doesn't do well
-        self._recv = Receiver(routing_key, process=process, publisher_config=publisher_config)
+        self._recv = Receiver(routing_key, process=process, publisher_config=pub_config)
 
         # monkey patch receiver as we don't want any of its initialize or activate items running, but we want it to be in the right state
         def noop(*args, **kwargs):
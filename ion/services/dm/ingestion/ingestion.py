@@ -48,6 +48,13 @@ import logging
 CONF = ioninit.config(__name__)
 log = ion.util.ionlog.getLogger(__name__)
 
+from bisect import bisect_right
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 CDM_DATASET_TYPE = object_utils.create_type_identifier(object_id=10001, version=1)
 
@@ -102,6 +109,89 @@ EM_TIMESTEPS    = 'number_of_timesteps'
 EM_ERROR        = 'error_explanation'
 
 
+# Two times closer than this (in the units of the time variable) are the same time
+TIME_INDEX_TOLERANCE = CONF.getValue('time_index_tolerance', 0.001)
+
+
+class TimeIndex(object):
+    """
+    A sorted index over the values of a time coordinate variable - built once from the result of
+    IngestionService._get_ndarray_vals and searched by bisection for any number of times.
+
+    The result of a search for each time is the same as the linear scan it replaces:
+      * the index of the value which matches the time (within tolerance)
+      * -(index + 1) where index is the first value after the time, if none match
+      * None if the time is after all the values
+    If the values do not increase monotonically the index falls back to the linear scan.
+    """
+
+    def __init__(self, values, tolerance=None):
+        """
+        @param values: a list of (index, value) tuples sorted by index
+        @param tolerance: the largest difference between two times which are a match
+        """
+        if tolerance is None:
+            tolerance = TIME_INDEX_TOLERANCE
+        self.tolerance = tolerance
+
+        self.indices = [idx for idx, val in values]
+
+        if numpy is not None:
+            self.times = numpy.array([val for idx, val in values], dtype='float64')
+            self.monotonic = bool(numpy.all(self.times[1:] >= self.times[:-1]))
+        else:
+            self.times = [val for idx, val in values]
+            self.monotonic = True
+            for i in xrange(1, len(self.times)):
+                if self.times[i] < self.times[i-1]:
+                    self.monotonic = False
+                    break
+
+        if not self.monotonic:
+            log.warn('Time coordinate values are not monotonic - using a linear search')
+
+    def __len__(self):
+        return len(self.indices)
+
+    def search(self, search_times):
+        """
+        Find the position of each time in search_times
+        @return: a dict mapping each search time to its index (see the class doc for the meaning of the values)
+        """
+        if not self.monotonic:
+            return self._linear_search(search_times)
+
+        # The first value which matches or is after each search time
+        if numpy is not None:
+            positions = numpy.searchsorted(self.times, numpy.array(search_times, dtype='float64') - self.tolerance, side='right').tolist()
+        else:
+            positions = [bisect_right(self.times, search_time - self.tolerance) for search_time in search_times]
+
+        results = {}
+        for search_time, pos in zip(search_times, positions):
+            results[search_time] = self._result(search_time, pos)
+        return results
+
+    def _linear_search(self, search_times):
+        results = {}
+        for search_time in search_times:
+            for pos in xrange(len(self.times)):
+                if self.times[pos] > search_time - self.tolerance:
+                    break
+            else:
+                pos = len(self.times)
+            results[search_time] = self._result(search_time, pos)
+        return results
+
+    def _result(self, search_time, pos):
+        if pos >= len(self.indices):
+            return None
+        idx = self.indices[pos]
+        if abs(self.times[pos] - search_time) < self.tolerance:
+            return idx
+        return -(idx + 1)
+
+
 
 
 class IngestionService(ServiceProcess):
@@ -1275,7 +1365,9 @@ class IngestionService(ServiceProcess):
                     #cur_var_end = values[-1][1]
                     cur_eindex = values[-1][0]
 
-                    time_indices = self._find_time_index(values, search_times)
+                    # Index the time values once and find both ends of the supplement in one search
+                    cur_time_index = TimeIndex(values)
+                    time_indices = self._find_time_index(cur_time_index, search_times)
                     log.debug('time_indices = %s' % str(time_indices))
                     
                     sup_sindex = time_indices[sup_var_start]
@@ -1332,7 +1424,7 @@ class IngestionService(ServiceProcess):
                         log.debug('>>  ndarray values = %s' % str(values))
 
 
-                    time_indices = yield self._find_time_index(values, [cur_etime - runtime_offset_seconds])
+                    time_indices = self._find_time_index(TimeIndex(values), [cur_etime - runtime_offset_seconds])
                     time_index   = time_indices[cur_etime - runtime_offset_seconds]
 
                     log.debug('Time Indicies: %s, %s' % (str(time_indices), time_index))
@@ -1507,6 +1599,9 @@ class IngestionService(ServiceProcess):
                     #            2) Breaking apart bounded arrays which contain 1 or more overlapping indices
                     #               and throwing away the overlapping region
                     #            3) Adjusting the indices of all bounded_arrays positioned after the overwrite
+                    #          One pass over the bounded arrays - the content changes with every merge, so a bounded
+                    #          array index (variables._find_intersecting_bounded_arrays) would be rebuilt each time
+                    #          from the same bounds this loop reads
                     for i in reversed(range(len(var.content.bounded_arrays))):  # Iterate in reverse so that we can add and delete items without affecting our indices
                         ba = var.content.bounded_arrays[i]
                         bound = ba.bounds[merge_agg_dim_idx]
@@ -1875,10 +1970,9 @@ class IngestionService(ServiceProcess):
             if len(ba.bounds) > 1:
                 raise IngestionException('_get_ndarray_vals does not support enflating bounded arrays with more than one dimension -- yet')
             origin = ba.bounds[0].origin
-            for i in range(len(ba.ndarray.value)):
-                val = ba.ndarray.value[i]
-                idx = origin + i
-                results.append((idx, val))
+            # Take a copy of the values in one call - not one at a time through the wrapper
+            for i, val in enumerate(ba.ndarray.value[:]):
+                results.append((origin + i, val))
         results.sort()
         return results
 
@@ -1933,56 +2027,26 @@ class IngestionService(ServiceProcess):
 
 
 
-    def _find_time_index(self, values, search_times, THRESHOLD = 0.001):
+    def _find_time_index(self, values, search_times, THRESHOLD = None):
         """
-        @todo: Add documentation about what negative value returns mean
+        Find the index of each of search_times in the values of a time variable.
+        @param values: a list of (index, value) tuples from _get_ndarray_vals or a TimeIndex built from them
+        @param search_times: the times to search for
+        @param THRESHOLD: the tolerance for a match - defaults to the time_index_tolerance config value
+        @return: a dict mapping each search time to the index of the matching value. A negative result -(i + 1)
+                 means there is no match and i is the index of the first value after the search time. None means
+                 the search time is after all the values.
         """
+        if isinstance(values, TimeIndex):
+            time_index = values
+        else:
+            time_index = TimeIndex(values, THRESHOLD)
 
-        search_times_cpy = search_times[:]  # copy the search_times list so we can remove values
-
+        log.debug('Searching for values "%s" in %d time values' % (str(search_times), len(time_index)))
 
-        # Step 2: Perform a linear search in the values array for each time in search_times
-        #         a) Binary search will most likely be performed nearer worse case (logN time) - since the
-        #            overlapping region should (on average) be fairly small
-        #            * Linear search may be optimal for average case
-        #            ** Linear search is "required" when indexing into the current data (rather than the
-        #               supplement) because we must traverse multiple bounded arrays
-        
-        
-        # Step 2a: Perform the linear search to see where in the set of values our search_times lay
-        log.debug('Searching for values "%s"' % str(search_times_cpy))
-        log.debug('Got Time values "%s" in ndarray list' % str(values))
-        results_dict = {}
-        for i, tup in enumerate(values):
-            #log.debug('i - %s,tup - %s' % (i,tup))
-            idx, val = tup
-            # @note: this is a good place to check if two entries in the time variables bounded_arrays
-            #        contain mismatched values for the same index -- this shouldn't happen however
-            for search_time in search_times_cpy:
-                if val is search_time or abs(val - search_time) < THRESHOLD: # TODO: should change this to using some sort of near-match function
-                    results_dict[search_time] = idx
-                    search_times_cpy.remove(search_time)
-                elif search_time < val:
-                    results_dict[search_time] = -(idx + 1)  # used to be -(i + 1) ????
-                    search_times_cpy.remove(search_time)
-                # else search_time > val: continue
-            if len(search_times_cpy) == 0:
-                break; 
-
-
-        # Don't get it - what is the error? ValueError: need more than 2 values to unpack
-        if len(search_times_cpy) > 0:
-            not_in_list_val = None
-
-            for search_time in search_times_cpy:
-                results_dict[search_time] = not_in_list_val
-        # don't use the copy of the list after this point -- structure is indeterminant
-        search_times_cpy = None
-
-        # Step 2b: @todo: Make sure that we aren't experiencing a roundoff issue by checking how close
-        #           our search_start is to the values before and after it in the list (floats only)
-         
-        return(results_dict)
+        # @todo: Make sure that we aren't experiencing a roundoff issue by checking how close
+        #        our search_start is to the values before and after it in the list (floats only)
+        return time_index.search(search_times)
 
 
     @defer.inlineCallbacks
@@ -25,7 +25,7 @@ from ion.services.coi.datastore_bootstrap.ion_preload_config import PRELOAD_CFG,
 from ion.services.dm.distribution.events import DatasourceUnavailableEventSubscriber, DatasetSupplementAddedEventSubscriber, DATASET_STREAMING_EVENT_ID, get_events_exchange_point
 
 from ion.core.process import process
-from ion.services.dm.ingestion.ingestion import IngestionClient, IngestionError, SUPPLEMENT_MSG_TYPE, CDM_DATASET_TYPE, DAQ_COMPLETE_MSG_TYPE, PERFORM_INGEST_MSG_TYPE, CREATE_DATASET_TOPICS_MSG_TYPE, EM_URL, EM_ERROR, EM_TITLE, EM_DATASET, EM_END_DATE, EM_START_DATE, EM_TIMESTEPS, EM_DATA_SOURCE, CDM_BOUNDED_ARRAY_TYPE 
+from ion.services.dm.ingestion.ingestion import IngestionClient, IngestionError, TimeIndex, SUPPLEMENT_MSG_TYPE, CDM_DATASET_TYPE, DAQ_COMPLETE_MSG_TYPE, PERFORM_INGEST_MSG_TYPE, CREATE_DATASET_TOPICS_MSG_TYPE, EM_URL, EM_ERROR, EM_TITLE, EM_DATASET, EM_END_DATE, EM_START_DATE, EM_TIMESTEPS, EM_DATA_SOURCE, CDM_BOUNDED_ARRAY_TYPE 
 from ion.test.iontest import IonTestCase
 
 from ion.services.coi.datastore_bootstrap.dataset_bootstrap import bootstrap_profile_dataset, BOUNDED_ARRAY_TYPE, FLOAT32ARRAY_TYPE, bootstrap_byte_array_dataset
@@ -1293,3 +1293,23 @@ class IngestionTest(IonTestCase):
         for x in xrange(100):
             self.failUnlessApproximates(x/10.0, var.GetValue(x), 0.01)  # precision may be an issue here?
             log.debug("Value %d: %f" % (x, var.GetValue(x)))
+
+
+class TimeIndexTest(unittest.TestCase):
+
+    def test_search(self):
+        # Hourly values with a repeated index from overlapping bounded arrays
+        values = [(0, 0.0), (1, 3600.0), (2, 7200.0), (2, 7200.0), (3, 10800.0)]
+        index = TimeIndex(values)
+        self.failUnless(index.monotonic)
+
+        result = index.search([3600.0, 3600.0005, 5000.0, -1.0, 20000.0])
+        self.failUnlessEqual(result, {3600.0:1, 3600.0005:1, 5000.0:-3, -1.0:-1, 20000.0:None})
+
+    def test_search_not_monotonic(self):
+        values = [(0, 0.0), (1, 7200.0), (2, 3600.0)]
+        index = TimeIndex(values, tolerance=1.0)
+        self.failIf(index.monotonic)
+
+        # Same answer as the old linear scan - the first value which matches or is after the time
+        self.failUnlessEqual(index.search([3600.0, 7200.5]), {3600.0:-2, 7200.5:1})
@@ -84,6 +84,12 @@ class AssociationService(ServiceProcess):
         self._password = self.spawn_args.get("password", CONF.getValue("password",None))
 
 
+        # The number of index store queries to have outstanding at once when resolving many repositories
+        self._max_concurrent_queries = int(self.spawn_args.get('max_concurrent_queries', CONF.getValue('max_concurrent_queries', 10)))
+
+        # The number of association rows to fetch at once when paging through a query
+        self._query_page_size = int(self.spawn_args.get('query_page_size', CONF.getValue('query_page_size', store.QUERY_PAGE_SIZE)))
+
         # Get the configuration for cassandra - may or may not be used depending on the backend class
         self._storage_conf = get_cassandra_configuration()
         self._rc = ResourceClient(proc=self)
@@ -108,6 +114,90 @@ class AssociationService(ServiceProcess):
 
         log.info('SLC_INIT Association Service: index store class - %s' % self.index_store_class)
 
+    @defer.inlineCallbacks
+    def _query_all(self, queries):
+        """
+        Run a list of index store queries, with at most max_concurrent_queries outstanding at once.
+        @retval a list of the query results in the same order as the queries
+        """
+        semaphore = defer.DeferredSemaphore(self._max_concurrent_queries)
+
+        results = yield defer.DeferredList([semaphore.run(self.index_store.query, q) for q in queries], consumeErrors=True)
+
+        rows_list = []
+        for success, result in results:
+            if not success:
+                result.raiseException()
+            rows_list.append(result)
+
+        defer.returnValue(rows_list)
+
+    @defer.inlineCallbacks
+    def _get_heads(self, key_branches, kind):
+        """
+        Find the current head of each repository associated as a subject or object.
+        @param key_branches - a dictionary of repository key to the set of branch names used in the associations to it
+        @param kind - 'subject' or 'object' for log and error messages
+        @retval a set of (repository key, branch name) tuples
+        """
+
+        keys = key_branches.keys()
+
+        queries = []
+        for key in keys:
+            # Get the latest commits for the key
+            head_query = store.Query()
+            # Get only the head or get all? Hmmm not sure...
+            head_query.add_predicate_gt(BRANCH_NAME,'')
+            head_query.add_predicate_eq(REPOSITORY_KEY,key)
+            queries.append(head_query)
+
+        results = yield self._query_all(queries)
+
+        pointers = set()
+        for key, heads in zip(keys, results):
+
+            candidates = {}     # map branch -> repository key
+            resolve_objs = []   # list of repository keys we need to resolve due to multiple branches
+
+            for commit_key, commit_row in heads.items():
+
+                for branch in key_branches[key]:
+                    if commit_row[BRANCH_NAME] != branch:
+                        raise NotImplementedError('Dealing with associations to a %s with multiple branches is not yet supported' % kind)
+
+                # have we already seen this branch name? if so, we have divergence, add it to list of things to resolve
+                if commit_row[BRANCH_NAME] in candidates:
+                    # remove it
+                    del candidates[commit_row[BRANCH_NAME]]
+
+                    # push it to resolve objs
+                    resolve_objs.append(key)
+
+                    log.warn("_get_heads found a divergent %s: %s" % (kind, str(key)))
+                else:
+                    candidates[commit_row[BRANCH_NAME]] = key
+
+            # do we have to resolve anything
+            for rkey in resolve_objs:
+                r = yield self._rc.get_instance(rkey)
+
+                # make sure we are a merge commit
+                if len(r.Repository._current_branch.commitrefs[0].parentrefs) != 2:
+                    raise AssociationServiceError("_get_heads attempted to resolve a divergent associated %s but rc did not give us a merge commit" % kind)
+
+                # put it back
+                yield self._rc.put_instance(r)
+
+                # add our key/branch pair to the candidates
+                candidates[r.Repository._current_branch.branchkey] = rkey
+
+            # candidates are now final, add them to the pointers
+            for branch, rkey in candidates.iteritems():
+                pointers.add((rkey, branch))
+
+        defer.returnValue(pointers)
+
     @defer.inlineCallbacks
     def _get_subjects(self, predicate_pairs):
         life_cycle_pair = None
@@ -159,67 +249,25 @@ class AssociationService(ServiceProcess):
 
             q.add_predicate_eq(OBJECT_KEY, pair.object.key)
 
-            rows = yield self.index_store.query(q)
+            # Collect the branch of each subject before looking up any of them - each repository is only queried once
+            # Page through the rows so a popular predicate never loads every association at once
+            subject_branches = {}
+            cursor = store.QueryCursor(self.index_store, q, self._query_page_size)
+            while not cursor.done:
+                rows = yield cursor.next_page()
+                for key, row in rows.iteritems():
 
-            # subject_pointers is the resulting set of pointers to the current state of the association subject
-            subjects_pointers = set()
+                    #@TODO - check for divergence and branches in the association and in the object - not just the subject
 
-            current_keys = set()
-            for key, row in rows.items():
+                    if not first_pair and row[SUBJECT_KEY] not in subject_keys:
+                        # The result we are looking for is an intersection operation. If this key is not here escape!
+                        continue
+                    subject_branches.setdefault(row[SUBJECT_KEY], set()).add(row[SUBJECT_BRANCH])
 
+            current_keys = set(subject_branches.keys())
 
-                #@TODO - check for divergence and branches in the association and in the object - not just the subject
-
-                if not first_pair and row[SUBJECT_KEY] not in subject_keys:
-                    # The result we are looking for is an intersection operation. If this key is not here escape!
-                    continue
-                current_keys.add(row[SUBJECT_KEY])
-
-                # Get the latest commits for the Subject_Key
-                subject_query = store.Query()
-                # Get only the head or get all? Hmmm not sure...
-                subject_query.add_predicate_gt(BRANCH_NAME,'')
-                subject_query.add_predicate_eq(REPOSITORY_KEY,row[SUBJECT_KEY])
-                subject_heads = yield self.index_store.query(subject_query)
-
-                subj_candidates = {}     # map branch -> object_key
-                resolve_objs = []       # list of object keys we need to resolve due to multiple branches
-
-                for commit_key, commit_row in subject_heads.items():
-
-                    if commit_row[BRANCH_NAME] != row[SUBJECT_BRANCH]:
-                        raise NotImplementedError('Dealing with associations to a subject with multiple branches is not yet supported')
-
-                    # have we already seen this branch name? if so, we have divergence, add it to list of things to resolve
-                    if commit_row[BRANCH_NAME] in subj_candidates:
-                        # remove it
-                        del subj_candidates[commit_row[BRANCH_NAME]]
-
-                        # push it to resolve objs
-                        resolve_objs.append(row[SUBJECT_KEY])
-
-                        log.warn("_get_subjects found a divergent subject: %s" % str(row[SUBJECT_KEY]))
-                    else:
-                        subj_candidates[commit_row[BRANCH_NAME]] = row[SUBJECT_KEY]
-
-                # do we have to resolve anything
-                for rkey in resolve_objs:
-                    r = yield self._rc.get_instance(rkey)
-
-                    # make sure we are a merge commit
-                    if len(r.Repository._current_branch.commitrefs[0].parentrefs) != 2:
-                        raise AssociationServiceError("_get_subjects attempted to resolve a divergent associated subjects but rc did not give us a merge commit")
-
-                    # put it back
-                    yield self._rc.put_instance(r)
-
-                    # add our key/branch pair to the candidates
-                    subj_candidates[r.Repository._current_branch.branchkey] = rkey
-
-                # candidates are now final, add them to objects_pointers
-                for branch, key in subj_candidates.iteritems():
-                    total_key = (key, branch)
-                    subjects_pointers.add(total_key)
+            # subject_pointers is the resulting set of pointers to the current state of the association subject
+            subjects_pointers = yield self._get_heads(subject_branches, 'subject')
 
             # Now - at the end of the loop over the pairs - take the intersection with the current search results!
             if first_pair:
@@ -252,14 +300,16 @@ class AssociationService(ServiceProcess):
 
 
             # Get all the results that meet the type / state query
-            rows = yield self.index_store.query(q)
+            cursor = store.QueryCursor(self.index_store, q, self._query_page_size)
+            while not cursor.done:
+                rows = yield cursor.next_page()
 
-            # This is a simple search - just add the results!
-            for key, row in rows.items():
+                # This is a simple search - just add the results!
+                for key, row in rows.iteritems():
 
-                totalkey = (row[REPOSITORY_KEY] , row[BRANCH_NAME])
+                    totalkey = (row[REPOSITORY_KEY] , row[BRANCH_NAME])
 
-                subjects.add(totalkey)
+                    subjects.add(totalkey)
 
         elif len(subjects) > 0 and life_cycle_pair or type_of_pair:
             # Now apply search by type and state... if needed.
@@ -267,6 +317,7 @@ class AssociationService(ServiceProcess):
             new_set=set()
 
             # Assumption - the number of rows returned by the association search is much smaller than what will come from search by type or state!
+            queries = []
             for subject in subjects:
 
                 # There for, for each result - check and see if it meets the criteria by type and state...
@@ -284,9 +335,12 @@ class AssociationService(ServiceProcess):
                 if type_of_pair:
                     q.add_predicate_eq(RESOURCE_OBJECT_TYPE, type_of_pair.object.key)
 
-                # Get all the results that meet the type / state query
-                rows = yield self.index_store.query(q)
+                queries.append(q)
 
+            # Get all the results that meet the type / state query
+            results = yield self._query_all(queries)
+
+            for rows in results:
                 for key, row in rows.items():
 
                     totalkey = (row[REPOSITORY_KEY] , row[BRANCH_NAME])
@@ -354,65 +408,23 @@ class AssociationService(ServiceProcess):
 
             q.add_predicate_eq(SUBJECT_KEY, pair.subject.key)
 
-            rows = yield self.index_store.query(q)
-
-            # subject_pointers is the resulting set of pointers to the current state of the association subject
-            objects_pointers = set()
-
-            current_keys=set()
-            for key, row in rows.items():
-
-                if not first_pair and row[OBJECT_KEY] not in object_keys:
-                    # The result we are looking for is an intersection operation. If this key is not her escape!
-                    continue
-
-                current_keys.add(row[OBJECT_KEY])
-
-                # Get the latest commits for the Subject_Key
-                object_query = store.Query()
-                # Get only the head or get all? Hmmm not sure...
-                object_query.add_predicate_gt(BRANCH_NAME,'')
-                object_query.add_predicate_eq(REPOSITORY_KEY,row[OBJECT_KEY])
-                object_heads = yield self.index_store.query(object_query)
-
-                obj_candidates = {}     # map branch -> object_key
-                resolve_objs = []       # list of object keys we need to resolve due to multiple branches
-
-                for commit_key, commit_row in object_heads.items():
-
-                    if commit_row[BRANCH_NAME] != row[OBJECT_BRANCH]:
-                        raise NotImplementedError('Dealing with associations to a Object with multiple branches is not yet supported')
-
-                    # have we already seen this branch name? if so, we have divergence, add it to list of things to resolve
-                    if commit_row[BRANCH_NAME] in obj_candidates:
-                        # remove it
-                        del obj_candidates[commit_row[BRANCH_NAME]]
-
-                        # push it to resolve objs
-                        resolve_objs.append(row[OBJECT_KEY])
-
-                        log.warn("_get_objects found a divergent object: %s" % str(row[OBJECT_KEY]))
-                    else:
-                        obj_candidates[commit_row[BRANCH_NAME]] = row[OBJECT_KEY]
-
-                # do we have to resolve anything
-                for rkey in resolve_objs:
-                    r = yield self._rc.get_instance(rkey)
+            # Collect the branch of each object before looking up any of them - each repository is only queried once
+            object_branches = {}
+            cursor = store.QueryCursor(self.index_store, q, self._query_page_size)
+            while not cursor.done:
+                rows = yield cursor.next_page()
+                for key, row in rows.iteritems():
 
-                    # make sure we are a merge commit
-                    if len(r.Repository._current_branch.commitrefs[0].parentrefs) != 2:
-                        raise AssociationServiceError("_get_objects attempted to resolve a divergent associated object but rc did not give us a merge commit")
+                    if not first_pair and row[OBJECT_KEY] not in object_keys:
+                        # The result we are looking for is an intersection operation. If this key is not her escape!
+                        continue
 
-                    # put it back
-                    yield self._rc.put_instance(r)
+                    object_branches.setdefault(row[OBJECT_KEY], set()).add(row[OBJECT_BRANCH])
 
-                    # add our key/branch pair to the candidates
-                    obj_candidates[r.Repository._current_branch.branchkey] = rkey
+            current_keys = set(object_branches.keys())
 
-                # candidates are now final, add them to objects_pointers
-                for branch, key in obj_candidates.iteritems():
-                    total_key = (key, branch)
-                    objects_pointers.add(total_key)
+            # objects_pointers is the resulting set of pointers to the current state of the association object
+            objects_pointers = yield self._get_heads(object_branches, 'object')
 
             # Now - at the end of the loop over the pairs - take the intersection with the current search results!
             if first_pair:
@@ -244,6 +244,50 @@ class AssociationServiceTest(IonTestCase):
 
         self.assertIn(SAMPLE_PROFILE_DATASET_ID, key_list)
 
+    @defer.inlineCallbacks
+    def test_association_by_owner_query_count(self):
+
+        # Count the queries the service makes against its index store
+        as_id = yield self.sup.get_child_id('association_service')
+        association_service = self._get_procinstance(as_id)
+
+        queries = []
+        index_store_query = association_service.index_store.query
+        def counting_query(q):
+            queries.append(q)
+            return index_store_query(q)
+        association_service.index_store.query = counting_query
+
+        pages = []
+        index_store_query_page = association_service.index_store.query_page
+        def counting_query_page(q, page_size=None, start_key=''):
+            pages.append(q)
+            return index_store_query_page(q, page_size=page_size, start_key=start_key)
+        association_service.index_store.query_page = counting_query_page
+
+        request = yield self.proc.message_client.create_instance(PREDICATE_OBJECT_QUERY_TYPE)
+
+        pair = request.pairs.add()
+
+        pref = request.CreateObject(PREDICATE_REFERENCE_TYPE)
+        pref.key = OWNED_BY_ID
+        pair.predicate = pref
+
+        type_ref = request.CreateObject(IDREF_TYPE)
+        type_ref.key = ANONYMOUS_USER_ID
+        pair.object = type_ref
+
+        result = yield self.asc.get_subjects(request)
+
+        del association_service.index_store.query
+        del association_service.index_store.query_page
+
+        self.assertIn(SAMPLE_PROFILE_DATASET_ID, [idref.key for idref in result.idrefs])
+
+        # The associations fit in one page, then one query for the head of each distinct subject
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(len(queries), len(result.idrefs))
+
     @defer.inlineCallbacks
     def test_association_by_2_owners(self):
 
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+"""
+@file ion/util/bloom.py
+@brief Bloom filter over SHA1 keys, serializable to a compact string.
+"""
+
+import math
+import struct
+import hashlib
+
+# Serialized header: number of hash functions, number of bits
+HEADER = struct.Struct('>BI')
+
+
+class BloomFilter(object):
+    """
+    A set summary which answers 'maybe present' or 'definitely absent'. Keys are expected to be SHA1 digests, so the
+    bit positions are taken straight from the key bytes (double hashing) - other keys are hashed first.
+    """
+
+    def __init__(self, capacity=None, error_rate=0.001, num_bits=None, num_hashes=None, bits=None):
+        """
+        Size the filter for capacity keys at the given false positive rate, or give the number of bits and hashes.
+        """
+        if num_bits is None:
+            capacity = max(capacity or 1, 1)
+            num_bits = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+            num_hashes = int(round(float(num_bits) / capacity * math.log(2)))
+
+        self.num_bits = max(num_bits, 8)
+        self.num_hashes = min(max(num_hashes or 1, 1), 255)
+
+        if bits is None:
+            bits = bytearray((self.num_bits + 7) // 8)
+        self.bits = bits
+
+    def _positions(self, key):
+        if len(key) != 20:
+            key = hashlib.sha1(key).digest()
+        h1, h2 = struct.unpack('>QQ', key[:16])
+        h2 |= 1
+        num_bits = self.num_bits
+        return [(h1 + i * h2) % num_bits for i in xrange(self.num_hashes)]
+
+    def add(self, key):
+        bits = self.bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+
+    def update(self, keys):
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key):
+        bits = self.bits
+        for pos in self._positions(key):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def serialize(self):
+        return HEADER.pack(self.num_hashes, self.num_bits) + str(self.bits)
+
+    @classmethod
+    def deserialize(cls, data):
+        num_hashes, num_bits = HEADER.unpack(data[:HEADER.size])
+        bits = bytearray(data[HEADER.size:])
+        if len(bits) != (num_bits + 7) // 8:
+            raise ValueError('Serialized bloom filter has %d bytes for %d bits' % (len(bits), num_bits))
+        return cls(num_bits=num_bits, num_hashes=num_hashes, bits=bits)
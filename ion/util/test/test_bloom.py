@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+"""
+@file ion/util/test/test_bloom.py
+@test ion.util.bloom
+"""
+
+import hashlib
+
+from twisted.trial import unittest
+
+from ion.util.bloom import BloomFilter
+
+
+class BloomFilterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.keys = [hashlib.sha1(str(i)).digest() for i in xrange(5000)]
+        self.others = [hashlib.sha1('other %d' % i).digest() for i in xrange(5000)]
+
+    def test_membership(self):
+        bloom = BloomFilter(len(self.keys), 0.01)
+        bloom.update(self.keys)
+
+        for key in self.keys:
+            self.assertIn(key, bloom)
+
+        false_positives = len([key for key in self.others if key in bloom])
+        self.assert_(false_positives < 150, false_positives)
+
+    def test_serialize(self):
+        bloom = BloomFilter(len(self.keys), 0.001)
+        bloom.update(self.keys)
+
+        data = bloom.serialize()
+        # Far smaller than the keys themselves
+        self.assert_(len(data) < len(self.keys) * 20 / 8)
+
+        copy = BloomFilter.deserialize(data)
+        self.assertEqual(copy.num_bits, bloom.num_bits)
+        self.assertEqual(copy.num_hashes, bloom.num_hashes)
+        for key in self.keys:
+            self.assertIn(key, copy)
+
+        self.assertRaises(ValueError, BloomFilter.deserialize, data[:-1])
+
+    def test_other_keys(self):
+        bloom = BloomFilter(10)
+        bloom.add('short key')
+        self.assertIn('short key', bloom)
+        self.assertNotIn('another key', bloom)
@@ -61,6 +61,10 @@ setup( name = 'ioncore',
            'setproctitle==1.1.2',
            'ionproto>=1.1.0',
                           ],
+       extras_require = {
+           # Numpy array access to CDM bounded arrays and the datastore 'blocks' extract engine
+           'numpy': ['numpy>=1.5.1'],
+                        },
        entry_points = {
                         'console_scripts': [
                             'cassandra-setup=ion.core.data.cassandra_schema_script:main',